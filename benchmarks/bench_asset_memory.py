@@ -0,0 +1,56 @@
+"""
+Asset registry memory benchmark: bytes per asset at 100k assets.
+
+Compares the original __dict__-based model (datetime timestamp, thresholds copied per
+instance), the slotted TransformerHealth, and the struct-of-arrays TransformerFleetHealth
+(readings, score and a type code per asset; thresholds in the per-type table).
+Asset id strings are created up front and excluded, since every layout needs them.
+
+Usage: python -m benchmarks.bench_asset_memory [assets]
+"""
+import gc
+import sys
+import tracemalloc
+from datetime import datetime
+from src.digital_twin.asset_models import TransformerHealth
+from src.digital_twin.health_engine import TransformerFleetHealth
+
+class LegacyTransformerHealth:
+    """Layout of TransformerHealth before __slots__ (for comparison only)."""
+    def __init__(self, asset_id):
+        self.asset_id = asset_id
+        self.health_score = 100.0
+        self.last_update = datetime.now()
+        self.max_oil_temp = 90.0
+        self.max_vib = 5.0
+        self.max_h2 = 100
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return after - before
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ids = [f"T{i:06d}" for i in range(n)]
+
+    layouts = {
+        "legacy objects (__dict__)": lambda: {a: LegacyTransformerHealth(a) for a in ids},
+        "slotted TransformerHealth": lambda: {a: TransformerHealth(a) for a in ids},
+        "TransformerFleetHealth (SoA)": lambda: TransformerFleetHealth(ids),
+    }
+    for label, build in layouts.items():
+        total = measure(build)
+        print(f"{label:>28}: {total / n:7.1f} bytes/asset ({total / 1e6:6.1f} MB for {n} assets)")
+    # Most of what is left in the columnar engine is the id -> row dict, the state itself is small
+    fleet = TransformerFleetHealth(ids)
+    state = sum(a.nbytes for a in fleet.readings.values()) + fleet.health_score.nbytes + fleet.type_code.nbytes
+    print(f"{'of which state arrays':>28}: {state / n:7.1f} bytes/asset")
+
+if __name__ == "__main__":
+    main()
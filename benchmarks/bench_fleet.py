@@ -0,0 +1,35 @@
+"""
+Fleet scaling benchmark: ticks N substation twins with 0..K worker processes.
+
+workers=0 is the in-process baseline; ideal scaling is (baseline time / workers).
+
+Usage: python -m benchmarks.bench_fleet [stations] [ticks]
+"""
+import os
+import sys
+import time
+from src.digital_twin.fleet import FleetManager
+
+def main():
+    n_stations = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    cores = os.cpu_count() or 1
+    stations = {f"S{i:03d}": "substation_alpha" for i in range(n_stations)}
+
+    worker_counts = [0] + [w for w in (1, 2, 4, 8, 16, 32) if w <= cores]
+    baseline = None
+    for workers in worker_counts:
+        fleet = FleetManager(stations, workers=workers)
+        fleet.start() # process spawn + network build excluded from the timing
+        start = time.perf_counter()
+        for _ in range(ticks):
+            fleet.tick()
+        per_tick = (time.perf_counter() - start) / ticks
+        fleet.stop()
+        baseline = baseline or per_tick
+        print(f"workers={workers:2d}: {per_tick * 1000:8.1f} ms/tick for {n_stations} stations "
+              f"(speed-up x{baseline / per_tick:4.1f})")
+    print(f"({cores} cores available)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Asset health benchmark: per-object TransformerHealth.update vs TransformerFleetHealth.
+
+Usage: python -m benchmarks.bench_health_engine [assets]
+"""
+import sys
+import time
+import numpy as np
+from src.digital_twin.asset_models import TransformerHealth
+from src.digital_twin.health_engine import TransformerFleetHealth
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = np.random.default_rng(0)
+    readings = {
+        "load_percent": rng.uniform(0, 130, n),
+        "oil_temp": rng.uniform(30, 110, n),
+        "vibration": rng.uniform(0, 8, n),
+        "h2_ppm": rng.uniform(0, 200, n),
+    }
+    ids = [f"T{i}" for i in range(n)]
+
+    objects = [TransformerHealth(a) for a in ids]
+    rows = [{k: float(v[i]) for k, v in readings.items()} for i in range(n)]
+    start = time.perf_counter()
+    scalar = [obj.update(row)["health_score"] for obj, row in zip(objects, rows)]
+    scalar_s = time.perf_counter() - start
+
+    engine = TransformerFleetHealth(ids)
+    start = time.perf_counter()
+    vector = engine.update(readings)
+    vector_s = time.perf_counter() - start
+
+    assert np.array_equal(np.asarray(scalar), vector)
+    print(f"{n} transformers: per-object {scalar_s * 1000:8.1f} ms | columnar {vector_s * 1000:6.2f} ms "
+          f"(x{scalar_s / vector_s:.0f}) | identical scores")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Telemetry history benchmark: append cost and query latency vs. window length.
+
+Fills a history with `samples` 1 Hz samples, then queries 120 buckets over windows from
+1 hour to the whole retention. Query time should stay flat (O(buckets)).
+
+Usage: python -m benchmarks.bench_history [samples]
+"""
+import sys
+import time
+import numpy as np
+from src.ingestion.history import TelemetryHistory, HISTORY_SIGNALS
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    history = TelemetryHistory(capacity=3600)
+    rng = np.random.default_rng(0)
+    values = rng.normal(50, 10, size=(samples, len(HISTORY_SIGNALS)))
+
+    start = time.perf_counter()
+    for t in range(samples):
+        history.record(float(t), dict(zip(HISTORY_SIGNALS, values[t])))
+    append_us = (time.perf_counter() - start) / samples * 1e6
+    print(f"{samples} samples appended: {append_us:.1f} us/sample, {history.nbytes / 1e6:.2f} MB resident")
+
+    for label, window in (("1 hour", 3600), ("1 day", 86400), ("7 days", 7 * 86400), ("full", samples)):
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            history.query(window=window, buckets=120)
+        print(f"  query {label:>7} / 120 buckets: {(time.perf_counter() - start) / runs * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Linear power flow benchmark: network.lpf() vs LinearFlowSolver (cached LU + PTDF).
+
+Runs N ticks with random load set-points on Substation Alpha and on a synthetic meshed
+feeder network, reporting per-tick time and the max flow deviation between the two.
+
+Usage: python -m benchmarks.bench_linear_flow [ticks] [synthetic_buses]
+"""
+import sys
+import time
+import numpy as np
+from src.digital_twin.station_scenario import create_substation_alpha
+from src.digital_twin.linear_flow import LinearFlowSolver
+
+def create_synthetic_feeder(n_buses: int, seed: int = 0):
+    """Ring-ish 20kV feeder: chain of buses plus random tie lines, a load on every bus."""
+    rng = np.random.default_rng(seed)
+    n = create_substation_alpha()
+    names = [f"B{i}" for i in range(n_buses)]
+    n.add("Bus", names, v_nom=20.0)
+    parents = ["MV_Station_Bus"] + names[:-1]
+    n.add("Line", [f"L{i}" for i in range(n_buses)], bus0=parents, bus1=names,
+          x=rng.uniform(0.05, 0.3, n_buses), r=0.05, s_nom=10.0)
+    ties = rng.choice(n_buses, size=(n_buses // 10, 2))
+    n.add("Line", [f"Tie{i}" for i in range(len(ties))], bus0=[names[a] for a in ties[:, 0]],
+          bus1=[names[b] for b in ties[:, 1]], x=0.2, r=0.05, s_nom=10.0)
+    n.add("Load", [f"Load_{i}" for i in range(n_buses)], bus=names, p_set=0.05)
+    return n
+
+def run(label: str, build, ticks: int):
+    rng = np.random.default_rng(1)
+    reference, fast = build(), build()
+    solver = LinearFlowSolver(fast)
+
+    start = time.perf_counter()
+    solver.apply() # includes the one-off factorization
+    build_ms = (time.perf_counter() - start) * 1000
+
+    lpf_s = fast_s = 0.0
+    max_err = 0.0
+    base = reference.loads.p_set.to_numpy()
+    for _ in range(ticks):
+        p = base * rng.uniform(0.5, 1.5, len(base))
+        reference.loads["p_set"] = p
+        fast.loads["p_set"] = p
+
+        t0 = time.perf_counter()
+        reference.lpf()
+        t1 = time.perf_counter()
+        solver.apply()
+        t2 = time.perf_counter()
+        lpf_s += t1 - t0
+        fast_s += t2 - t1
+        err = np.abs(reference.lines_t.p0.loc["now", reference.lines.index].to_numpy()
+                     - fast.lines_t.p0.loc["now", reference.lines.index].to_numpy()).max()
+        max_err = max(max_err, err)
+
+    print(f"{label:>22}: lpf {lpf_s / ticks * 1000:8.2f} ms/tick | fast {fast_s / ticks * 1000:6.2f} ms/tick "
+          f"(x{lpf_s / fast_s:5.1f}, first build {build_ms:.1f} ms) | max |dP| {max_err:.2e} MW")
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_buses = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    pypsa_logger = __import__("logging").getLogger("pypsa")
+    pypsa_logger.setLevel("WARNING")
+    run("Substation Alpha", create_substation_alpha, ticks)
+    run(f"Synthetic {n_buses} buses", lambda: create_synthetic_feeder(n_buses), ticks)
@@ -0,0 +1,75 @@
+"""
+Micro-batching throughput vs. batch window for concurrent chat questions.
+
+Without torch on the benchmark host the "model" is synthetic: one generate() call costs a
+fixed per-call time plus a small per-sequence increment, as a padded batch does on a GPU.
+Set ENABLE_REAL_LLM=True (with transformers/torch installed) to batch the local model instead.
+
+Each client waits a random think time (exponential, mean THINK_S) between questions, so
+arrivals are spread out and the window decides how many of them share a call.
+
+Usage: python -m benchmarks.bench_llm_batching [concurrent_clients] [requests_per_client]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.rag.batching import MicroBatcher
+
+CALL_COST_S = 0.080     # fixed cost of one generate() call (150 tokens, small model)
+PER_SEQUENCE_S = 0.004  # extra cost per sequence in the batch
+THINK_S = 0.100         # mean pause between a client's questions
+
+def synthetic_generate(requests: list) -> list:
+    time.sleep(CALL_COST_S + PER_SEQUENCE_S * len(requests))
+    return [f"answer to {query}" for _, query in requests]
+
+def batch_function():
+    if os.getenv("ENABLE_REAL_LLM", "False").lower() == "true":
+        from src.rag.llm_client import LLMClient
+        client = LLMClient()
+        if not client.mock_mode:
+            return client._generate_local_batch, "local model"
+    return synthetic_generate, "synthetic model"
+
+async def run(process_batch, window_ms: float, max_batch: int, clients: int, per_client: int):
+    executor = ThreadPoolExecutor(max_workers=1)
+    batcher = MicroBatcher(process_batch, max_batch=max_batch, window_ms=window_ms, executor=executor,
+                           name=f"bench.batch.{window_ms}.{max_batch}")
+    latencies = []
+
+    async def client(c):
+        rng = random.Random(c)
+        for i in range(per_client):
+            await asyncio.sleep(rng.expovariate(1 / THINK_S))
+            start = time.perf_counter()
+            await batcher.submit(("Relevant Data: ...", f"question {c}.{i}"))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    batcher.close()
+    executor.shutdown()
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "mean_batch": batcher.stats()["mean_batch_size"],
+    }
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    process_batch, label = batch_function()
+    print(f"{clients} concurrent clients x {per_client} questions, {label}")
+    print(f"{'max_batch':>9} {'window':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}")
+    for max_batch, window_ms in [(1, 0), (8, 0), (8, 5), (8, 20), (8, 50), (16, 50)]:
+        r = asyncio.run(run(process_batch, window_ms, max_batch, clients, per_client))
+        print(f"{max_batch:>9} {window_ms:>6}ms {r['throughput']:>8.1f} {r['p50_ms']:>8.0f} {r['p99_ms']:>8.0f} {r['mean_batch']:>6.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Event-loop stall benchmark: inline vs threaded simulation steps.
+
+Runs the stream processor flat out for a few seconds in each execution mode while a
+LoopLagMonitor measures how late the event loop wakes up. Lag is what /api/chat,
+/api/grid/status and every websocket would experience.
+
+Usage: python -m benchmarks.bench_loop_stall [seconds]
+"""
+import asyncio
+import sys
+from src.ingestion.broadcast import BroadcastHub
+from src.ingestion.stream_processor import StreamMock
+from src.metrics import LoopLagMonitor
+
+async def measure(mode: str, seconds: float) -> dict:
+    stream = StreamMock(hub=BroadcastHub(), mode=mode, interval=0.01)
+    monitor = LoopLagMonitor(interval=0.005, name=f"bench.{mode}.lag")
+    tasks = [asyncio.create_task(stream.start_stream()), asyncio.create_task(monitor.run())]
+    await asyncio.sleep(seconds)
+    stream.stop()
+    monitor.stop()
+    await asyncio.gather(*tasks)
+    return {"steps": stream.step_stats.summary(), "lag": monitor.stats.summary()}
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    for mode in ("inline", "thread"):
+        result = asyncio.run(measure(mode, seconds))
+        lag, steps = result["lag"], result["steps"]
+        print(f"{mode:>6}: sim steps={steps['count']:4d} (p50 {steps['p50_ms']:.1f} ms) | "
+              f"loop lag p50={lag['p50_ms']:.2f} ms p99={lag['p99_ms']:.2f} ms max={lag['max_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Retrieval quality and latency: dense only vs BM25 only vs hybrid (RRF) vs hybrid + rerank.
+
+Synthetic manuals corpus: one procedure per piece of equipment, with tags that differ only
+in their numbers (CB-101, CB-102, ... Feeder 1, Feeder 2, ...). Each query names one tag;
+the relevant document is that tag's procedure. By default the dense side is a hashed
+bag-of-words embedder that gives numbers a tenth of a word's weight, which reproduces how
+small sentence embedders blur near-identical tags. REAL_MODELS=1 uses EMBEDDING_MODEL and RERANK_MODEL instead
+(needs sentence-transformers).
+
+Usage: python -m benchmarks.bench_retrieval [documents] [budget_ms]
+"""
+import os
+import re
+import sys
+import time
+import zlib
+import numpy as np
+from src.rag.hybrid import BM25Index, CrossEncoderReranker, HybridRetriever
+from src.rag.vector_index import LocalVectorIndex
+
+DIM = 384
+ACTIONS = ["Inspect", "Isolate", "Trip", "Reset", "Test", "Ground"]
+EQUIPMENT = [("CB-{}", "circuit breaker"), ("Feeder {}", "feeder cable"), ("T{}", "transformer"),
+             ("DS-{}", "disconnector")]
+
+def make_corpus(n_docs: int, rng):
+    docs, queries = [], []
+    for i in range(n_docs):
+        tag_format, kind = EQUIPMENT[i % len(EQUIPMENT)]
+        tag = tag_format.format(100 + i // len(EQUIPMENT))
+        action = ACTIONS[rng.integers(len(ACTIONS))]
+        docs.append({"id": str(i), "text": f"{action} {kind} {tag}: verify interlocks, check the protection relay "
+                                           f"settings and log the {kind} inspection in the maintenance record."})
+        queries.append((f"how do I {action.lower()} {tag}?", str(i)))
+    picked = rng.choice(len(queries), size=min(200, len(queries)), replace=False)
+    return docs, [queries[i] for i in picked]
+
+def hashed_embed(texts):
+    """Bag of hashed words; numbers barely count (the dense model's blind spot for tags)."""
+    vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"[a-z]+|\d+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % DIM] += 0.1 if word.isdigit() else 1.0
+    return vectors
+
+def evaluate(name, retrieve, queries, k=3):
+    recall, reciprocal, latencies = 0, 0.0, []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        ranked = retrieve(query)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        ids = [hit["id"] for hit in ranked[:k]]
+        if relevant in ids:
+            recall += 1
+            reciprocal += 1.0 / (ids.index(relevant) + 1)
+    print(f"{name:<18} recall@{k} {recall / len(queries):5.2f} | MRR {reciprocal / len(queries):5.3f} | "
+          f"p50 {np.percentile(latencies, 50):7.3f} ms, p99 {np.percentile(latencies, 99):7.3f} ms")
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    budget_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 80.0
+    rng = np.random.default_rng(0)
+    docs, queries = make_corpus(n_docs, rng)
+
+    embed, reranker = hashed_embed, None
+    if os.getenv("REAL_MODELS") == "1":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+        embed = lambda texts: model.encode(texts, batch_size=64)
+        reranker = CrossEncoderReranker(os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"))
+
+    vectors = np.asarray(embed([d["text"] for d in docs]), dtype=np.float32)
+    index = LocalVectorIndex(vectors.shape[1])
+    index.upsert([d["id"] for d in docs], vectors, [{"text": d["text"]} for d in docs])
+    bm25 = BM25Index()
+    bm25.add([d["id"] for d in docs], [{"id": d["id"], "text": d["text"]} for d in docs])
+    hybrid = HybridRetriever(bm25, candidates=20, budget_ms=budget_ms)
+
+    def dense(query, limit=20):
+        return index.search(embed([query])[0], limit)
+
+    print(f"{n_docs} documents, {len(queries)} queries, budget {budget_ms:.0f} ms")
+    evaluate("dense", dense, queries)
+    evaluate("bm25", lambda q: [{"id": i} for i, _ in bm25.search(q, 20)], queries)
+    evaluate("hybrid (rrf)", lambda q: hybrid.retrieve(q, dense(q), 3, time.perf_counter()), queries)
+    if reranker is not None:
+        reranked = HybridRetriever(bm25, reranker=reranker, candidates=20, budget_ms=budget_ms)
+        evaluate("hybrid + rerank", lambda q: reranked.retrieve(q, dense(q), 3, time.perf_counter()), queries)
+        print(f"rerank: {reranked.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+API cold-start guard: import time of `src.main` measured with `python -X importtime`.
+
+Runs the import in fresh interpreters, prints the slowest modules (cumulative) and fails
+(exit code 1) if the best run exceeds the budget or a heavy module is imported eagerly.
+
+Usage: python -m benchmarks.bench_startup [budget_seconds] [runs]
+"""
+import subprocess
+import sys
+
+# Must only be imported on first use, never by `import src.main`
+HEAVY_MODULES = ("pypsa", "torch", "transformers", "qdrant_client", "sentence_transformers", "scipy", "pandas")
+
+def import_profile() -> dict:
+    """module -> cumulative import time (seconds) for one fresh `import src.main`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.main"],
+                            capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit(): # skip the column header
+            profile[module.strip()] = int(cumulative_us) / 1e6
+    return profile
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    profiles = [import_profile() for _ in range(runs)]
+    best = min(profiles, key=lambda p: p["src.main"])
+    total = best["src.main"]
+
+    print(f"import src.main: {total * 1000:.0f} ms (best of {runs}, budget {budget * 1000:.0f} ms)")
+    for module, seconds in sorted(best.items(), key=lambda item: -item[1])[1:11]:
+        print(f"  {seconds * 1000:8.1f} ms  {module}")
+
+    eager = [m for m in HEAVY_MODULES if m in best]
+    if eager:
+        print(f"FAIL: heavy modules imported eagerly: {eager}")
+    if total > budget:
+        print("FAIL: import time over budget")
+    if eager or total > budget:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
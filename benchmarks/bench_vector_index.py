@@ -0,0 +1,37 @@
+"""
+Local vector index: top-k search latency (one matrix-vector product + argpartition) and
+memory-mapped reopen time, at a few collection sizes.
+
+Usage: python -m benchmarks.bench_vector_index [dim]
+"""
+import sys
+import tempfile
+import time
+import numpy as np
+from src.rag.vector_index import LocalVectorIndex
+
+def main():
+    dim = int(sys.argv[1]) if len(sys.argv) > 1 else 384
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((200, dim)).astype(np.float32)
+
+    for n in (1_000, 10_000, 100_000):
+        index = LocalVectorIndex(dim)
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+        index.upsert([str(i) for i in range(n)], vectors, [{"text": f"chunk {i}"} for i in range(n)])
+        with tempfile.TemporaryDirectory() as tmp:
+            index.save(f"{tmp}/idx")
+            start = time.perf_counter()
+            index = LocalVectorIndex.open(f"{tmp}/idx", dim)
+            open_ms = (time.perf_counter() - start) * 1000.0
+            index.search(queries[0], limit=5) # page in
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, limit=5)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+        print(f"{n:>7} vectors x {dim}: open {open_ms:7.1f} ms | search p50 {np.percentile(latencies, 50):6.3f} ms, "
+              f"p99 {np.percentile(latencies, 99):6.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import copy
+from collections import OrderedDict
 import modal
 from pydantic import BaseModel
 
@@ -25,6 +27,24 @@ image = (
 # Request Model
 class QueryRequest(BaseModel):
     prompt: str
+    prefix: str | None = None # leading part of prompt shared across requests (KV-cached)
+
+PREFIX_CACHE_SIZE = 8
+
+def load_model():
+    """(tokenizer, model) on the GPU, shared by Model and BatchModel."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    model_id = "LiquidAI/LFM2-1.2B-RAG"
+    print("Loading LiquidAI Model into GPU...")
+    tokenizer = AutoTokenizer.from_pretrained(model_id, trust_remote_code=True)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_id, 
+        torch_dtype=torch.float16,
+        device_map="auto",
+        trust_remote_code=True
+    )
+    return tokenizer, model
 
 # The GPU Class
 # Updated container_idle_timeout -> scaledown_window (Modal 1.0)
@@ -33,29 +53,99 @@ class Model:
     # 2. Startup: Loads model into GPU memory
     @modal.enter()
     def setup(self):
+        self.tokenizer, self.model = load_model()
+        self.prefix_cache = OrderedDict() # prefix text -> (token ids, past key values)
+
+    def _inputs(self, prompt: str, prefix: str = None) -> dict:
+        """
+        Tokenized prompt. With a prefix (e.g. the system block of one twin snapshot), its
+        past key values are computed once and generation resumes from a copy of them,
+        so prefill only covers the rest of the prompt.
+        """
+        if not prefix or not prompt.startswith(prefix):
+            return dict(self.tokenizer(prompt, return_tensors="pt").to("cuda"))
         import torch
-        from transformers import AutoModelForCausalLM, AutoTokenizer
-        self.model_id = "LiquidAI/LFM2-1.2B-RAG"
-        print("Loading LiquidAI Model into GPU...")
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_id, trust_remote_code=True)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_id, 
-            torch_dtype=torch.float16,
-            device_map="auto",
-            trust_remote_code=True
-        )
+        if prefix in self.prefix_cache:
+            self.prefix_cache.move_to_end(prefix)
+        else:
+            ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to("cuda")
+            with torch.no_grad():
+                self.prefix_cache[prefix] = (ids, self.model(input_ids=ids, use_cache=True).past_key_values)
+            while len(self.prefix_cache) > PREFIX_CACHE_SIZE:
+                self.prefix_cache.popitem(last=False)
+        prefix_ids, past = self.prefix_cache[prefix]
+        rest = self.tokenizer(prompt[len(prefix):], return_tensors="pt", add_special_tokens=False).input_ids.to("cuda")
+        input_ids = torch.cat([prefix_ids, rest], dim=1)
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids),
+                "past_key_values": copy.deepcopy(past)}
 
     # 3. Method: The Generation Logic
     @modal.method()
-    def generate(self, prompt: str):
-        inputs = self.tokenizer(prompt, return_tensors="pt").to("cuda")
+    def generate(self, prompt: str, prefix: str = None):
+        inputs = self._inputs(prompt, prefix)
         outputs = self.model.generate(
             **inputs, 
             max_new_tokens=256,
             temperature=0.7,
             do_sample=True
         )
-        return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        new_tokens = outputs[0, inputs["input_ids"].shape[1]:] # drop the echoed prompt
+        return self.tokenizer.decode(new_tokens, skip_special_tokens=True)
+
+    # 3b. Streaming variant: yields text as tokens are generated (call with .remote_gen)
+    @modal.method()
+    def generate_stream(self, prompt: str, prefix: str = None):
+        from threading import Thread
+        from transformers import TextIteratorStreamer
+        inputs = self._inputs(prompt, prefix)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        Thread(target=self.model.generate, kwargs=dict(
+            **inputs,
+            streamer=streamer,
+            max_new_tokens=256,
+            temperature=0.7,
+            do_sample=True
+        )).start()
+        for text in streamer:
+            if text:
+                yield text
+
+    # 3c. Keep-warm target: a no-op call that keeps this GPU container from scaling down
+    @modal.method()
+    def warm(self) -> str:
+        return "ok"
+
+# 3d. Batched variant: Modal collects concurrent .remote(prompt) calls (up to 8, or 20 ms)
+# into one call, run as a single left-padded generate() on the GPU. Its own class: Modal
+# does not allow a @modal.batched method next to other @modal.method()s.
+@app.cls(image=image, gpu="T4", scaledown_window=90)
+class BatchModel:
+    @modal.enter()
+    def setup(self):
+        self.tokenizer, self.model = load_model()
+
+    # An empty prompt is a keep-warm ping (a batched class can't have a separate warm method)
+    @modal.batched(max_batch_size=8, wait_ms=20)
+    def generate_batch(self, prompts: list[str]) -> list[str]:
+        answers = [""] * len(prompts)
+        rows = [i for i, prompt in enumerate(prompts) if prompt]
+        if not rows:
+            return answers
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        inputs = self.tokenizer([prompts[i] for i in rows], return_tensors="pt", padding=True).to("cuda")
+        outputs = self.model.generate(
+            **inputs,
+            max_new_tokens=256,
+            temperature=0.7,
+            do_sample=True,
+            pad_token_id=self.tokenizer.pad_token_id
+        )
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        for i, text in zip(rows, self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)):
+            answers[i] = text
+        return answers
 
 # 4. Web Endpoint: The Interface for our Render App
 @app.function(image=image)
@@ -64,6 +154,31 @@ def api_generate(item: QueryRequest):
     """
     HTTP Endpoint reachable from anywhere (e.g. Render).
     """
-    # Spin up the GPU class and call generate
-    response = Model().generate.remote(item.prompt)
+    # Spin up the GPU class and call generate: prefix-cached when the client sends a shared
+    # prefix, otherwise batched with concurrent requests
+    if item.prefix:
+        response = Model().generate.remote(item.prompt, item.prefix)
+    else:
+        response = BatchModel().generate_batch.remote(item.prompt)
     return {"response": response}
+
+@app.function(image=image)
+@modal.fastapi_endpoint(method="POST")
+def api_generate_stream(item: QueryRequest):
+    """
+    Streaming HTTP Endpoint (chunked text/plain): set MODAL_STREAM_URL to this URL on Render.
+    """
+    from fastapi.responses import StreamingResponse
+    return StreamingResponse(Model().generate_stream.remote_gen(item.prompt, item.prefix), media_type="text/plain")
+
+@app.function(image=image)
+@modal.fastapi_endpoint(method="GET")
+def api_warm():
+    """
+    Keep-warm endpoint: set MODAL_WARM_URL to this URL on Render; the app pings it every
+    MODAL_KEEP_WARM_INTERVAL seconds (default 60, inside the 90 s scaledown window).
+    Warms both GPU classes: Model (prefix-cached/streaming) and BatchModel (plain /generate).
+    """
+    model_warm = Model().warm.spawn()
+    BatchModel().generate_batch.remote("")
+    return {"status": model_warm.get()}
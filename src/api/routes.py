@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Request, WebSocket
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.responses import StreamingResponse
 from src.rag.engine import rag_engine
 from src.digital_twin.grid_model import grid_twin
+from src.digital_twin.fleet import fleet_manager
 from src.ingestion.stream_processor import stream_processor
+from src.ingestion.broadcast import broadcast_hub
+from src.ingestion.history import telemetry_history
+from src import metrics
 from pydantic import BaseModel
+import asyncio
+import json
 
 router = APIRouter()
 
@@ -14,9 +21,22 @@ async def chat_endpoint(request: ChatRequest):
     """
     Main Chat Interface.
     """
-    result = rag_engine.process_query(request.query)
+    result = await rag_engine.aprocess_query(request.query)
     return result
 
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming chat (Server-Sent Events): `context`, then one `token` event per generated
+    chunk, then `done` with the full answer and timings.
+    """
+    async def events():
+        async for event, data in rag_engine.astream_query(request.query):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/grid/status")
 async def get_grid_status():
     """
@@ -24,41 +44,106 @@ async def get_grid_status():
     """
     return grid_twin.get_system_status()
 
+@router.get("/grid/history")
+async def get_grid_history(window: float = 3600.0, buckets: int = 120, signals: str = None):
+    """
+    Downsampled telemetry history (min/max/mean per bucket) over the last `window` seconds.
+    `signals` is a comma-separated subset, default all.
+    """
+    selected = [s.strip() for s in signals.split(",")] if signals else None
+    try:
+        return telemetry_history.query(window, buckets=min(buckets, 2000), signals=selected)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/grid/simulate")
 async def trigger_simulation(scenario: str = "overload"):
     """
     Injects a fault/scenario into the twin.
     """
-    grid_twin.inject_anomaly(scenario)
+    # Goes through the simulation worker so it is serialized with the running ticks
+    await stream_processor.run_in_sim(grid_twin.inject_anomaly, scenario)
     return {"status": "Anomaly Injected", "scenario": scenario}
 
+@router.get("/grid/stations")
+async def list_stations():
+    """
+    Station IDs hosted by the fleet, with their transformer loading.
+    """
+    statuses = await asyncio.to_thread(fleet_manager.all_statuses)
+    return {
+        "stations": [
+            {"station_id": sid, "transformer_loading_percent": s["transformer_loading_percent"], "alerts": s["alerts"]}
+            for sid, s in statuses.items()
+        ]
+    }
+
+@router.get("/grid/stations/{station_id}/status")
+async def get_station_status(station_id: str):
+    """
+    Returns the current snapshot of one substation twin.
+    """
+    try:
+        return await asyncio.to_thread(fleet_manager.station_status, station_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown station '{station_id}'")
+
+@router.post("/grid/stations/{station_id}/simulate")
+async def trigger_station_simulation(station_id: str, scenario: str = "overload"):
+    """
+    Injects a fault/scenario into one substation twin.
+    """
+    if station_id not in fleet_manager.station_ids:
+        raise HTTPException(status_code=404, detail=f"Unknown station '{station_id}'")
+    if station_id in fleet_manager.attached:
+        await stream_processor.run_in_sim(fleet_manager.inject_anomaly, station_id, scenario)
+    else:
+        await asyncio.to_thread(fleet_manager.inject_anomaly, station_id, scenario)
+    return {"status": "Anomaly Injected", "station_id": station_id, "scenario": scenario}
+
+@router.get("/grid/fleet/status")
+async def get_fleet_status():
+    """
+    Aggregated view over all substations (total load, worst loading, prefixed alerts).
+    """
+    return await asyncio.to_thread(fleet_manager.aggregate_status)
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Latency metrics (event-loop stall, simulation step time, ...) and counters (cache hit rates, ...).
+    """
+    return {"mode": stream_processor.mode, "latency": metrics.snapshot(), "counters": metrics.counters_snapshot()}
+
 # Websocket for Live Data Streaming
 @router.websocket("/ws/live")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Subscribes the socket to the shared broadcast hub.
+    Frames are produced once per tick by the stream processor, not per connection.
+    """
     await websocket.accept()
-    try:
-        # Define a callback to push data to this socket
-        async def send_data(data):
-            await websocket.send_json(data)
-            
-        # Start the stream processor if not running (Simulation)
-        # In a real app, this would be a broadcast manager
-        if not stream_processor.running:
-           # We run the stream as a background task handled by Main, 
-           # but for this demo, we'll just hook into the loop or rely on a shared state.
-           # To keep it simple, the stream runs globally, and we subscribe.
-           pass 
-           
-        # For this MVP, we'll just loop here sending data from the source
+    queue = broadcast_hub.subscribe()
+
+    async def pump_frames():
         while True:
-            import asyncio
-            # Get latest from the singleton
-            status = grid_twin.get_system_status()
-            await websocket.send_json(status)
-            await asyncio.sleep(1)
-            
-    except Exception as e:
-        print(f"WS Error: {e}")
-    finally:
-        pass
+            frame = await queue.get()
+            await websocket.send_text(frame)
 
+    async def watch_disconnect():
+        # Clients don't send anything; this only returns once the socket closes
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.create_task(pump_frames()), asyncio.create_task(watch_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"WS Error: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        broadcast_hub.unsubscribe(queue)
@@ -1,11 +1,19 @@
 from datetime import datetime
 import random
+import time
 
 class AssetHealthModel:
+    # No per-instance __dict__: the asset registry is the largest resident object
+    __slots__ = ("asset_id", "health_score", "last_update_ts")
+
     def __init__(self, asset_id: str):
         self.asset_id = asset_id
         self.health_score = 100.0 # 0-100%
-        self.last_update = datetime.now()
+        self.last_update_ts = time.time() # Epoch seconds (a float is far smaller than a datetime)
+
+    @property
+    def last_update(self) -> datetime:
+        return datetime.fromtimestamp(self.last_update_ts)
 
     def update(self, sensor_data: dict):
         pass
@@ -16,19 +24,26 @@ class TransformerHealth(AssetHealthModel):
     Inputs: Load, Oil Temperature, Vibration, Dissolved Gas (Hydrogen - H2).
     Outputs: Health Score, Estimated Remaining Life.
     """
-    def __init__(self, asset_id: str):
-        super().__init__(asset_id)
-        # Baseline physical parameters
-        self.max_oil_temp = 90.0 # Celsius
-        self.max_vib = 5.0 # mm/s
-        self.max_h2 = 100 # ppm
+    __slots__ = ()
+
+    # Baseline physical parameters (per asset type, shared by all instances)
+    max_oil_temp = 90.0 # Celsius
+    max_vib = 5.0 # mm/s
+    max_h2 = 100 # ppm
+
+    # Condition score rules (shared with the vectorized engine in health_engine.py)
+    WARN_OIL_TEMP = 85.0   # Celsius, -20 points
+    CRIT_OIL_TEMP = 95.0   # Celsius, -40 more points
+    WARN_H2 = 50.0         # ppm, -20 points
+    CRIT_H2 = 100.0        # ppm, -40 more points
+    CRITICAL_SCORE = 40.0  # Below this the asset is "Critical"
 
     def update(self, sensor_data: dict):
         """
         Calculates health based on weighted sensor inputs.
         Real world: This would be the "DGA" (Dissolved Gas Analysis) algorithm.
         """
-        self.last_update = datetime.now()
+        self.last_update_ts = time.time()
         
         # Unpack data
         load = sensor_data.get("load_percent", 0.0)
@@ -59,9 +74,9 @@ class TransformerHealth(AssetHealthModel):
         # For this demo, we make it dynamic (it's a score of Current Condition)
         
         current_condition = 100.0
-        if temp > 85 or h2 > 50:
+        if temp > self.WARN_OIL_TEMP or h2 > self.WARN_H2:
             current_condition -= 20
-        if temp > 95 or h2 > 100:
+        if temp > self.CRIT_OIL_TEMP or h2 > self.CRIT_H2:
             current_condition -= 40
             
         self.health_score = max(0.0, current_condition)
@@ -69,7 +84,7 @@ class TransformerHealth(AssetHealthModel):
         return {
             "asset_id": self.asset_id,
             "health_score": self.health_score,
-            "status": "Critical" if self.health_score < 40 else "Good"
+            "status": "Critical" if self.health_score < self.CRITICAL_SCORE else "Good"
         }
 
 # Factory
@@ -0,0 +1,246 @@
+import asyncio
+import multiprocessing as mp
+import os
+import threading
+from src.digital_twin.station_scenario import create_substation_alpha
+from src.digital_twin.grid_model import NetworkTwin, TWIN_SOLVER, grid_twin
+
+# Scenario registry: name -> function returning a PyPSA network
+SCENARIOS = {
+    "substation_alpha": create_substation_alpha,
+}
+
+def register_scenario(name: str, builder):
+    SCENARIOS[name] = builder
+
+def build_network(spec: str):
+    """A station spec is either a registered scenario name or a PyPSA network file (.nc/.h5)."""
+    if spec in SCENARIOS:
+        return SCENARIOS[spec]()
+    if os.path.exists(spec):
+        import pypsa
+        return pypsa.Network(spec)
+    raise KeyError(f"Unknown scenario or network file '{spec}'")
+
+def _fleet_worker(conn, stations: dict, solver: str):
+    """
+    Worker process: owns a shard of twins for its whole life (networks are never pickled per tick).
+    Commands arrive over a Pipe, replies are {station_id: status}.
+    """
+    twins = {}
+    for sid, spec in stations.items():
+        try:
+            twins[sid] = NetworkTwin(network=build_network(spec), solver=solver)
+        except Exception as e:
+            conn.send(("error", f"station '{sid}' failed to load: {type(e).__name__}: {e}"))
+            conn.close()
+            return
+    conn.send(("ready", {sid: twin.get_system_status() for sid, twin in twins.items()}))
+    while True:
+        command, *args = conn.recv()
+        try:
+            if command == "stop":
+                break
+            if command == "tick":
+                for twin in twins.values():
+                    twin.tick()
+            elif command == "inject":
+                station_id, scenario = args
+                twins[station_id].inject_anomaly(scenario)
+            conn.send(("ok", {sid: twin.get_system_status() for sid, twin in twins.items()}))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+class FleetManager:
+    """
+    Hosts many NetworkTwin instances (one per substation).
+
+    - `stations`: {station_id: scenario name or network file}. With workers > 0 they are sharded
+      round-robin over that many processes and ticked in parallel; with workers=0 they live in-process.
+    - `attached`: existing twins (e.g. the live `grid_twin`) that are ticked by their owner;
+      the fleet only reports them.
+    """
+    def __init__(self, stations: dict = None, workers: int = 0, attached: dict = None, solver: str = TWIN_SOLVER):
+        self.stations = dict(stations or {})
+        self.workers = min(workers, len(self.stations))
+        self.attached = dict(attached or {})
+        self.solver = solver
+        overlap = set(self.stations) & set(self.attached)
+        if overlap:
+            raise ValueError(f"Duplicate station ids: {sorted(overlap)}")
+
+        self.running = False
+        self._local = {}      # station_id -> NetworkTwin (workers=0)
+        self._shards = []     # [(process, conn, station_ids)]
+        self._statuses = {}   # station_id -> last status (replaced wholesale, read lock-free)
+        self._lock = threading.Lock()
+        self._started = False
+
+    @classmethod
+    def from_env(cls, attached: dict = None):
+        """FLEET_STATIONS="BETA=substation_alpha,GAMMA=/data/gamma.nc", FLEET_WORKERS=<processes>"""
+        stations = {}
+        for item in filter(None, os.getenv("FLEET_STATIONS", "").split(",")):
+            station_id, _, spec = item.partition("=")
+            stations[station_id.strip()] = spec.strip() or "substation_alpha"
+        workers = int(os.getenv("FLEET_WORKERS", str(os.cpu_count() or 1)))
+        return cls(stations, workers=workers, attached=attached)
+
+    @property
+    def station_ids(self):
+        return list(self.attached) + list(self.stations)
+
+    def start(self):
+        with self._lock:
+            if not self._started:
+                self._spawn()
+                self._started = True
+
+    def _spawn(self):
+        if self.workers == 0:
+            self._local = {sid: NetworkTwin(network=build_network(spec), solver=self.solver)
+                           for sid, spec in self.stations.items()}
+            self._statuses = {sid: twin.get_system_status() for sid, twin in self._local.items()}
+            return
+
+        ctx = mp.get_context("spawn") # fork is unsafe with the simulation thread running
+        ids = list(self.stations)
+        for w in range(self.workers):
+            shard = {sid: self.stations[sid] for sid in ids[w::self.workers]}
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_fleet_worker, args=(child, shard, self.solver), daemon=True)
+            process.start()
+            self._shards.append((process, parent, list(shard)))
+        statuses = {}
+        for _, conn, shard_ids in self._shards:
+            try:
+                statuses.update(self._receive(conn))
+            except (EOFError, RuntimeError) as e:
+                self._stop_shards()
+                if isinstance(e, EOFError): # died without reporting (e.g. killed, import error)
+                    e = RuntimeError(f"Fleet worker for stations {shard_ids} exited during startup")
+                raise e from None
+        self._statuses = statuses
+
+    @staticmethod
+    def _receive(conn):
+        kind, payload = conn.recv()
+        if kind == "error":
+            raise RuntimeError(f"Fleet worker failed: {payload}")
+        return payload
+
+    def tick(self) -> dict:
+        """Advances every hosted station by one step. Shards tick concurrently, one per process."""
+        self.start()
+        with self._lock:
+            if self.workers == 0:
+                for twin in self._local.values():
+                    twin.tick()
+                statuses = {sid: twin.get_system_status() for sid, twin in self._local.items()}
+            else:
+                # Fan out first, then gather: all processes solve at the same time. Every reply
+                # is read before anything is raised, so no pipe is left with an unread reply
+                sent, failed, lost = [], [], []
+                for _, conn, shard_ids in self._shards:
+                    try:
+                        conn.send(("tick",))
+                        sent.append((conn, shard_ids))
+                    except OSError:
+                        lost.append(shard_ids)
+                statuses = {}
+                for conn, shard_ids in sent:
+                    try:
+                        statuses.update(self._receive(conn))
+                    except RuntimeError as e:
+                        failed.append(str(e))
+                    except (EOFError, OSError):
+                        lost.append(shard_ids)
+                # Stations of a failed shard keep their last status
+                self._statuses = statuses = {**self._statuses, **statuses}
+                if lost:
+                    raise ConnectionError(f"Fleet worker for stations {[sid for ids in lost for sid in ids]} exited")
+                if failed:
+                    raise RuntimeError("; ".join(failed))
+                return statuses
+            self._statuses = statuses
+        return statuses
+
+    def inject_anomaly(self, station_id: str, scenario: str):
+        if station_id in self.attached:
+            return self.attached[station_id].inject_anomaly(scenario)
+        if station_id not in self.stations:
+            raise KeyError(station_id)
+        self.start()
+        with self._lock:
+            if self.workers == 0:
+                self._local[station_id].inject_anomaly(scenario)
+                self._statuses = {**self._statuses, station_id: self._local[station_id].get_system_status()}
+                return
+            for _, conn, ids in self._shards:
+                if station_id in ids:
+                    conn.send(("inject", station_id, scenario))
+                    self._statuses = {**self._statuses, **self._receive(conn)}
+
+    async def run(self, interval: float = 1.0):
+        """
+        Background ticking of hosted stations (attached twins are ticked by the stream).
+        A station failing a step is logged and the loop goes on; a lost worker stops the fleet.
+        """
+        if not self.stations:
+            return
+        self.running = True
+        while self.running:
+            try:
+                await asyncio.to_thread(self.tick)
+            except RuntimeError as e: # the other stations were still ticked
+                print(f"Fleet: Tick failed ({e}), continuing.")
+            except Exception as e:
+                print(f"Fleet: {type(e).__name__}: {e}, stopping the fleet.")
+                await asyncio.to_thread(self.stop)
+                raise
+            await asyncio.sleep(interval)
+
+    def station_status(self, station_id: str) -> dict:
+        if station_id in self.attached:
+            return self.attached[station_id].get_system_status()
+        if station_id in self.stations:
+            self.start()
+            return self._statuses[station_id]
+        raise KeyError(station_id)
+
+    def all_statuses(self) -> dict:
+        return {sid: self.station_status(sid) for sid in self.station_ids}
+
+    def aggregate_status(self) -> dict:
+        statuses = self.all_statuses()
+        loading = {sid: s["transformer_loading_percent"] for sid, s in statuses.items()}
+        return {
+            "station_count": len(statuses),
+            "total_load_mw": round(float(sum(s["total_load_mw"] for s in statuses.values())), 3),
+            "max_transformer_loading_percent": max(loading.values(), default=0.0),
+            "transformer_loading_percent": loading,
+            "alerts": [f"{sid}: {alert}" for sid, s in statuses.items() for alert in s["alerts"]],
+        }
+
+    def stop(self):
+        self.running = False
+        with self._lock: # waits for an in-flight tick round
+            self._stop_shards()
+            self._local = {}
+            self._started = False
+
+    def _stop_shards(self):
+        for process, conn, _ in self._shards:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=5)
+            if process.is_alive(): # still building its twins
+                process.terminate()
+        self._shards = []
+
+PRIMARY_STATION_ID = os.getenv("PRIMARY_STATION_ID", "ALPHA")
+
+fleet_manager = FleetManager.from_env(attached={PRIMARY_STATION_ID: grid_twin})
@@ -1,18 +1,44 @@
-import pypsa
 from src.digital_twin.station_scenario import create_substation_alpha
-import pandas as pd
-import random
+from src.digital_twin.load_profiles import LoadModel
+import numpy as np
 import logging
+import threading
+import os
+from types import MappingProxyType
+from src.lazy import LazySingleton
 
 # Suppress verbose PyPSA output
 logging.getLogger("pypsa").setLevel(logging.WARNING)
 
+# "pypsa": full network.lpf() every tick
+# "linear": cached-factorization fast path (see linear_flow.py), same results
+TWIN_SOLVER = os.getenv("TWIN_SOLVER", "pypsa")
 
 class NetworkTwin:
-    def __init__(self):
-        self.network = create_substation_alpha()
+    def __init__(self, network=None, solver: str = TWIN_SOLVER, load_categories=None, profiles=None, seed=None):
+        if solver not in ("pypsa", "linear"):
+            raise ValueError(f"Unknown solver '{solver}' (expected 'pypsa' or 'linear')")
+        self.network = network if network is not None else create_substation_alpha()
         self.time_step = 0
         self.anomaly_timer = 0
+
+        # Writers (tick / inject_anomaly) are serialized by this lock.
+        # Readers never take it: they read the last published immutable snapshot.
+        self._lock = threading.Lock()
+        self._status = None
+        self.status_version = 0
+
+        # Per-load base power / category index, resolved once (see load_profiles.py)
+        self.load_model = LoadModel(self.network.loads.index, load_categories, profiles, seed)
+
+        self.flow_solver = None
+        if solver == "linear":
+            # pandas/scipy are imported on demand so importing this module stays cheap
+            from src.digital_twin.linear_flow import LinearFlowSolver
+            if LinearFlowSolver.supports(self.network):
+                self.flow_solver = LinearFlowSolver(self.network)
+            else:
+                print("Simulation Warning: network not supported by the linear fast path. Using lpf().")
         
         # Initialize simulation physics
         # We use Linear Optimal Power Flow (LOPF) for robust solving or Newton-Raphson
@@ -24,17 +50,35 @@ class NetworkTwin:
         try:
             # Use Linear Power Flow (LPF) - Deterministic physics, no solver needed.
             # This is perfect for a robust demo without GLPK/Cbc installed.
-            self.network.lpf()
+            if self.flow_solver is not None:
+                self.flow_solver.apply()
+            else:
+                self.network.lpf()
              
         except Exception as e:
             # Fallback
             print(f"Simulation Warning: {e}. Using estimated flow.")
             pass
 
+        self._publish_status()
 
+    def _publish_status(self):
+        """
+        Builds a fresh status snapshot and swaps it in with a single reference assignment.
+        The previous snapshot is never mutated, so concurrent readers always see a consistent frame.
+        """
+        status = self._compute_status()
+        status["alerts"] = tuple(status["alerts"])
+        self.status_version += 1
+        status["version"] = self.status_version # lets consumers cache per snapshot
+        self._status = MappingProxyType(status)
 
     def tick(self):
         """Advances time by 1 'hour' (simulation step), varying loads randomly."""
+        with self._lock:
+            self._tick()
+
+    def _tick(self):
         self.time_step += 1
         
         # Handle Anomaly Duration
@@ -45,27 +89,36 @@ class NetworkTwin:
             self._run_simulation()
             return
         
-        # Simulate Day/Night Cycle effect + Random Noise
-        base_load_profile = [0.4, 0.3, 0.3, 0.4, 0.6, 0.8, 0.9, 0.9, 0.8, 0.7, 0.5, 0.4] # Simplified
-        current_profile = base_load_profile[self.time_step % len(base_load_profile)]
-        
-        # Update Loads
-        for load in self.network.loads.index:
-            noise = random.uniform(0.8, 1.2)
-            p_set_base = 5.0 # Default fallback
-            if "Residential" in load: p_set_base = 5.0
-            if "Commercial" in load: p_set_base = 4.0
-            if "Industrial" in load: p_set_base = 8.0
-            
-            new_p = p_set_base * current_profile * noise
-            self.network.loads.at[load, "p_set"] = new_p
+        # Simulate Day/Night Cycle effect + Random Noise (whole-array, one column write)
+        self.network.loads["p_set"] = self.load_model.sample(self.time_step)
 
         self._run_simulation()
+
+    def update_state(self, load_p_set):
+        """
+        Advances one step from MEASURED load values (SCADA) instead of the synthetic profile.
+        load_p_set: array in network.loads order (MW).
+        """
+        load_p_set = np.asarray(load_p_set, dtype=float)
+        if load_p_set.shape != (len(self.network.loads),):
+            raise ValueError(f"Expected {len(self.network.loads)} load values, got shape {load_p_set.shape}")
+        with self._lock:
+            self.time_step += 1
+            if self.anomaly_timer > 0:
+                self.anomaly_timer -= 1
+            else:
+                self.network.loads["p_set"] = load_p_set
+            self._run_simulation()
         
     def get_system_status(self):
-        """Returns a JSON-serializable snapshot of the grid health."""
-        # Recalculate if needed
-        
+        """
+        Returns a JSON-serializable snapshot of the grid health.
+        Lock-free: reads the snapshot published by the last simulation step.
+        """
+        status = self._status
+        return {**status, "alerts": list(status["alerts"])}
+
+    def _compute_status(self):
         status = {
             "timestamp": self.time_step,
             "total_load_mw": self.network.loads.p_set.sum(),
@@ -101,10 +154,79 @@ class NetworkTwin:
     def inject_anomaly(self, anomaly_type: str):
         """Simulate a breakage."""
         if anomaly_type == "overload":
-            # Massive spike on Industrial Load (was 25, now 50 to guarantee >100% of 40MVA)
-            self.network.loads.at["Load_Industrial", "p_set"] = 50.0 
-            # Lock this state for 20 ticks (seconds) so the user sees it
-            self.anomaly_timer = 20
+            with self._lock:
+                # Massive spike on Industrial Load (was 25, now 50 to guarantee >100% of 40MVA)
+                self.network.loads.at["Load_Industrial", "p_set"] = 50.0 
+                # Lock this state for 20 ticks (seconds) so the user sees it
+                self.anomaly_timer = 20
+                self._run_simulation()
+
+    def simulate_profile(self, load_profile):
+        """
+        Day-ahead / what-if run: solves every snapshot of a load profile in one vectorized pass.
+        Does not touch the live state (time_step, loads, published status).
+
+        load_profile: DataFrame (snapshots x load names; missing loads keep their current p_set)
+                      or ndarray (snapshots x loads, in network.loads order).
+        Returns a dict of arrays (MW and % of s_nom), one row per snapshot.
+        """
+        import pandas as pd
+        from src.digital_twin.linear_flow import LinearFlowSolver
+
+        loads = self.network.loads.index
+        if isinstance(load_profile, pd.DataFrame):
+            unknown = load_profile.columns.difference(loads)
+            if len(unknown):
+                raise KeyError(f"Unknown loads in profile: {list(unknown)}")
+            snapshots = load_profile.index
+            p_loads = (load_profile.reindex(columns=loads)
+                       .fillna(self.network.loads.p_set)
+                       .to_numpy(dtype=float))
+        else:
+            p_loads = np.atleast_2d(np.asarray(load_profile, dtype=float))
+            if p_loads.shape[1] != len(loads):
+                raise ValueError(f"Expected {len(loads)} load columns, got {p_loads.shape[1]}")
+            snapshots = pd.RangeIndex(len(p_loads))
+
+        with self._lock:
+            if LinearFlowSolver.supports(self.network):
+                solver = self.flow_solver or LinearFlowSolver(self.network)
+                branches = solver.split_branches(solver.branch_flows_many(p_loads))
+                line_flows, trafo_flows = branches["Line"], branches["Transformer"]
+            else:
+                # Fallback: PyPSA's own multi-snapshot lpf on a scratch copy
+                scratch = self.network.copy()
+                scratch.set_snapshots(snapshots)
+                scratch.loads_t.p_set = pd.DataFrame(p_loads, index=snapshots, columns=loads)
+                scratch.lpf()
+                line_flows = scratch.lines_t.p0.reindex(columns=self.network.lines.index, fill_value=0.0).to_numpy()
+                trafo_flows = scratch.transformers_t.p0.reindex(columns=self.network.transformers.index, fill_value=0.0).to_numpy()
+
+        lines, transformers = self.network.lines, self.network.transformers
+        return {
+            "snapshots": snapshots,
+            "lines": lines.index,
+            "transformers": transformers.index,
+            "line_flows_mw": line_flows,
+            "line_loading_percent": np.abs(line_flows) / lines.s_nom.to_numpy() * 100.0,
+            "transformer_flows_mw": trafo_flows,
+            "transformer_loading_percent": np.abs(trafo_flows) / transformers.s_nom.to_numpy() * 100.0,
+        }
+
+    def set_branch_status(self, branch: str, in_service: bool):
+        """
+        Breaker operation / outage on a line or transformer.
+        This is the only kind of change that invalidates the cached flow factorization.
+        """
+        with self._lock:
+            for static in (self.network.lines, self.network.transformers):
+                if branch in static.index:
+                    static.at[branch, "active"] = bool(in_service)
+                    break
+            else:
+                raise KeyError(f"Unknown branch '{branch}'")
+            if self.flow_solver is not None:
+                self.flow_solver.invalidate()
             self._run_simulation()
 
-grid_twin = NetworkTwin() # Singleton instance
+grid_twin = LazySingleton(NetworkTwin, "grid_twin") # Singleton instance, built on first use (imports PyPSA)
@@ -0,0 +1,100 @@
+import numpy as np
+from src.digital_twin.asset_models import TransformerHealth
+
+# Per-type threshold table: one row per asset type, looked up by a uint8 type code.
+# Thresholds are stored once per TYPE instead of once per asset.
+THRESHOLD_DTYPE = np.dtype([
+    ("warn_oil_temp", np.float32), ("crit_oil_temp", np.float32),
+    ("warn_h2", np.float32), ("crit_h2", np.float32),
+    ("critical_score", np.float32),
+])
+ASSET_TYPES = {"transformer": 0}
+THRESHOLDS = np.array([
+    (TransformerHealth.WARN_OIL_TEMP, TransformerHealth.CRIT_OIL_TEMP,
+     TransformerHealth.WARN_H2, TransformerHealth.CRIT_H2, TransformerHealth.CRITICAL_SCORE),
+], dtype=THRESHOLD_DTYPE)
+
+def score_transformers(oil_temp: np.ndarray, h2_ppm: np.ndarray, thresholds=None) -> np.ndarray:
+    """
+    Array form of the TransformerHealth.update condition rules.
+    `thresholds`: THRESHOLDS rows broadcast against the readings (e.g. one per asset, by type
+    code); default is the transformer row, which gives the per-object result for every element.
+    """
+    t = THRESHOLDS[ASSET_TYPES["transformer"]] if thresholds is None else thresholds
+    warn = (oil_temp > t["warn_oil_temp"]) | (h2_ppm > t["warn_h2"])
+    crit = (oil_temp > t["crit_oil_temp"]) | (h2_ppm > t["crit_h2"])
+    return np.maximum(0.0, 100.0 - 20.0 * warn - 40.0 * crit)
+
+class TransformerFleetHealth:
+    """
+    Columnar health engine for large transformer fleets.
+    Sensor readings live in one NumPy array per signal (one slot per asset) and the
+    scoring rules run over the whole fleet (or a subset of rows) in a single call.
+    Each asset has a uint8 type code into the per-type THRESHOLDS table (`asset_types`,
+    default all "transformer"); nothing else is stored per asset for the rules.
+    """
+    # Signal -> default used by TransformerHealth.update when a reading is missing
+    SIGNALS = {
+        "load_percent": 0.0,
+        "oil_temp": 40.0,
+        "vibration": 0.5,
+        "h2_ppm": 10.0,
+    }
+
+    def __init__(self, asset_ids, asset_types=None):
+        self.asset_ids = list(asset_ids)
+        self.index = {asset_id: i for i, asset_id in enumerate(self.asset_ids)}
+        n = len(self.asset_ids)
+        types = ["transformer"] * n if asset_types is None else list(asset_types)
+        if len(types) != n:
+            raise ValueError(f"{len(types)} asset types for {n} assets")
+        self.type_code = np.fromiter((ASSET_TYPES[t] for t in types), dtype=np.uint8, count=n)
+        self.readings = {signal: np.full(n, default) for signal, default in self.SIGNALS.items()}
+        self.health_score = np.full(n, 100.0)
+
+    def __len__(self):
+        return len(self.asset_ids)
+
+    def thresholds(self, rows=None) -> np.ndarray:
+        """Per-asset view of the type threshold table (a gather, nothing stored per asset)."""
+        return THRESHOLDS[self.type_code if rows is None else self.type_code[rows]]
+
+    def rows(self, asset_ids) -> np.ndarray:
+        return np.fromiter((self.index[a] for a in asset_ids), dtype=np.intp, count=len(asset_ids))
+
+    def update(self, readings: dict, rows=None) -> np.ndarray:
+        """
+        Stores a batch of readings and re-scores the affected assets.
+        readings: {signal: array}, aligned with `rows` (row positions) or with the whole fleet.
+        Signals not provided fall back to their defaults, like the per-object path.
+        Returns the new health scores for those rows.
+        """
+        unknown = set(readings) - set(self.SIGNALS)
+        if unknown:
+            raise KeyError(f"Unknown signals: {sorted(unknown)}")
+        target = slice(None) if rows is None else rows
+        for signal, default in self.SIGNALS.items():
+            self.readings[signal][target] = readings.get(signal, default)
+
+        scores = score_transformers(self.readings["oil_temp"][target], self.readings["h2_ppm"][target],
+                                    self.thresholds(target))
+        self.health_score[target] = scores
+        return scores
+
+    def status(self, rows=None) -> np.ndarray:
+        target = slice(None) if rows is None else rows
+        return np.where(self.health_score[target] < self.thresholds(target)["critical_score"], "Critical", "Good")
+
+    def critical_assets(self) -> list:
+        critical = self.health_score < self.thresholds()["critical_score"]
+        return [self.asset_ids[i] for i in np.flatnonzero(critical)]
+
+    def report(self, asset_id: str) -> dict:
+        """Same shape as TransformerHealth.update()'s return value."""
+        i = self.index[asset_id]
+        score = float(self.health_score[i])
+        return {
+            "asset_id": asset_id,
+            "health_score": score,
+            "status": "Critical" if score < THRESHOLDS[self.type_code[i]]["critical_score"] else "Good"
+        }
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+
+class LinearFlowSolver:
+    """
+    Fast-path Linear Power Flow (same physics as `network.lpf()`).
+
+    The susceptance matrix B, its sparse LU factorization and the PTDF
+    (branch flow per MW injected at each load) are built ONCE per topology.
+    A tick then only costs a matrix-vector product: flows = load_ptdf @ p_set.
+
+    Call `invalidate()` after any topology change (breaker operation, line outage,
+    impedance change). Load/generator set-point changes need no rebuild.
+    """
+    def __init__(self, network):
+        self.network = network
+        self.topology_version = 0
+        self._model = None
+
+    @staticmethod
+    def supports(network) -> bool:
+        """Linear flow only covers AC lines/transformers with loads and generators."""
+        if len(network.links) or len(network.storage_units) or len(network.stores):
+            return False
+        if len(network.transformers) and (network.transformers.phase_shift != 0).any():
+            return False
+        return True
+
+    def invalidate(self):
+        self._model = None
+        self.topology_version += 1
+
+    # --- Build (once per topology) ---
+
+    def _build(self):
+        n = self.network
+        n.calculate_dependent_values() # fills x_pu_eff like lpf() does
+
+        buses = n.buses.index
+        bus_pos = pd.Series(np.arange(len(buses)), index=buses)
+
+        branch_sets = {}
+        rows_b0, rows_b1, b_values = [], [], []
+        for component, static in (("Line", n.lines), ("Transformer", n.transformers)):
+            active = static[static.active] if "active" in static else static
+            branch_sets[component] = (static.index, static.index.get_indexer(active.index))
+            rows_b0.append(bus_pos.loc[active.bus0].to_numpy())
+            rows_b1.append(bus_pos.loc[active.bus1].to_numpy())
+            b_values.append(1.0 / active.x_pu_eff.to_numpy())
+
+        bus0 = np.concatenate(rows_b0).astype(int)
+        bus1 = np.concatenate(rows_b1).astype(int)
+        b = np.concatenate(b_values)
+        n_br, n_bus = len(b), len(buses)
+
+        # Branch-bus incidence (+1 at bus0, -1 at bus1) and B = A^T diag(b) A
+        arange = np.arange(n_br)
+        A = sp.csr_matrix(
+            (np.r_[np.ones(n_br), -np.ones(n_br)], (np.r_[arange, arange], np.r_[bus0, bus1])),
+            shape=(n_br, n_bus)
+        )
+        B = (A.T @ sp.diags(b) @ A).tocsc()
+
+        # One slack per island (line outages can split the grid)
+        n_islands, island_of_bus = connected_components(B, directed=False)
+        gens = n.generators[n.generators.active] if "active" in n.generators else n.generators
+        slack_gen_of_island = {}
+        for gen, row in gens[gens.control == "Slack"].iterrows():
+            slack_gen_of_island.setdefault(island_of_bus[bus_pos[row.bus]], gen)
+        for gen, row in gens[gens.control == "PV"].iterrows():
+            slack_gen_of_island.setdefault(island_of_bus[bus_pos[row.bus]], gen)
+
+        slack_bus = np.empty(n_islands, dtype=int)
+        for island in range(n_islands):
+            gen = slack_gen_of_island.get(island)
+            if gen is not None:
+                slack_bus[island] = bus_pos[gens.at[gen, "bus"]]
+            else:
+                slack_bus[island] = np.flatnonzero(island_of_bus == island)[0]
+
+        non_slack = np.setdiff1d(np.arange(n_bus), slack_bus)
+        lu = splu(B[non_slack][:, non_slack].tocsc())
+
+        # PTDF restricted to non-slack injections: flows = diag(b) A_ns B_red^-1 p_ns
+        bA_ns = (sp.diags(b) @ A[:, non_slack]).toarray()
+        ptdf_ns = lu.solve(np.ascontiguousarray(bA_ns.T)).T if len(non_slack) else np.zeros((n_br, 0))
+        ptdf = np.zeros((n_br, n_bus))
+        ptdf[:, non_slack] = ptdf_ns
+
+        # Injection maps: loads consume (-1), non-slack generators produce (+1)
+        loads = n.loads
+        load_bus = bus_pos.loc[loads.bus].to_numpy()
+        load_sign = -(loads.active.to_numpy(dtype=float) if "active" in loads else np.ones(len(loads)))
+        C_load = sp.csr_matrix((load_sign, (load_bus, np.arange(len(loads)))), shape=(n_bus, len(loads)))
+
+        slack_gens = set(slack_gen_of_island.values())
+        fixed_gens = [g for g in gens.index if g not in slack_gens]
+        gen_bus = bus_pos.loc[gens.loc[fixed_gens, "bus"]].to_numpy()
+        C_gen = sp.csr_matrix((np.ones(len(fixed_gens)), (gen_bus, np.arange(len(fixed_gens)))), shape=(n_bus, len(fixed_gens)))
+
+        self._model = {
+            "buses": buses,
+            "branch_sets": branch_sets,
+            "n_branches": n_br,
+            "lu": lu,
+            "non_slack": non_slack,
+            "island_of_bus": island_of_bus,
+            "slack_gens": [slack_gen_of_island.get(i) for i in range(n_islands)],
+            "load_ptdf": np.ascontiguousarray(ptdf @ C_load.toarray()),
+            "gen_ptdf": np.ascontiguousarray(ptdf @ C_gen.toarray()),
+            "C_load": C_load,
+            "C_gen": C_gen,
+            "fixed_gens": fixed_gens,
+            "loads": loads.index,
+        }
+        return self._model
+
+    @property
+    def model(self):
+        return self._model if self._model is not None else self._build()
+
+    # --- Solve (every tick) ---
+
+    @staticmethod
+    def _write_row(dynamic, attr, snapshot, columns, values):
+        """
+        Writes one snapshot row of a PyPSA time-series frame.
+        Frames grown column-by-column are unconsolidated and make `.loc` writes O(columns) in
+        Python, so the frame is rebuilt once as a single float block with the right columns.
+        """
+        frame = dynamic[attr]
+        if not frame.columns.equals(columns) or snapshot not in frame.index:
+            index = frame.index if snapshot in frame.index else frame.index.append(pd.Index([snapshot]))
+            frame = frame.reindex(index=index, columns=columns).astype(float).copy()
+            dynamic[attr] = frame
+        frame.loc[snapshot, :] = values
+
+    def _fixed_gen_p(self, model):
+        gens = self.network.generators
+        return gens.loc[model["fixed_gens"], "p_set"].to_numpy(dtype=float)
+
+    def branch_flows(self, p_load: np.ndarray) -> np.ndarray:
+        """Active-power flow at bus0 of every active branch (lines first, then transformers)."""
+        model = self.model
+        flows = model["load_ptdf"] @ p_load
+        if len(model["fixed_gens"]):
+            flows += model["gen_ptdf"] @ self._fixed_gen_p(model)
+        return flows
+
+    def branch_flows_many(self, p_loads: np.ndarray) -> np.ndarray:
+        """
+        Vectorized over snapshots: p_loads is (snapshots x loads), result is (snapshots x branches).
+        One matrix-matrix product instead of one solve per snapshot.
+        """
+        model = self.model
+        flows = np.asarray(p_loads, dtype=float) @ model["load_ptdf"].T
+        if len(model["fixed_gens"]):
+            flows += model["gen_ptdf"] @ self._fixed_gen_p(model)
+        return flows
+
+    def split_branches(self, flows: np.ndarray) -> dict:
+        """Splits (..., active branches) flows into full per-component arrays (inactive = 0)."""
+        out = {}
+        offset = 0
+        for component, (index, active_pos) in self.model["branch_sets"].items():
+            values = np.zeros(flows.shape[:-1] + (len(index),))
+            values[..., active_pos] = flows[..., offset:offset + len(active_pos)]
+            offset += len(active_pos)
+            out[component] = values
+        return out
+
+    def apply(self, snapshot="now"):
+        """
+        Solves for the network's current load p_set and writes the results where lpf() would
+        (lines_t/transformers_t p0 & p1, buses_t v_ang, slack generator p).
+        """
+        n = self.network
+        model = self.model
+        p_load = n.loads.p_set.to_numpy(dtype=float)
+        flows = self.branch_flows(p_load)
+
+        for component, values in self.split_branches(flows).items():
+            index = model["branch_sets"][component][0]
+            dynamic = n.lines_t if component == "Line" else n.transformers_t
+            self._write_row(dynamic, "p0", snapshot, index, values)
+            self._write_row(dynamic, "p1", snapshot, index, -values)
+
+        # Bus injections -> angles (one LU back-substitution) and slack dispatch per island
+        p_bus = model["C_load"] @ p_load
+        if len(model["fixed_gens"]):
+            p_bus = p_bus + model["C_gen"] @ self._fixed_gen_p(model)
+        theta = np.zeros(len(model["buses"]))
+        if len(model["non_slack"]):
+            theta[model["non_slack"]] = model["lu"].solve(p_bus[model["non_slack"]])
+        self._write_row(n.buses_t, "v_ang", snapshot, model["buses"], theta)
+
+        island_balance = np.bincount(model["island_of_bus"], weights=p_bus, minlength=len(model["slack_gens"]))
+        for island, gen in enumerate(model["slack_gens"]):
+            if gen is not None:
+                n.generators_t.p.loc[snapshot, gen] = -island_balance[island]
+        return flows
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Relative demand per simulation step (fraction of a load's base power).
+# Profiles can have any length; step t uses values[t % len(values)].
+PROFILE_LIBRARY = {
+    "default": [0.4, 0.3, 0.3, 0.4, 0.6, 0.8, 0.9, 0.9, 0.8, 0.7, 0.5, 0.4], # Simplified day/night
+    "flat": [1.0],
+    # Hourly (24 step) shapes
+    "residential_24h": [0.35, 0.3, 0.28, 0.28, 0.3, 0.4, 0.6, 0.75, 0.65, 0.55, 0.5, 0.5,
+                        0.5, 0.5, 0.52, 0.58, 0.7, 0.9, 1.0, 0.95, 0.85, 0.7, 0.55, 0.42],
+    "commercial_24h": [0.2, 0.2, 0.2, 0.2, 0.22, 0.3, 0.5, 0.75, 0.9, 0.95, 1.0, 1.0,
+                       0.95, 0.95, 1.0, 0.95, 0.9, 0.75, 0.5, 0.35, 0.28, 0.25, 0.22, 0.2],
+    "industrial_24h": [0.7, 0.7, 0.7, 0.7, 0.72, 0.8, 0.9, 1.0, 1.0, 1.0, 1.0, 0.95,
+                       0.95, 1.0, 1.0, 1.0, 0.95, 0.9, 0.85, 0.8, 0.75, 0.72, 0.7, 0.7],
+}
+
+# Load categories, matched against the load name once at construction time.
+# (keyword, base power MW, profile name). Later entries win if several keywords match.
+LOAD_CATEGORIES = [
+    ("Residential", 5.0, "default"),
+    ("Commercial", 4.0, "default"),
+    ("Industrial", 8.0, "default"),
+]
+DEFAULT_BASE_MW = 5.0 # Loads that match no category
+DEFAULT_PROFILE = "default"
+
+class LoadModel:
+    """
+    Precomputed per-load base power and category index for a set of loads.
+    Each step is whole-array work: one profile lookup per category, one noise draw for all loads.
+    """
+    def __init__(self, load_names, categories=None, profiles=None, seed=None):
+        categories = LOAD_CATEGORIES if categories is None else categories
+        self.profiles = dict(PROFILE_LIBRARY if profiles is None else profiles)
+
+        # Category 0 is the "unmatched" fallback
+        self.category_profiles = [np.asarray(self.profiles[DEFAULT_PROFILE], dtype=float)]
+        category_base = [DEFAULT_BASE_MW]
+        for _, base_mw, profile in categories:
+            if profile not in self.profiles:
+                raise KeyError(f"Unknown load profile '{profile}'")
+            self.category_profiles.append(np.asarray(self.profiles[profile], dtype=float))
+            category_base.append(base_mw)
+
+        self.category_index = np.zeros(len(load_names), dtype=np.intp)
+        for i, name in enumerate(load_names):
+            for k, (keyword, _, _) in enumerate(categories, start=1):
+                if keyword in name:
+                    self.category_index[i] = k
+        self.base_mw = np.asarray(category_base)[self.category_index]
+        self.rng = np.random.default_rng(seed)
+
+    def profile_factors(self, steps) -> np.ndarray:
+        """Per-load profile factor for one step (scalar) or many steps (array -> steps x loads)."""
+        steps = np.asarray(steps)
+        per_category = np.stack([profile[steps % len(profile)] for profile in self.category_profiles], axis=-1)
+        return per_category[..., self.category_index]
+
+    def sample(self, step, noise=(0.8, 1.2)) -> np.ndarray:
+        """New p_set vector (MW) for a single step: base * day profile * random noise."""
+        factors = self.profile_factors(step)
+        return self.base_mw * factors * self.rng.uniform(noise[0], noise[1], size=len(self.base_mw))
+
+    def sample_profile(self, start_step: int, n_steps: int, noise=(0.8, 1.2)) -> np.ndarray:
+        """(n_steps x loads) synthetic profile, e.g. for NetworkTwin.simulate_profile."""
+        factors = self.profile_factors(np.arange(start_step, start_step + n_steps))
+        return self.base_mw * factors * self.rng.uniform(noise[0], noise[1], size=factors.shape)
@@ -1,6 +1,3 @@
-import pypsa
-import pandas as pd
-import numpy as np
 
 def create_substation_alpha():
     """
@@ -13,6 +10,8 @@ def create_substation_alpha():
     - 3 Outgoing Feeders (Lines to loads)
     - 3 Loads (Residential, Commercial, Industrial)
     """
+    import pypsa # heavy (~seconds): only imported once a network is actually built
+
     network = pypsa.Network()
 
     # 1. Add Buses
@@ -0,0 +1,206 @@
+import os
+import numpy as np
+
+# Online anomaly detection on every grid/asset signal (z-score spikes, CUSUM drifts), shared by
+# the live stream, the SCADA pipeline (every decoded row) and replay
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "true").lower() == "true"
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "4.5"))
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.02"))
+CUSUM_SIGNALS = ("oil_temp", "h2_ppm") # slow trends matter most for these
+
+class OnlineAnomalyDetector:
+    """
+    Streaming anomaly detection over many signals at once, O(1) memory and work per sample
+    per signal (no raw history). State is one NumPy array per statistic, one slot per channel.
+
+    - Spikes: z-score of each sample against an exponentially weighted mean/variance
+      (Welford-style running mean/variance for the first 1/alpha samples, EWMA after).
+    - Drifts: two-sided CUSUM of the standardized residual against a slow baseline, on the
+      `cusum_channels` (e.g. H2 ppm, oil temperature), for slow trends a z-score never sees.
+
+    Events fire on entering the anomalous state; a channel re-arms once it is back in range
+    (spikes) or its CUSUM statistic falls back under the threshold (drifts, capped at 2h so
+    the statistic recovers soon after the trend stops).
+
+    Channels can be added later (`add_channels`, or named columns in `update_batch`); they
+    warm up on their own. Channels '<asset>.<signal>' with a signal in `cusum_signals` get
+    drift detection whenever they are added.
+    """
+    def __init__(self, channels, cusum_channels=(), alpha: float = 0.02, z_threshold: float = 4.5,
+                 cusum_k: float = 0.75, cusum_h: float = 10.0, warmup: int = 30, slow_ratio: float = 0.1,
+                 cusum_signals=()):
+        self.channels = []
+        self.index = {}
+        self.cusum_signals = frozenset(cusum_signals)
+        self._names, self._columns = None, None # last update_batch column names -> channel rows
+        self.alpha = alpha
+        self.slow_alpha = alpha * slow_ratio
+        self.z_threshold = z_threshold
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.warmup = warmup
+
+        self.count = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.baseline = np.zeros(0) # slow EWMA, CUSUM reference
+        self.cusum_pos = np.zeros(0)
+        self.cusum_neg = np.zeros(0)
+        self.spiking = np.zeros(0, dtype=bool)
+        self.drifting = np.zeros(0, dtype=np.int8) # +1 up, -1 down, 0 none
+        self.cusum_mask = np.zeros(0, dtype=bool)
+        self.add_channels(channels, cusum_channels)
+
+        self.samples = 0
+        self.events = 0
+
+    def __len__(self):
+        return len(self.channels)
+
+    def add_channels(self, channels, cusum_channels=()):
+        """Appends channels not monitored yet (fresh state); `cusum_channels` also get drift detection."""
+        new = [channel for channel in dict.fromkeys(channels) if channel not in self.index]
+        if not new:
+            return
+        cusum = set(cusum_channels) | {c for c in new if c.rpartition(".")[2] in self.cusum_signals}
+        for channel in new:
+            self.index[channel] = len(self.channels)
+            self.channels.append(channel)
+        k = len(new)
+        for name in ("count", "mean", "var", "baseline", "cusum_pos", "cusum_neg", "spiking", "drifting"):
+            state = getattr(self, name)
+            setattr(self, name, np.concatenate([state, np.zeros(k, dtype=state.dtype)]))
+        self.cusum_mask = np.concatenate([self.cusum_mask, np.array([c in cusum for c in new], dtype=bool)])
+
+    def update(self, values, t: float = 0.0) -> list:
+        """
+        One sample per channel (array aligned with `channels`; NaN = no reading this time).
+        Returns the anomaly events raised by this sample.
+        """
+        return self.update_batch(np.asarray(values, dtype=float)[None, :], t)
+
+    def update_batch(self, values, t, channels=None) -> list:
+        """
+        Rows of samples, oldest first: `values` is (rows, columns), `t` one time per row (or
+        one for all). `channels` names the columns when they are not exactly `self.channels`;
+        names not monitored yet are added first. Only the running mean/variance and CUSUM
+        recursions loop over rows; scoring and event detection are vectorized across them.
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        if channels is not None:
+            names = tuple(channels)
+            if names != self._names: # new layout, or columns appended since the last batch
+                self.add_channels(names)
+                self._names = names
+                self._columns = np.fromiter((self.index[c] for c in names), dtype=np.int64, count=len(names))
+            if len(self._columns) != len(self.channels) or (self._columns != np.arange(len(self.channels))).any():
+                full = np.full((len(values), len(self.channels)), np.nan)
+                full[:, self._columns] = values
+                values = full
+        rows = len(values)
+        if not rows:
+            return []
+        times = np.broadcast_to(np.asarray(t, dtype=float), (rows,))
+
+        # Per-row masks and weights depend only on which samples are present
+        seen = ~np.isnan(values)
+        x = np.where(seen, values, 0.0)
+        count = self.count + np.cumsum(seen, axis=0)
+        first = seen & (count == 1)
+        ready = seen & (count > self.warmup)
+        update = seen & ~first
+        inverse = 1.0 / np.maximum(count, 1.0)
+        weight = np.where(update, np.maximum(self.alpha, inverse), 0.0) # 0: state left as is
+        keep = 1.0 - weight
+        slow = np.where(update, np.maximum(self.slow_alpha, inverse), 0.0)
+        bound = np.where(ready, self.z_threshold, np.inf) # spikes clipped once the channel is warm
+        first_rows = first.any(axis=1)
+
+        # 1. The recursion, in place (out=) since it is the only per-row loop. Row i of
+        # means/variances/baselines is the state row i is scored against
+        means, variances, baselines = (np.empty((rows + 1, len(self.channels))) for _ in range(3))
+        means[0], variances[0], baselines[0] = self.mean, self.var, self.baseline
+        scales = np.empty_like(x)
+        limit, diff, increment, scratch = (np.empty(len(self.channels)) for _ in range(4))
+        for i in range(rows):
+            mean, var, baseline, scale = means[i], variances[i], baselines[i], scales[i]
+            if first_rows[i]:
+                np.copyto(mean, x[i], where=first[i])
+                np.copyto(baseline, x[i], where=first[i])
+            np.sqrt(var, out=scale)
+            np.maximum(np.abs(mean, out=scratch), 1.0, out=scratch)
+            np.maximum(scale, np.multiply(1e-6, scratch, out=scratch), out=scale)
+            np.multiply(bound[i], scale, out=limit)
+            np.subtract(x[i], mean, out=diff)
+            np.minimum(np.maximum(diff, np.negative(limit, out=scratch), out=diff), limit, out=diff)
+            np.multiply(weight[i], diff, out=increment)
+            np.add(mean, increment, out=means[i + 1])
+            np.add(var, np.multiply(diff, increment, out=scratch), out=scratch)
+            np.multiply(keep[i], scratch, out=variances[i + 1])
+            np.subtract(x[i], baseline, out=scratch)
+            np.add(baseline, np.multiply(slow[i], scratch, out=scratch), out=baselines[i + 1])
+        self.mean, self.var, self.baseline = means[-1].copy(), variances[-1].copy(), baselines[-1].copy()
+        means, baselines = means[:-1], baselines[:-1]
+        self.count = count[-1].astype(float)
+        self.samples += rows
+
+        # 2. Spikes: an event on entering the state, per channel against its last seen row
+        z = np.where(seen, (x - means) / scales, 0.0)
+        spike = ready & (np.abs(z) > self.z_threshold)
+        last_seen = np.maximum.accumulate(np.where(seen, np.arange(rows)[:, None], -1), axis=0)
+        before = np.vstack([np.full((1, len(self.channels)), -1), last_seen[:-1]])
+        was_spiking = np.where(before >= 0, np.take_along_axis(spike, np.maximum(before, 0), axis=0), self.spiking)
+        new_spike = spike & ~was_spiking
+        self.spiking = np.where(last_seen[-1] >= 0, spike[last_seen[-1], np.arange(len(self.channels))], self.spiking)
+
+        # 3. Drifts: CUSUM of the clipped residual (unchanged on rows without a warm sample)
+        residual = np.clip(np.where(seen, (x - baselines) / scales, 0.0), -self.z_threshold, self.z_threshold)
+        trend = ready & self.cusum_mask
+        steps = np.where(np.hstack([trend, trend]), np.hstack([residual, -residual]) - self.cusum_k, 0.0)
+        cap = 2.0 * self.cusum_h
+        cusum = np.empty_like(steps) # [positive | negative] side by side, one pass for both
+        state = np.concatenate([self.cusum_pos, self.cusum_neg])
+        for i in range(rows):
+            np.minimum(np.maximum(np.add(state, steps[i], out=cusum[i]), 0.0, out=cusum[i]), cap, out=cusum[i])
+            state = cusum[i]
+        pos, neg = np.hsplit(cusum, 2)
+        self.cusum_pos, self.cusum_neg = pos[-1].copy(), neg[-1].copy()
+        drifting = np.where(pos > self.cusum_h, 1, np.where(neg > self.cusum_h, -1, 0)).astype(np.int8)
+        previous = np.vstack([self.drifting, drifting[:-1]])
+        self.drifting = drifting[-1]
+
+        # 4. Events, in the order one update per row would give
+        found = [np.nonzero(mask) for mask in (new_spike, (drifting == 1) & (previous != 1),
+                                               (drifting == -1) & (previous != -1))]
+        row = np.concatenate([r for r, _ in found])
+        column = np.concatenate([c for _, c in found])
+        kind = np.repeat(np.arange(3), [len(r) for r, _ in found])
+        events = []
+        for j in np.lexsort((column, kind, row)):
+            r, c, k = row[j], column[j], kind[j]
+            asset, _, signal = self.channels[c].rpartition(".")
+            events.append({
+                "t": float(times[r]),
+                "channel": self.channels[c],
+                "asset": asset,
+                "signal": signal,
+                "kind": ("spike", "drift_up", "drift_down")[k],
+                "value": round(float(x[r, c]), 3),
+                "z": round(float(z[r, c] if k == 0 else residual[r, c]), 2),
+            })
+        self.events += len(events)
+        return events
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self.channels),
+            "cusum_channels": int(self.cusum_mask.sum()),
+            "samples": self.samples,
+            "events": self.events,
+            "active_spikes": int(self.spiking.sum()),
+            "active_drifts": int(np.count_nonzero(self.drifting)),
+        }
+
+def create_detector(channels=()) -> OnlineAnomalyDetector:
+    """Detector with the configured thresholds (ANOMALY_*), CUSUM on the CUSUM_SIGNALS channels."""
+    return OnlineAnomalyDetector(channels, alpha=ANOMALY_ALPHA, z_threshold=ANOMALY_Z, cusum_signals=CUSUM_SIGNALS)
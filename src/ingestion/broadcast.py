@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+
+def _json_default(obj):
+    # NumPy scalars (np.int64, np.bool_) leak out of pandas/PyPSA results
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class BroadcastHub:
+    """
+    Fan-out of live stream frames to every connected dashboard.
+    Each frame is serialized ONCE and the same string is queued for all subscribers.
+    Every subscriber gets a small bounded queue: a slow consumer loses its oldest
+    (stale) frames instead of stalling the stream or the other clients.
+    """
+    def __init__(self, max_queue: int = 2):
+        self.max_queue = max_queue
+        self.last_frame = None
+        self.frames_published = 0
+        self.frames_dropped = 0
+        self._subscribers = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        # New screens get the latest frame immediately instead of waiting a tick
+        if self.last_frame is not None:
+            queue.put_nowait(self.last_frame)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, payload: dict) -> str:
+        """Serializes the payload once and pushes it to all subscribers (never blocks)."""
+        frame = json.dumps(payload, default=_json_default)
+        self.last_frame = frame
+        self.frames_published += 1
+
+        for queue in self._subscribers:
+            if queue.full():
+                # Drop the stale frame, the client only cares about the newest state
+                try:
+                    queue.get_nowait()
+                    self.frames_dropped += 1
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(frame)
+        return frame
+
+broadcast_hub = BroadcastHub()
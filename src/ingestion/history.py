@@ -0,0 +1,214 @@
+import threading
+import numpy as np
+
+# Signals recorded from every stream frame
+HISTORY_SIGNALS = (
+    "grid_load_mw",
+    "transformer_loading_percent",
+    "oil_temp",
+    "vibration",
+    "h2_ppm",
+    "health_score",
+)
+
+def _to_json_list(values: np.ndarray) -> list:
+    # NaN (signal missing for a whole bucket) is not valid JSON
+    return [None if v != v else v for v in values.round(3).tolist()]
+
+class _Level:
+    """
+    One resolution of the history: a preallocated ring of (time, min, max, sum, count) rows,
+    one column per signal. Level `factor` N folds N raw samples into each row.
+    Missing samples (NaN) are left out: `count` is per signal, and min/max stay NaN for a
+    signal with no sample in the row (nan-aware fmin/fmax skip them).
+    """
+    def __init__(self, capacity: int, n_signals: int, factor: int):
+        self.capacity = capacity
+        self.factor = factor
+        self.t = np.zeros(capacity)
+        if factor == 1:
+            # Raw samples: min == max == sum, store them once; the count is whether it is NaN
+            self.min = self.max = self.sum = np.zeros((capacity, n_signals))
+            self.count = None
+        else:
+            self.min = np.zeros((capacity, n_signals))
+            self.max = np.zeros((capacity, n_signals))
+            self.sum = np.zeros((capacity, n_signals))
+            self.count = np.zeros((capacity, n_signals))
+        self.head = 0 # next write position
+        self.size = 0
+
+        # Aggregate still being filled (not yet pushed into the ring)
+        self.p_t = 0.0
+        self.p_count = 0 # raw samples folded in so far (the row is pushed at `factor`)
+        self.p_n = np.zeros(n_signals) # of which non-missing, per signal
+        self.p_min = np.full(n_signals, np.nan)
+        self.p_max = np.full(n_signals, np.nan)
+        self.p_sum = np.zeros(n_signals)
+
+    def push(self, t, vmin, vmax, vsum, count=None):
+        i = self.head
+        self.t[i] = t
+        self.min[i] = vmin
+        self.max[i] = vmax
+        self.sum[i] = vsum
+        if self.count is not None:
+            self.count[i] = count
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def accumulate(self, t, values, filled, seen) -> bool:
+        """
+        Folds one raw sample into the partial aggregate; True when a full row was pushed.
+        `filled` is the sample with NaN as 0, `seen` 1.0 per non-NaN signal (shared by all levels).
+        """
+        if self.p_count == 0:
+            self.p_t = t
+        np.fmin(self.p_min, values, out=self.p_min)
+        np.fmax(self.p_max, values, out=self.p_max)
+        np.add(self.p_sum, filled, out=self.p_sum)
+        np.add(self.p_n, seen, out=self.p_n)
+        self.p_count += 1
+        if self.p_count < self.factor:
+            return False
+        self.push(self.p_t, self.p_min, self.p_max, self.p_sum, self.p_n)
+        self.p_min.fill(np.nan)
+        self.p_max.fill(np.nan)
+        self.p_sum.fill(0.0)
+        self.p_n.fill(0.0)
+        self.p_count = 0
+        return True
+
+    def _segments(self):
+        """The ring in chronological order as (at most) two contiguous slices, no copying."""
+        if self.size < self.capacity:
+            return [slice(0, self.size)]
+        return [slice(self.head, self.capacity), slice(0, self.head)]
+
+    def covers(self, t0) -> bool:
+        """True if no sample at or after t0 has been overwritten yet."""
+        return self.size < self.capacity or self.t[self.head] <= t0
+
+    def count_between(self, t0, t1) -> int:
+        total = 0
+        for seg in self._segments():
+            times = self.t[seg]
+            total += np.searchsorted(times, t1, side="right") - np.searchsorted(times, t0, side="left")
+        return total + (1 if self.p_count and t0 <= self.p_t <= t1 else 0)
+
+    def between(self, t0, t1, cols):
+        """Rows with t in [t0, t1] (plus the partial aggregate), chronological. O(log N + rows)."""
+        parts = []
+        for seg in self._segments():
+            times = self.t[seg]
+            lo = seg.start + np.searchsorted(times, t0, side="left")
+            hi = seg.start + np.searchsorted(times, t1, side="right")
+            if hi <= lo:
+                continue
+            if self.count is None:
+                values = self.sum[lo:hi, cols]
+                seen = ~np.isnan(values)
+                parts.append((self.t[lo:hi], values, values, np.where(seen, values, 0.0), seen.astype(float)))
+            else:
+                parts.append((self.t[lo:hi], self.min[lo:hi, cols], self.max[lo:hi, cols],
+                              self.sum[lo:hi, cols], self.count[lo:hi, cols]))
+        if self.p_count and t0 <= self.p_t <= t1:
+            parts.append((np.array([self.p_t]), self.p_min[None, cols], self.p_max[None, cols],
+                          self.p_sum[None, cols], self.p_n[None, cols]))
+        if not parts:
+            n = len(cols)
+            return np.zeros(0), np.zeros((0, n)), np.zeros((0, n)), np.zeros((0, n)), np.zeros((0, n))
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+class TelemetryHistory:
+    """
+    Fixed-memory telemetry history for the dashboard.
+
+    Every signal is kept at several resolutions (raw, 10x, 100x, 1000x samples per row), each in
+    a preallocated NumPy ring of `capacity` rows. Appends are O(levels). A query picks the
+    finest level that has at most `buckets * MAX_FANOUT` rows in the window, so its cost is
+    O(buckets) no matter how long the retention is.
+    """
+    MAX_FANOUT = 8
+
+    def __init__(self, signals=HISTORY_SIGNALS, capacity: int = 3600, factors=(1, 10, 100, 1000)):
+        self.signals = list(signals)
+        self.columns = {s: i for i, s in enumerate(self.signals)}
+        self.levels = [_Level(capacity, len(self.signals), f) for f in factors]
+        self.latest_t = None
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        total = 0
+        for level in self.levels:
+            arrays = {id(a): a for a in (level.t, level.count, level.min, level.max, level.sum) if a is not None}
+            total += sum(a.nbytes for a in arrays.values())
+        return total
+
+    def record(self, t: float, values: dict):
+        """Appends one sample. Missing and non-finite values are stored as NaN and left out of min/max/mean."""
+        row = np.array([values.get(s, np.nan) for s in self.signals], dtype=float)
+        seen = np.isfinite(row)
+        row[~seen] = np.nan
+        filled, seen = np.where(seen, row, 0.0), seen.astype(float)
+        with self._lock:
+            if self.latest_t is not None and t < self.latest_t:
+                t = self.latest_t # rings must stay sorted (wall clock stepped back)
+            raw = self.levels[0]
+            raw.push(t, row, row, row, 1)
+            for level in self.levels[1:]:
+                level.accumulate(t, row, filled, seen)
+            self.latest_t = t
+
+    def query(self, window: float, buckets: int = 120, end: float = None, signals=None) -> dict:
+        """
+        Downsampled [end - window, end] history: per bucket start time, min, max and mean.
+        Empty buckets are omitted; a signal with no sample in a bucket reports None.
+        """
+        signals = self.signals if signals is None else list(signals)
+        unknown = [s for s in signals if s not in self.columns]
+        if unknown:
+            raise KeyError(f"Unknown signals: {unknown}")
+        buckets = max(1, int(buckets))
+        cols = [self.columns[s] for s in signals]
+
+        with self._lock:
+            if self.latest_t is None:
+                return {"buckets": [], "signals": {s: {"min": [], "max": [], "mean": []} for s in signals}}
+            t1 = self.latest_t if end is None else end
+            t0 = t1 - window
+
+            level = self.levels[-1]
+            for candidate in self.levels:
+                covers = candidate.covers(t0) or candidate is self.levels[-1]
+                if covers and candidate.count_between(t0, t1) <= buckets * self.MAX_FANOUT:
+                    level = candidate
+                    break
+            t, vmin, vmax, vsum, count = level.between(t0, t1, cols)
+
+        if len(t) == 0:
+            return {"buckets": [], "signals": {s: {"min": [], "max": [], "mean": []} for s in signals}}
+
+        # Assign rows to equal-width time buckets and reduce each group in one call
+        width = max(window, 1e-9) / buckets
+        bucket_of_row = np.minimum(((t - t0) // width).astype(np.int64), buckets - 1)
+        starts = np.flatnonzero(np.r_[True, bucket_of_row[1:] != bucket_of_row[:-1]])
+        n = np.add.reduceat(count, starts, axis=0) # per signal
+        result = {
+            "buckets": (t0 + bucket_of_row[starts] * width).round(3).tolist(),
+            "signals": {},
+        }
+        mins = np.fmin.reduceat(vmin, starts, axis=0)
+        maxs = np.fmax.reduceat(vmax, starts, axis=0)
+        with np.errstate(invalid="ignore"): # 0 / 0: no sample of that signal -> NaN -> None
+            means = np.add.reduceat(vsum, starts, axis=0) / n
+        for j, signal in enumerate(signals):
+            result["signals"][signal] = {
+                "min": _to_json_list(mins[:, j]),
+                "max": _to_json_list(maxs[:, j]),
+                "mean": _to_json_list(means[:, j]),
+            }
+        return result
+
+telemetry_history = TelemetryHistory()
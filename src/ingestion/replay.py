@@ -0,0 +1,279 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.digital_twin.health_engine import TransformerFleetHealth, score_transformers
+from src.ingestion.anomaly import ANOMALY_DETECTION, create_detector
+from src.ingestion.history import TelemetryHistory
+from src.ingestion.scada import HEADER, PointMap, frame_dtype
+from src.metrics import get_stats, Timer
+
+# --- Recorded telemetry readers ---
+# Every reader yields (timestamps, values) chunks: epoch seconds and a (rows, n_points) float
+# matrix in PointMap order. Columns missing from a recording come back as NaN.
+
+def _epoch_seconds(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy(dtype=float)
+    stamps = pd.to_datetime(column, utc=True)
+    return ((stamps - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+
+def _table_chunk(frame: pd.DataFrame, columns: list):
+    return _epoch_seconds(frame["timestamp"]), frame.reindex(columns=columns).to_numpy(dtype=float)
+
+def read_csv_chunks(path: str, point_map: PointMap, chunk_rows: int = 10_000):
+    """CSV with a 'timestamp' column (epoch s or ISO 8601) and PointMap.column_names() columns."""
+    columns = point_map.column_names()
+    wanted = set(columns) | {"timestamp"}
+    for frame in pd.read_csv(path, chunksize=chunk_rows, usecols=lambda c: c in wanted):
+        yield _table_chunk(frame, columns)
+
+def read_parquet_chunks(path: str, point_map: PointMap, chunk_rows: int = 10_000):
+    """Same layout as the CSV reader, streamed one record batch at a time (needs pyarrow)."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet replay needs 'pyarrow' (pip install pyarrow)")
+    columns = point_map.column_names()
+    parquet = pq.ParquetFile(path)
+    present = [c for c in ["timestamp", *columns] if c in parquet.schema_arrow.names]
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=present):
+        yield _table_chunk(batch.to_pandas(), columns)
+
+def read_capture_chunks(path: str, point_map: PointMap, chunk_rows: int = 10_000):
+    """Binary SCADA capture (concatenated scada.py frames), decoded one chunk per read."""
+    dtype = frame_dtype(point_map.n_points)
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        if HEADER.unpack(header)[3] != point_map.n_points:
+            raise ValueError(f"Capture has {HEADER.unpack(header)[3]} points per frame, layout expects {point_map.n_points}")
+        f.seek(0)
+        while True:
+            chunk = f.read(dtype.itemsize * chunk_rows)
+            usable = len(chunk) - len(chunk) % dtype.itemsize
+            if not usable:
+                return
+            records = np.frombuffer(chunk[:usable], dtype=dtype)
+            yield records["timestamp"].astype(float), records["values"].astype(float)
+
+READERS = {
+    ".csv": read_csv_chunks,
+    ".gz": read_csv_chunks, # .csv.gz
+    ".parquet": read_parquet_chunks,
+    ".pq": read_parquet_chunks,
+    ".scd": read_capture_chunks,
+    ".bin": read_capture_chunks,
+}
+
+def open_recording(path: str, point_map: PointMap, chunk_rows: int = 10_000):
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported recording '{path}' (expected one of {sorted(READERS)})")
+    return reader(path, point_map, chunk_rows)
+
+# --- Replay ---
+
+class TelemetryReplay:
+    """
+    Replays recorded telemetry through the grid twin and the asset models.
+
+    speed=0 runs as fast as the CPU allows; speed=N runs N x faster than recorded time
+    (1.0 = real time). Each chunk is solved as one multi-snapshot power flow
+    (NetworkTwin.simulate_profile) and scored as one array, and the live twin is then
+    moved to the last row. In paced mode the chunk is cut into one slice per UI frame.
+    Every row also goes through the anomaly detector (recorded time on the events).
+    Memory stays at one chunk no matter how long the recording is.
+    """
+    MAX_EVENTS = 1000
+
+    def __init__(self, chunks, point_map: PointMap, twin=None, assets=None, history=None,
+                 speed: float = 0.0, interval: float = 1.0, primary_asset: str = "T1_Transformer",
+                 detect_anomalies: bool = ANOMALY_DETECTION):
+        if speed < 0:
+            raise ValueError("speed must be >= 0 (0 = as fast as possible)")
+        self.chunks = chunks
+        self.point_map = point_map
+        self.twin = twin
+        self.assets = assets
+        self.history = history or TelemetryHistory()
+        self.speed = speed
+        self.interval = interval
+        self.health = TransformerFleetHealth(point_map.asset_ids)
+        self.primary = self.health.index.get(primary_asset, 0)
+        self.running = False
+        self.chunk_stats = get_stats("replay.chunk")
+        self.channels = point_map.column_names()
+        self.detector = create_detector(self.channels) if detect_anomalies else None
+
+        self.frames = 0
+        self.overload_frames = 0
+        self.health_events = [] # (timestamp, asset_id, new score) each time a score drops, first MAX_EVENTS
+        self.health_event_count = 0
+        self.anomalies = [] # first MAX_EVENTS detector events
+        self.anomaly_count = 0
+        self.first_t = None
+        self.last_t = None
+
+        # Last known value of every point: gaps in a recording hold the previous reading
+        self._last = np.full(point_map.n_points, np.nan)
+        if twin is not None:
+            self._last[point_map.load_slice] = twin.network.loads.p_set.to_numpy(dtype=float)
+        defaults = np.array(list(TransformerFleetHealth.SIGNALS.values()))
+        point_map.asset_matrix(self._last)[:] = defaults
+        self._scores = np.full(len(point_map.asset_ids), 100.0)
+
+    async def run(self, stream=None) -> dict:
+        """
+        Drives the replay to the end. With a StreamMock, twin updates go through its
+        simulation worker and every processed slice is published to its hub.
+        """
+        async def run_inline(fn, *args):
+            return fn(*args)
+        run_in_sim = stream.run_in_sim if stream is not None else run_inline
+        hub = stream.hub if stream is not None else None
+
+        self.running = True
+        wall_start = time.monotonic()
+        iterator = iter(self.chunks)
+        # Read the next chunk on a worker thread while the current one is processed
+        pending = asyncio.create_task(asyncio.to_thread(next, iterator, None))
+        try:
+            while self.running:
+                chunk = await pending
+                if chunk is None:
+                    break
+                pending = asyncio.create_task(asyncio.to_thread(next, iterator, None))
+                t, values = chunk
+                if not len(t):
+                    continue
+                if self.first_t is None:
+                    self.first_t = t[0]
+                for rows in self._slices(t):
+                    with Timer(self.chunk_stats):
+                        payload = await run_in_sim(self._apply, t[rows], values[rows])
+                    if hub is not None:
+                        hub.publish(payload)
+                    if self.speed > 0:
+                        due = wall_start + (t[rows][-1] - self.first_t) / self.speed
+                        await asyncio.sleep(max(0.0, due - time.monotonic()))
+                    else:
+                        await asyncio.sleep(0) # let the rest of the app run
+                    if not self.running:
+                        break
+        finally:
+            pending.cancel()
+            self.running = False
+        return self.summary(time.monotonic() - wall_start)
+
+    def _slices(self, t: np.ndarray):
+        if self.speed <= 0:
+            return [slice(0, len(t))]
+        # One slice per `interval` of wall time, i.e. per speed * interval recorded seconds
+        frame_of_row = ((t - self.first_t) // (self.speed * self.interval)).astype(np.int64)
+        edges = np.flatnonzero(np.diff(frame_of_row)) + 1
+        bounds = np.r_[0, edges, len(t)]
+        return [slice(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    def _apply(self, t: np.ndarray, values: np.ndarray) -> dict:
+        """Processes one slice of rows. Blocking (power flow), runs in the simulation context."""
+        pm = self.point_map
+        # 1. Fill gaps with the last known reading (vectorized forward fill)
+        values = pd.DataFrame(np.vstack([self._last, values])).ffill().to_numpy()[1:]
+        self._last = values[-1].copy()
+        loads = values[:, pm.load_slice]
+        readings = pm.asset_matrix(values) # (rows, assets, signals)
+        signal = {name: j for j, name in enumerate(pm.ASSET_SIGNALS)}
+
+        # 2. Grid: every row in one multi-snapshot solve, then the live twin moves to the last row
+        total_load = loads.sum(axis=1)
+        loading = np.full(len(t), np.nan)
+        if self.twin is not None:
+            flows = self.twin.simulate_profile(loads)
+            trafos = list(flows["transformers"])
+            if trafos:
+                column = trafos.index("T1_Transformer") if "T1_Transformer" in trafos else 0
+                loading = flows["transformer_loading_percent"][:, column]
+            self.twin.update_state(loads[-1])
+        self.overload_frames += int((loading > 90.0).sum())
+
+        # 3. Assets: score every row of every asset at once and log each drop in health
+        scores = score_transformers(readings[:, :, signal["oil_temp"]], readings[:, :, signal["h2_ppm"]],
+                                    self.health.thresholds()) # one row per asset, by type
+        dropped = scores < np.vstack([self._scores, scores[:-1]])
+        self._scores = scores[-1]
+        rows, cols = np.nonzero(dropped)
+        self.health_event_count += len(rows)
+        room = self.MAX_EVENTS - len(self.health_events)
+        if room > 0:
+            self.health_events += [(float(t[r]), pm.asset_ids[c], float(scores[r, c]))
+                                   for r, c in zip(rows[:room], cols[:room])]
+
+        last = {s: readings[-1, :, j] for s, j in signal.items()}
+        self.health.update(last)
+        if self.assets is not None:
+            for asset_id in self.assets.assets:
+                if asset_id in self.health.index:
+                    row = self.health.index[asset_id]
+                    self.assets.process_telemetry(asset_id, {s: float(v[row]) for s, v in last.items()})
+
+        # 4. Anomalies on the gap-filled rows
+        anomalies = self.detector.update_batch(values, t, self.channels) if self.detector is not None else []
+        self.anomaly_count += len(anomalies)
+        self.anomalies += anomalies[:max(0, self.MAX_EVENTS - len(self.anomalies))]
+
+        # 5. History (recorded time, so dashboard queries show the replayed period)
+        primary = readings[:, self.primary, :] if len(pm.asset_ids) else np.zeros((len(t), 0))
+        for i in range(len(t)):
+            self.history.record(float(t[i]), {
+                "grid_load_mw": total_load[i],
+                "transformer_loading_percent": loading[i],
+                "health_score": scores[i, self.primary] if len(pm.asset_ids) else np.nan,
+                **dict(zip(pm.ASSET_SIGNALS, primary[i])),
+            })
+
+        self.frames += len(t)
+        self.last_t = float(t[-1])
+        payload = {
+            "timestamp": datetime.fromtimestamp(self.last_t).isoformat(),
+            "grid": self.twin.get_system_status() if self.twin is not None else {},
+            "assets": {},
+            "anomalies": anomalies,
+            "replay": {"frames": self.frames, "speed": self.speed},
+        }
+        if len(pm.asset_ids):
+            asset_id = pm.asset_ids[self.primary]
+            payload["assets"][asset_id] = {s: float(v[self.primary]) for s, v in last.items()}
+            payload["assets"][asset_id].update(self.health.report(asset_id))
+        return payload
+
+    def stop(self):
+        self.running = False
+
+    def summary(self, wall_seconds: float) -> dict:
+        recorded = (self.last_t - self.first_t) if self.frames else 0.0
+        return {
+            "frames": self.frames,
+            "recorded_seconds": recorded,
+            "wall_seconds": wall_seconds,
+            "speedup": recorded / wall_seconds if wall_seconds > 0 else 0.0,
+            "overload_frames": self.overload_frames,
+            "health_event_count": self.health_event_count,
+            "health_events": list(self.health_events),
+            "anomaly_count": self.anomaly_count,
+            "anomalies": list(self.anomalies),
+        }
+
+def create_replay_from_env(twin, assets, history=None):
+    """STREAM_REPLAY=<recording> switches the stream to replay; STREAM_REPLAY_SPEED (0 = max)."""
+    path = os.getenv("STREAM_REPLAY")
+    if not path:
+        return None
+    asset_ids = [a for a in os.getenv("SCADA_ASSETS", "T1_Transformer").split(",") if a]
+    point_map = PointMap.for_twin(twin, asset_ids, int(os.getenv("SCADA_EXTRA_POINTS", "0")))
+    chunks = open_recording(path, point_map, int(os.getenv("STREAM_REPLAY_CHUNK", "10000")))
+    return TelemetryReplay(chunks, point_map, twin=twin, assets=assets, history=history,
+                           speed=float(os.getenv("STREAM_REPLAY_SPEED", "0")))
@@ -0,0 +1,328 @@
+import asyncio
+import os
+import struct
+import time
+from collections import defaultdict, deque
+import numpy as np
+from src.digital_twin.health_engine import TransformerFleetHealth
+from src.ingestion.anomaly import ANOMALY_DETECTION, create_detector
+from src.metrics import get_stats, Timer
+
+# --- Wire format ---
+# Little-endian frame: magic, sequence number, timestamp (epoch s), point count, float32 values.
+# Values are a full scan in PointMap order, so a batch of frames decodes with one structured view.
+FRAME_MAGIC = b"SCD1"
+HEADER = struct.Struct("<4sIdI")
+
+def frame_dtype(n_points: int) -> np.dtype:
+    return np.dtype([
+        ("magic", "S4"), ("seq", "<u4"), ("timestamp", "<f8"), ("n_points", "<u4"),
+        ("values", "<f4", (n_points,)),
+    ])
+
+def encode_frame(seq: int, timestamp: float, values) -> bytes:
+    values = np.asarray(values, dtype="<f4")
+    return HEADER.pack(FRAME_MAGIC, seq & 0xFFFFFFFF, timestamp, len(values)) + values.tobytes()
+
+class FrameDecoder:
+    """Decodes batches of frames into preallocated arrays (no per-point Python work)."""
+    def __init__(self, n_points: int, batch_size: int):
+        self.n_points = n_points
+        self.dtype = frame_dtype(n_points)
+        self.values = np.zeros((batch_size, n_points), dtype=np.float32)
+        self.timestamps = np.zeros(batch_size)
+        self.seq = np.zeros(batch_size, dtype=np.uint32)
+
+    def decode(self, frames: list) -> int:
+        if len(frames) > len(self.values):
+            raise ValueError(f"Batch of {len(frames)} frames exceeds decoder capacity {len(self.values)}")
+        buffer = b"".join(frames)
+        if len(buffer) != len(frames) * self.dtype.itemsize:
+            raise ValueError(f"Malformed batch: expected {self.dtype.itemsize}-byte frames of {self.n_points} points")
+        records = np.frombuffer(buffer, dtype=self.dtype)
+        if (records["magic"] != FRAME_MAGIC).any():
+            raise ValueError("Malformed batch: bad frame magic")
+        n = len(records)
+        self.values[:n] = records["values"]
+        self.timestamps[:n] = records["timestamp"]
+        self.seq[:n] = records["seq"]
+        return n
+
+    def is_valid(self, frame: bytes) -> bool:
+        """Right size and magic: the per-frame check behind decode()'s batch-wide ValueError."""
+        return len(frame) == self.dtype.itemsize and frame[:len(FRAME_MAGIC)] == FRAME_MAGIC
+
+# --- Point layout ---
+
+class PointMap:
+    """
+    Frame layout: [load p_set (MW) per load] + [the TransformerFleetHealth signals per asset]
+    + `extra_points` unmapped telemetry (breaker states, voltages, ...).
+    """
+    ASSET_SIGNALS = tuple(TransformerFleetHealth.SIGNALS)
+
+    def __init__(self, load_names, asset_ids, extra_points: int = 0):
+        self.load_names = list(load_names)
+        self.asset_ids = list(asset_ids)
+        self.load_slice = slice(0, len(self.load_names))
+        start = len(self.load_names)
+        self.asset_slice = slice(start, start + len(self.asset_ids) * len(self.ASSET_SIGNALS))
+        self.n_points = self.asset_slice.stop + extra_points
+
+    @classmethod
+    def for_twin(cls, twin, asset_ids, extra_points: int = 0):
+        return cls(twin.network.loads.index, asset_ids, extra_points)
+
+    def column_names(self) -> list:
+        """Tabular (CSV/Parquet) name of every point: load name, '<asset>.<signal>', 'extra_<i>'."""
+        names = list(self.load_names)
+        names += [f"{asset_id}.{signal}" for asset_id in self.asset_ids for signal in self.ASSET_SIGNALS]
+        names += [f"extra_{i}" for i in range(self.n_points - self.asset_slice.stop)]
+        return names
+
+    def asset_matrix(self, values: np.ndarray) -> np.ndarray:
+        """(..., n_points) -> (..., assets, signals) view."""
+        return values[..., self.asset_slice].reshape(values.shape[:-1] + (len(self.asset_ids), len(self.ASSET_SIGNALS)))
+
+# --- Sources (async iterators of raw frames) ---
+
+class FileReplaySource:
+    """Replays a capture file of concatenated frames, read in chunks (constant memory)."""
+    def __init__(self, path: str, chunk_frames: int = 256, loop: bool = False):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.loop = loop
+
+    async def frames(self):
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            frame_size = HEADER.size + 4 * HEADER.unpack(header)[3]
+            f.seek(0)
+            while True:
+                chunk = await asyncio.to_thread(f.read, frame_size * self.chunk_frames)
+                if not chunk:
+                    if not self.loop:
+                        return
+                    f.seek(0)
+                    continue
+                for offset in range(0, len(chunk) - frame_size + 1, frame_size):
+                    yield chunk[offset:offset + frame_size]
+
+class TcpSource:
+    """Reads frames from a TCP stream. Not reading = TCP flow control pushes back on the sender."""
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+
+    async def frames(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                body = await reader.readexactly(4 * HEADER.unpack(header)[3])
+                yield header + body
+        except asyncio.IncompleteReadError:
+            return
+        finally:
+            writer.close()
+
+class InProcessBus:
+    """
+    MQTT-like in-process stand-in: topics with bounded subscriber queues.
+    `publish` waits while a subscriber queue is full (backpressure instead of unbounded memory).
+    """
+    def __init__(self):
+        self._topics = defaultdict(list)
+
+    def subscribe(self, topic: str, maxsize: int = 1024):
+        queue = asyncio.Queue(maxsize=maxsize)
+        self._topics[topic].append(queue)
+        return BusSource(queue)
+
+    async def publish(self, topic: str, frame: bytes):
+        for queue in self._topics[topic]:
+            await queue.put(frame)
+
+    async def close(self, topic: str):
+        for queue in self._topics.pop(topic, []):
+            await queue.put(None)
+
+class BusSource:
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    async def frames(self):
+        while True:
+            frame = await self.queue.get()
+            if frame is None:
+                return
+            yield frame
+
+scada_bus = InProcessBus()
+
+def create_source(url: str):
+    """file:/path/capture.scd | tcp://host:port | bus:topic"""
+    scheme, _, rest = url.partition(":")
+    if scheme == "file":
+        return FileReplaySource(rest.removeprefix("//"), loop=True)
+    if scheme == "tcp":
+        host, _, port = rest.removeprefix("//").rpartition(":")
+        return TcpSource(host, int(port))
+    if scheme == "bus":
+        return scada_bus.subscribe(rest)
+    raise ValueError(f"Unsupported SCADA source '{url}'")
+
+# --- Pipeline ---
+
+class ScadaIngestion:
+    """
+    Source -> bounded frame queue -> batch decode -> grid twin + asset health.
+
+    The reader stops pulling from the source while the queue is full (backpressure). The
+    consumer takes whatever is queued (up to `batch_size`) as one batch, so batches grow
+    under load and stay small when the feed is slow.
+
+    Every decoded row (not only the newest) goes through the anomaly detector, one batch per
+    call; events wait in `anomalies` until the stream publishes them (`drain_anomalies`).
+    """
+    MAX_PENDING_ANOMALIES = 1000
+
+    def __init__(self, source, point_map: PointMap, twin=None, assets=None, batch_size: int = 256,
+                 queue_frames: int = 4096, min_twin_interval: float = 0.0,
+                 detect_anomalies: bool = ANOMALY_DETECTION):
+        self.source = source
+        self.point_map = point_map
+        self.twin = twin
+        self.assets = assets # AssetManager: objects with the same id are kept in sync
+        self.batch_size = batch_size
+        self.queue_frames = queue_frames
+        self.min_twin_interval = min_twin_interval
+
+        self.decoder = FrameDecoder(point_map.n_points, batch_size)
+        self.health = TransformerFleetHealth(point_map.asset_ids)
+        self.latest = None
+        self.frames_processed = 0
+        self.frames_dropped = 0 # malformed (truncated, bad magic, wrong point count)
+        self.batches_processed = 0
+        self.twin_updates = 0
+        self.running = False
+        self.batch_stats = get_stats("ingestion.batch")
+        self._last_twin_update = 0.0
+        self._task = None
+        # Column names of the detector input; points appended to the layout later are picked up
+        self.channels = point_map.column_names()
+        self.detector = create_detector(self.channels) if detect_anomalies else None
+        self.anomalies = deque(maxlen=self.MAX_PENDING_ANOMALIES)
+        # Assets also modelled as objects in the AssetManager (usually a handful)
+        self._tracked = [(a, self.health.index[a]) for a in (assets.assets if assets else {}) if a in self.health.index]
+
+        async def run_inline(fn, *args):
+            return fn(*args)
+        self.run_in_sim = run_inline # StreamMock.attach() routes twin updates to its worker
+
+    async def run(self):
+        self.running = True
+        self._task = asyncio.current_task()
+        queue = asyncio.Queue(maxsize=self.queue_frames)
+        reader = asyncio.create_task(self._read(queue))
+        try:
+            await self._consume(queue)
+        finally:
+            reader.cancel()
+            self.running = False
+
+    async def _read(self, queue: asyncio.Queue):
+        try:
+            async for frame in self.source.frames():
+                await queue.put(frame)
+        except asyncio.CancelledError:
+            # run() is stopping: nothing drains the queue any more, so never wait on it
+            if not queue.full():
+                queue.put_nowait(None)
+            raise
+        except Exception as e:
+            print(f"SCADA: Source failed ({e}), stopping ingestion.")
+        await queue.put(None)
+
+    async def _consume(self, queue: asyncio.Queue):
+        done = False
+        while not done:
+            frame = await queue.get()
+            if frame is None:
+                return
+            frames = [frame]
+            while len(frames) < self.batch_size and not queue.empty():
+                frame = queue.get_nowait()
+                if frame is None:
+                    done = True
+                    break
+                frames.append(frame)
+            with Timer(self.batch_stats):
+                n = self._decode(frames)
+                if n:
+                    await self._apply(n)
+
+    def _decode(self, frames: list) -> int:
+        """Decodes the batch; if it is malformed, drops (and counts) only the bad frames."""
+        try:
+            return self.decoder.decode(frames)
+        except ValueError as e:
+            valid = [frame for frame in frames if self.decoder.is_valid(frame)]
+            self.frames_dropped += len(frames) - len(valid)
+            print(f"SCADA: Dropped {len(frames) - len(valid)} malformed frame(s) ({e}).")
+            return self.decoder.decode(valid) if valid else 0
+
+    async def _apply(self, n: int):
+        pm = self.point_map
+        values = self.decoder.values
+        last = values[n - 1].astype(float)
+
+        # Anomalies: all n rows at once, off the event loop (the decoder buffer is not reused
+        # before this returns)
+        if self.detector is not None:
+            events = await asyncio.to_thread(self.detector.update_batch, values[:n],
+                                             self.decoder.timestamps[:n], self.channels)
+            self.anomalies.extend(events)
+
+        # Asset health: only the newest reading matters for the (stateless) condition score
+        readings = pm.asset_matrix(last)
+        self.health.update({signal: readings[:, j] for j, signal in enumerate(pm.ASSET_SIGNALS)})
+        tracked = {asset_id: dict(zip(pm.ASSET_SIGNALS, readings[row].tolist())) for asset_id, row in self._tracked}
+        for asset_id, data in tracked.items():
+            self.assets.process_telemetry(asset_id, data)
+
+        loads = last[pm.load_slice]
+        now = time.monotonic()
+        if self.twin is not None and now - self._last_twin_update >= self.min_twin_interval:
+            self._last_twin_update = now
+            await self.run_in_sim(self.twin.update_state, loads)
+            self.twin_updates += 1
+
+        self.latest = {
+            "timestamp": float(self.decoder.timestamps[n - 1]),
+            "seq": int(self.decoder.seq[n - 1]),
+            "loads": loads,
+            "assets": tracked,
+        }
+        self.frames_processed += n
+        self.batches_processed += 1
+
+    def drain_anomalies(self) -> list:
+        """Events raised since the last call, oldest first (the newest MAX_PENDING_ANOMALIES)."""
+        return [self.anomalies.popleft() for _ in range(len(self.anomalies))]
+
+    def stop(self):
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+
+def create_ingestion_from_env(twin, assets):
+    """SCADA_SOURCE=<url> enables the pipeline; SCADA_ASSETS / SCADA_EXTRA_POINTS define the layout."""
+    url = os.getenv("SCADA_SOURCE")
+    if not url:
+        return None
+    asset_ids = [a for a in os.getenv("SCADA_ASSETS", "T1_Transformer").split(",") if a]
+    point_map = PointMap.for_twin(twin, asset_ids, int(os.getenv("SCADA_EXTRA_POINTS", "0")))
+    return ScadaIngestion(create_source(url), point_map, twin=twin, assets=assets)
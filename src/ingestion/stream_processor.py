@@ -1,63 +1,179 @@
 import asyncio
 import random
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from src.digital_twin.grid_model import grid_twin
 from src.digital_twin.asset_models import asset_manager
+from src.ingestion.broadcast import broadcast_hub
+from src.ingestion.history import telemetry_history
+from src.ingestion.anomaly import ANOMALY_DETECTION, create_detector
+from src.metrics import get_stats, register_counters, Timer
+
+# "thread": simulation steps run on a dedicated worker thread (event loop stays responsive)
+# "inline": legacy behaviour, the power-flow solve runs directly on the event loop
+SIM_EXECUTION_MODE = os.getenv("SIM_EXECUTION_MODE", "thread")
+
+# Grid signals the live stream runs anomaly detection on (settings in anomaly.py)
+GRID_SIGNALS = ("total_load_mw", "transformer_loading_percent")
 
 class StreamMock:
     """
     Simulates a Real-Time Data Stream (e.g. from Kafka/MQTT).
     Generates 1-second interval telemetry for the Station.
     """
-    def __init__(self):
+    def __init__(self, hub=None, mode: str = SIM_EXECUTION_MODE, interval: float = 1.0, history=None):
+        if mode not in ("thread", "inline"):
+            raise ValueError(f"Unknown execution mode '{mode}' (expected 'thread' or 'inline')")
         self.running = False
+        self.hub = hub or broadcast_hub
+        self.history = history or telemetry_history
+        self.mode = mode
+        self.interval = interval
+        self._executor = None
+        self.step_stats = get_stats("stream.sim_step")
+        self.ingestion = None
+        self.replay = None # TelemetryReplay (replay.py): recorded telemetry instead of the live loop
+        self.anomaly_detection = ANOMALY_DETECTION
+        self.detector = None # built on the first frame; signals are added as they appear
+        self.detect_stats = get_stats("stream.anomaly_detect")
+
+    def attach(self, ingestion):
+        """
+        Use a real SCADA pipeline (see scada.py) instead of simulated telemetry.
+        The pipeline feeds the twin itself, through this stream's simulation worker.
+        """
+        self.ingestion = ingestion
+        ingestion.run_in_sim = self.run_in_sim
+
+    async def run_in_sim(self, fn, *args):
+        """
+        Runs a twin mutation in the simulation context.
+        In thread mode all writers share one worker, so they never contend with a running tick.
+        """
+        if self.mode == "inline":
+            return fn(*args)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="twin-sim")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
 
     async def start_stream(self, callback_ws=None):
         self.running = True
-        print("Data Stream Started...")
+        if self.replay is not None:
+            print(f"Replay Started (speed {self.replay.speed or 'max'})...")
+            summary = await self.replay.run(self)
+            print(f"Replay Finished: {summary['frames']} frames, {summary['speedup']:.0f}x real time, "
+                  f"{summary['health_event_count']} health events, {summary['anomaly_count']} anomalies")
+            self.running = False
+            return
+        print(f"Data Stream Started ({self.mode} mode)...")
         while self.running:
+            # 1-3. Telemetry + Twin physics (off the event loop in thread mode)
+            payload = await self.run_in_sim(self._step)
+
+            # 4. Push to UI/Websocket
+            # Serialized once, fanned out to every /ws/live subscriber
+            self.hub.publish(payload)
+
+            if callback_ws:
+                await callback_ws(payload)
+
+            await asyncio.sleep(self.interval) # 1Hz Data Rate
+
+    def _step(self):
+        """One simulation step. Blocking (power flow), so it is never awaited directly."""
+        with Timer(self.step_stats):
             # 1. Generate Telemetry
             telemetry = self._generate_data()
-            
+
             # 2. Feed Digital Twin (Network)
-            # In a real app, this would be `grid_twin.update_state(telemetry)`
-            # Here we just tick the simulation
-            grid_twin.tick()
+            # With a SCADA pipeline attached the twin is already fed from measurements
+            # (grid_twin.update_state); otherwise we just tick the simulation
+            if not telemetry:
+                grid_twin.tick()
             network_status = grid_twin.get_system_status()
-            
+
             # 3. Feed Asset Twins (Physical)
             # Use data from the Network Twin (Load) + Simulated Asset Sensors (Temp)
             t1_load = network_status["transformer_loading_percent"]
-            
-            # Simulate Oil Temp correlation with Load
-            sim_oil_temp = 40 + (t1_load * 0.5) + random.uniform(-2, 2)
-            
-            asset_data = {
-                "load_percent": t1_load,
-                "oil_temp": sim_oil_temp,
-                "vibration": random.uniform(0.1, 1.2),
-                "h2_ppm": random.uniform(5, 15)
-            }
-            
+
+            measured = telemetry.get("assets", {}).get("T1_Transformer")
+            if measured:
+                asset_data = measured
+            else:
+                # Simulate Oil Temp correlation with Load
+                sim_oil_temp = 40 + (t1_load * 0.5) + random.uniform(-2, 2)
+
+                asset_data = {
+                    "load_percent": t1_load,
+                    "oil_temp": sim_oil_temp,
+                    "vibration": random.uniform(0.1, 1.2),
+                    "h2_ppm": random.uniform(5, 15)
+                }
+
             health_status = asset_manager.process_telemetry("T1_Transformer", asset_data)
-            
-            # 4. Push to UI/Websocket
-            payload = {
+            anomalies = self._detect(network_status, {} if measured else {"T1_Transformer": asset_data}) \
+                if self.anomaly_detection else []
+            if self.ingestion is not None:
+                # Measured signals are checked by the pipeline itself, at the full ingest rate
+                anomalies = self.ingestion.drain_anomalies() + anomalies
+
+            # 4. Keep a downsampled-queryable history (fixed memory)
+            self.history.record(time.time(), {
+                "grid_load_mw": network_status["total_load_mw"],
+                "transformer_loading_percent": t1_load,
+                "health_score": health_status["health_score"],
+                **asset_data,
+            })
+
+            return {
                 "timestamp": datetime.now().isoformat(),
                 "grid": network_status,
-                "assets": {"T1_Transformer": {**asset_data, **health_status}}
+                "assets": {"T1_Transformer": {**asset_data, **health_status}},
+                "anomalies": anomalies,
             }
-            
-            if callback_ws:
-                await callback_ws(payload)
-                
-            await asyncio.sleep(1) # 1Hz Data Rate
+
+    def _channel_values(self, network_status: dict, assets: dict) -> dict:
+        values = {f"grid.{signal}": network_status[signal] for signal in GRID_SIGNALS}
+        for asset_id, readings in assets.items():
+            for signal, value in readings.items():
+                if isinstance(value, (int, float)):
+                    values[f"{asset_id}.{signal}"] = value
+        return values
+
+    def _detect(self, network_status: dict, assets: dict) -> list:
+        """Anomaly stage: one vectorized detector update across the grid and simulated asset signals."""
+        with Timer(self.detect_stats):
+            values = self._channel_values(network_status, assets)
+            if self.detector is None:
+                self.detector = create_detector()
+            names = sorted(values) # signals appearing later are added by update_batch
+            events = self.detector.update_batch([[values[c] for c in names]], time.time(), names)
+        for event in events:
+            print(f"Anomaly: {event['channel']} {event['kind']} (value {event['value']}, z {event['z']})")
+        return events
 
     def _generate_data(self):
-        return {} # Placeholder for raw SCADA frames
+        # Latest decoded SCADA frame when a pipeline is attached, else simulated
+        if self.ingestion is not None and self.ingestion.latest is not None:
+            return self.ingestion.latest
+        return {}
 
     def stop(self):
         self.running = False
+        if self.replay is not None:
+            self.replay.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
 stream_processor = StreamMock()
+register_counters("stream.anomaly",
+                  lambda: stream_processor.detector.stats() if stream_processor.detector is not None else {})
+register_counters("ingestion.anomaly", lambda: stream_processor.ingestion.detector.stats()
+                  if stream_processor.ingestion is not None and stream_processor.ingestion.detector is not None else {})
+register_counters("replay.anomaly", lambda: stream_processor.replay.detector.stats()
+                  if stream_processor.replay is not None and stream_processor.replay.detector is not None else {})
@@ -0,0 +1,36 @@
+import threading
+
+class LazySingleton:
+    """
+    Module-level singleton that is built on first use instead of at import time.
+    Attribute access is forwarded to the instance, so `from module import singleton`
+    keeps working unchanged. Creation is thread-safe (first caller builds, others wait).
+    """
+    def __init__(self, factory, name: str = None):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name or getattr(factory, "__name__", "singleton"))
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, "_instance", self._factory())
+                instance = self._instance
+        return instance
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.get(), attr, value)
+
+    def __repr__(self):
+        state = "initialized" if self.initialized else "not initialized"
+        return f"<LazySingleton {self._name} ({state})>"
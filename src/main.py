@@ -4,18 +4,62 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from src.api.routes import router as api_router
 from src.ingestion.stream_processor import stream_processor
+from src.metrics import loop_monitor
+from src.digital_twin.fleet import fleet_manager
+from src.digital_twin.grid_model import grid_twin
+from src.digital_twin.asset_models import asset_manager
+from src.ingestion.scada import create_ingestion_from_env
+from src.rag.engine import rag_engine
 from contextlib import asynccontextmanager
 import asyncio
 import os
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Run Stream Processor in background
+    # Startup: Embedding model loads in the background (the API is up before it is ready)
+    rag_engine.start_warmup()
+
+    # Real SCADA feed if SCADA_SOURCE is set, simulated telemetry otherwise
+    ingestion = create_ingestion_from_env(grid_twin, asset_manager)
+    ingestion_task = None
+    if ingestion is not None:
+        stream_processor.attach(ingestion)
+        ingestion_task = asyncio.create_task(ingestion.run())
+    # Or replay a recording (STREAM_REPLAY) through the twin instead of the live loop
+    from src.ingestion.replay import create_replay_from_env # pandas: only needed here
+    stream_processor.replay = create_replay_from_env(grid_twin, asset_manager, stream_processor.history)
+
+    # Run Stream Processor in background
     task = asyncio.create_task(stream_processor.start_stream())
+    lag_task = asyncio.create_task(loop_monitor.run())
+    # Extra substations (FLEET_STATIONS) tick in worker processes
+    await asyncio.to_thread(fleet_manager.start)
+    fleet_task = asyncio.create_task(fleet_manager.run())
+    # Keep the Modal GPU container warm between questions (MODAL_WARM_URL)
+    warm_task = None
+    if os.getenv("MODAL_WARM_URL"):
+        from src.rag.llm_client import llm_client
+        client = await asyncio.to_thread(llm_client.get) # may load the local model: off the loop
+        warm_task = asyncio.create_task(client.keep_warm.run())
     print("System: Live Data Stream Started.")
     yield
     # Shutdown
     stream_processor.stop()
+    if ingestion_task is not None:
+        ingestion.stop()
+        ingestion_task.cancel() # also if run() never got to start
+        await asyncio.gather(ingestion_task, return_exceptions=True)
+    loop_monitor.stop()
+    fleet_manager.stop()
+    for background in (lag_task, fleet_task):
+        background.cancel() # both sleep between rounds
+    await asyncio.gather(lag_task, fleet_task, return_exceptions=True)
+    if warm_task is not None:
+        warm_task.cancel() # usually asleep between pings
+        await asyncio.gather(warm_task, return_exceptions=True)
+    from src.rag.llm_client import llm_client
+    if llm_client.initialized:
+        await llm_client.aclose()
     print("System: Stream Stopped.")
 
 app = FastAPI(
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+class LatencyStats:
+    """
+    Rolling latency window (milliseconds) with cheap percentile summaries.
+    Only the last `window` samples are kept, so memory stays constant.
+    """
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.max_ms = 0.0
+
+    def record(self, value_ms: float):
+        with self._lock:
+            self._samples.append(value_ms)
+            self.count += 1
+            if value_ms > self.max_ms:
+                self.max_ms = value_ms
+
+    def percentile(self, q: float):
+        """q-th percentile (0-100) of the window, or None while it is empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100.0))]
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": self.count, "mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": self.max_ms}
+        return {
+            "count": self.count,
+            "mean_ms": round(sum(samples) / len(samples), 3),
+            "p50_ms": round(samples[len(samples) // 2], 3),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+class Timer:
+    """Context manager that records elapsed wall time into a LatencyStats."""
+    def __init__(self, stats: LatencyStats):
+        self.stats = stats
+        self.elapsed_ms = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed_ms = (time.perf_counter() - self._start) * 1000.0
+        self.stats.record(self.elapsed_ms)
+        return False
+
+# Global registry: name -> LatencyStats (exposed on /api/metrics)
+_registry = {}
+_registry_lock = threading.Lock()
+
+def get_stats(name: str) -> LatencyStats:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LatencyStats()
+        return _registry[name]
+
+def snapshot() -> dict:
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: stats.summary() for name, stats in sorted(items)}
+
+# Counter providers: name -> zero-arg callable returning a dict (cache hit rates, sizes, ...)
+_counters = {}
+
+def register_counters(name: str, provider):
+    with _registry_lock:
+        _counters[name] = provider
+
+def counters_snapshot() -> dict:
+    with _registry_lock:
+        items = list(_counters.items())
+    return {name: provider() for name, provider in sorted(items)}
+
+class LoopLagMonitor:
+    """
+    Measures event-loop stalls: sleeps `interval` seconds and records how late it woke up.
+    Anything running synchronously on the loop (e.g. a power-flow solve) shows up as lag.
+    """
+    def __init__(self, interval: float = 0.05, name: str = "event_loop.lag"):
+        self.interval = interval
+        self.stats = get_stats(name)
+        self.running = False
+
+    async def run(self):
+        self.running = True
+        loop = asyncio.get_running_loop()
+        while self.running:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - start - self.interval
+            self.stats.record(max(0.0, lag) * 1000.0)
+
+    def stop(self):
+        self.running = False
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+def state_fingerprint(status: dict, t1_health: float, load_band: float = 10.0) -> tuple:
+    """
+    Coarse grid state an answer depends on: active alerts, T1 health band (20 points wide)
+    and T1 loading band (`load_band` percent wide). Small fluctuations map to the same value.
+    """
+    return (
+        tuple(sorted(status["alerts"])),
+        min(int(t1_health // 20), 4), # 80-100 is one band
+        int(status["transformer_loading_percent"] // load_band),
+    )
+
+def _unit(vector):
+    if vector is None:
+        return None
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+class SemanticAnswerCache:
+    """
+    Generated answers keyed on (grid state fingerprint, question).
+
+    A question matches a cached one in the same fingerprint if the normalized text is
+    identical or the embeddings' cosine similarity is >= `threshold`. The whole cache is
+    dropped whenever the alert set changes. LRU eviction beyond `maxsize`, TTL expiry.
+    """
+    def __init__(self, threshold: float = 0.95, maxsize: int = 512, ttl: float = 900.0):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict() # id -> (fingerprint, text_key, unit vector, answer, stored_at)
+        self._next_id = 0
+        self._alerts = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _observe_alerts(self, fingerprint: tuple):
+        alerts = fingerprint[0]
+        if self._alerts is not None and alerts != self._alerts and self._entries:
+            self._entries.clear()
+            self.invalidations += 1
+        self._alerts = alerts
+
+    def get(self, fingerprint: tuple, text_key: str, vector=None):
+        unit = _unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            self._observe_alerts(fingerprint)
+            best, best_similarity, expired = None, self.threshold, []
+            for entry_id, (entry_fp, entry_text, entry_vector, _, stored_at) in self._entries.items():
+                if now - stored_at >= self.ttl:
+                    expired.append(entry_id)
+                    continue
+                if entry_fp != fingerprint:
+                    continue
+                if entry_text == text_key:
+                    best = entry_id
+                    break
+                if unit is not None and entry_vector is not None:
+                    similarity = float(unit @ entry_vector)
+                    if similarity >= best_similarity:
+                        best, best_similarity = entry_id, similarity
+            for entry_id in expired:
+                if entry_id != best:
+                    del self._entries[entry_id]
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best][3]
+
+    def put(self, fingerprint: tuple, text_key: str, answer: str, vector=None):
+        with self._lock:
+            self._observe_alerts(fingerprint)
+            self._entries[self._next_id] = (fingerprint, text_key, _unit(vector), answer, time.monotonic())
+            self._next_id += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
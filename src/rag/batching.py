@@ -0,0 +1,84 @@
+import asyncio
+from src.metrics import get_stats, Timer
+
+class MicroBatcher:
+    """
+    Dynamic request batching for an expensive batch function (e.g. model.generate).
+
+    Concurrent `submit()` calls are collected for up to `window_ms` after the first one
+    arrives (or until `max_batch` items), then `process_batch(items) -> results` runs once,
+    on `executor`, and each caller gets its own result. Requests arriving while a batch is
+    running form the next batch.
+    """
+    def __init__(self, process_batch, max_batch: int = 8, window_ms: float = 10.0, executor=None,
+                 name: str = "llm.batch"):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.executor = executor
+        self.batch_stats = get_stats(name)
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                with Timer(self.batch_stats):
+                    results = await loop.run_in_executor(self.executor, self.process_batch, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done(): # caller may have been cancelled
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+        }
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,58 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_query(text: str) -> str:
+    """Cache key: case, surrounding punctuation and repeated whitespace don't change the meaning."""
+    return re.sub(r"\s+", " ", text.lower()).strip(" \t\n?!.,;:")
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache with a TTL for query embeddings.
+    Entries expire `ttl` seconds after they were stored; the least recently used entry
+    is evicted once `maxsize` is reached.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (stored_at, vector)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, vector):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
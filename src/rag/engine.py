@@ -1,15 +1,22 @@
-from src.rag.llm_client import llm_client
+from src.rag.llm_client import FallbackText, llm_client
 from src.digital_twin.grid_model import grid_twin
 from src.digital_twin.asset_models import asset_manager
+from src.rag.embeddings import EmbeddingCache, normalize_query
+from src.rag.prompt import PromptBuilder
+from src.rag.answer_cache import SemanticAnswerCache, state_fingerprint
+from src.rag.vector_index import LocalVectorIndex
+from src.rag.hybrid import BM25Index, CrossEncoderReranker, HybridRetriever
+from src.metrics import get_stats, register_counters, Timer
+from src.lazy import LazySingleton
+from importlib.util import find_spec
+import asyncio
 import os
+import threading
+import time
 
-# Lazy Imports
-try:
-    from qdrant_client import QdrantClient
-    from sentence_transformers import SentenceTransformer
-    _RAG_AVAILABLE = True
-except ImportError:
-    _RAG_AVAILABLE = False
+# Optional dependencies: only checked here, imported by the warm-up thread
+_RAG_AVAILABLE = find_spec("qdrant_client") is not None and find_spec("sentence_transformers") is not None
+if not _RAG_AVAILABLE:
     print("RAG: 'qdrant-client' or 'sentence-transformers' not found. Vector Search disabled.")
 
 # Qdrant Config
@@ -17,97 +24,392 @@ QDRANT_URL = os.getenv("QDRANT_URL", "http://qdrant:6333")
 if os.getenv("APP_ENV") != "production":
    QDRANT_URL = "http://localhost:6333"
 
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Vector search: "qdrant" (Qdrant, mirrored into the local index which serves queries once
+# synced) or "local" (in-process index only, no services needed)
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "qdrant").lower()
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "data/vector_index")
+# Seconds between background re-syncs of the mirror from Qdrant, so manuals ingested after
+# startup become retrievable (0 = never)
+LOCAL_INDEX_RESYNC = float(os.getenv("LOCAL_INDEX_RESYNC", "300"))
+RETRIEVAL_LIMIT = int(os.getenv("RETRIEVAL_LIMIT", "3"))
+
+# Hybrid retrieval: dense + BM25 candidates fused with RRF, optionally cross-encoder
+# reranked (RERANK_MODEL, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2) within the budget
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RETRIEVAL_BUDGET_MS = float(os.getenv("RETRIEVAL_BUDGET_MS", "80"))
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")
+
+# Last-resort extracts for when no embedding model is available, by keyword
+BACKUP_EXTRACTS = [
+    (("temp",), "Normal operating range for Transformer T1 oil is 40-90C. Above 95C requires fan inspection."),
+    (("load",), "Rated load for T1 is 100MW. Prolonged operation >110% causes loss of life."),
+    (("fail", "critical"), "EMERGENCY PROTOCOL: In case of critical overload, Isolate Feeder 3 first."),
+]
+
+# Answer cache: same question (or a near-identical one) in the same coarse grid state
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "true").lower() == "true"
+
 class RAGEngine:
     def __init__(self):
         self.client = None
         self.embedder = None
         self.collection_name = "manuals"
-        
-        if _RAG_AVAILABLE:
+        # Operators ask the same few questions over and over: cache their embeddings
+        self.embedding_cache = EmbeddingCache(
+            maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "3600")),
+        )
+        self.encode_stats = get_stats("rag.encode")
+        self.prompt_builder = PromptBuilder(count_tokens=lambda text: llm_client.count_tokens(text))
+        self.answer_cache = SemanticAnswerCache(
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "900")),
+        )
+        self.load_band = float(os.getenv("ANSWER_CACHE_LOAD_BAND", "10"))
+        self.local_index = None
+        self.local_index_synced = False # True once it mirrors the whole Qdrant collection
+        self._synced_at = 0.0
+        self._resync_lock = threading.Lock()
+        self._resync_thread = None
+        self.retriever = HybridRetriever(candidates=HYBRID_CANDIDATES, budget_ms=RETRIEVAL_BUDGET_MS)
+        self._warmup_thread = None
+
+    def start_warmup(self):
+        """
+        Connects Qdrant and loads the embedding model on a background thread (idempotent).
+        Queries arriving before it is ready use the fallback context instead of waiting.
+        """
+        if not _RAG_AVAILABLE or self._warmup_thread is not None:
+            return
+        self._warmup_thread = threading.Thread(target=self._warm_up, name="rag-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def _warm_up(self):
+        if VECTOR_INDEX != "local":
             try:
+                from qdrant_client import QdrantClient
                 self.client = QdrantClient(url=QDRANT_URL)
-                # Lazy load embedder to save startup time
-                self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
             except Exception as e:
-                print(f"RAG Warning: Qdrant/Embedder init failed ({e})")
+                print(f"RAG Warning: Qdrant init failed ({e})")
+        try:
+            from sentence_transformers import SentenceTransformer
+            embedder = SentenceTransformer(EMBEDDING_MODEL)
+            embedder.encode("warm-up") # first encode pays one-off setup costs
+            self.embedder = embedder
+            print(f"RAG: Embedder '{EMBEDDING_MODEL}' ready.")
+        except Exception as e:
+            print(f"RAG Warning: Embedder init failed ({e})")
+            return
+        try:
+            self._load_local_index()
+        except Exception as e:
+            print(f"RAG Warning: Local vector index unavailable ({e})")
+        if RERANK_MODEL:
+            try:
+                self.retriever.reranker = CrossEncoderReranker(RERANK_MODEL)
+                print(f"RAG: Reranker '{RERANK_MODEL}' ready.")
+            except Exception as e:
+                print(f"RAG Warning: Reranker init failed ({e})")
 
-    def process_query(self, query: str):
+    def _load_local_index(self):
         """
-        Main RAG pipeline.
-        1. Fetch Live Context (Twin).
-        2. Fetch Semantic Context (Qdrant).
-        3. Generative Answer.
+        Opens the persisted local index, refreshes it from Qdrant when reachable, and seeds it
+        with the demo manuals if it is still empty (single box, no services).
         """
-        context = []
-        
-        # --- 1. Live Digital Twin Context ---
-        status = grid_twin.get_system_status()
+        from src.rag.ingestion import chunk_id, ingest, iter_demo_chunks
+        index = LocalVectorIndex.open(LOCAL_INDEX_PATH, self.embedder.get_sentence_embedding_dimension())
+        changed = False
+        if self.client is not None:
+            try:
+                copied = index.sync_from(self.client, self.collection_name)
+                self.local_index_synced = copied > 0
+                self._synced_at = time.monotonic()
+                changed = copied > 0
+                print(f"RAG: Local index synced from Qdrant ({copied} points).")
+            except Exception as e:
+                print(f"RAG Warning: Qdrant sync failed ({e}), using the local index.")
+        if not len(index):
+            backup = [{"id": chunk_id("Backup-Manual", text), "text": text, "source": "Backup-Manual",
+                       "path": "Backup-Manual"}
+                      for _, text in BACKUP_EXTRACTS]
+            chunks = list(iter_demo_chunks()) + [(0, chunk) for chunk in backup]
+            ingest(chunks, index, embed=self.embedder.encode, upload_workers=1)
+            changed = True
+        if changed:
+            index.save()
+        self.retriever.bm25.add(*index.items())
+        self.local_index = index
+        print(f"RAG: Local vector index ready ({len(index)} points, '{LOCAL_INDEX_PATH}').")
+
+    def _maybe_resync(self):
+        """Starts a background re-sync of the mirror once it is LOCAL_INDEX_RESYNC seconds old."""
+        if LOCAL_INDEX_RESYNC <= 0 or not self.local_index_synced or self.client is None:
+            return
+        with self._resync_lock:
+            if time.monotonic() - self._synced_at < LOCAL_INDEX_RESYNC:
+                return
+            if self._resync_thread is not None and self._resync_thread.is_alive():
+                return
+            self._synced_at = time.monotonic()
+            self._resync_thread = threading.Thread(target=self._resync, name="rag-resync", daemon=True)
+            self._resync_thread.start()
+
+    def _resync(self):
+        """
+        Blocking: mirrors Qdrant into the local index (new, changed and deleted points) and
+        rebuilds BM25 over it; queries keep being served from the old state meanwhile.
+        """
+        index = self.local_index
+        try:
+            copied = index.sync_from(self.client, self.collection_name)
+            bm25 = BM25Index(self.retriever.bm25.k1, self.retriever.bm25.b)
+            bm25.add(*index.items())
+            self.retriever.bm25 = bm25
+            index.save()
+            print(f"RAG: Local index re-synced from Qdrant ({copied} points).")
+        except Exception as e:
+            print(f"RAG Warning: Qdrant re-sync failed ({e}), keeping the current local index.")
+
+    def embed_query(self, query: str):
+        """Query embedding (cached on the normalized text), or None while the model is not loaded."""
+        key = normalize_query(query)
+        vector = self.embedding_cache.get(key)
+        if vector is not None:
+            return vector
+        if self.embedder is None:
+            self.start_warmup()
+            return None
+        with Timer(self.encode_stats):
+            vector = self.embedder.encode(key).tolist()
+        self.embedding_cache.put(key, vector)
+        return vector
+
+    def _grid_context(self, status: dict) -> str:
         grid_context = f"LIVE SCADA DATA: Total Load {status['total_load_mw']:.1f}MW. Transformer T1 Loading: {status['transformer_loading_percent']}%."
         if status['alerts']:
             grid_context += f" WARNING ALERTS ACTIVE: {', '.join(status['alerts'])}."
-        context.append(grid_context)
-        
+        return grid_context
+
+    def _asset_context(self, query: str):
         # Details for T1 if asked
         if "transformer" in query.lower() or "t1" in query.lower():
             t1_health = asset_manager.assets["T1_Transformer"].health_score
-            asset_context = f"ASSET HEALTH (T1): Score {t1_health:.1f}/100. Status: {'Critical' if t1_health < 40 else 'Good'}."
-            context.append(asset_context)
+            return f"ASSET HEALTH (T1): Score {t1_health:.1f}/100. Status: {'Critical' if t1_health < 40 else 'Good'}."
+        return None
 
-        # --- 2. Vector Search Context (Qdrant) ---
-        # Try Qdrant, fallback to Hardcoded Manuals for Demo if empty
-        docs = []
-        try:
-            if self.client and self.embedder:
-                query_vector = self.embedder.encode(query).tolist()
-                search_result = self.client.search(
+    def _vector_search(self, query_vector, limit: int) -> list:
+        """
+        Local index once it mirrors Qdrant (no network hop; re-synced every LOCAL_INDEX_RESYNC
+        seconds). Otherwise Qdrant, copying the hits into the local index (read-through), and
+        the local index if Qdrant fails.
+        """
+        self._maybe_resync()
+        local = self.local_index
+        if self.client is not None and not self.local_index_synced:
+            try:
+                hits = self.client.search(
                     collection_name=self.collection_name,
                     query_vector=query_vector,
-                    limit=2
+                    limit=limit,
+                    with_vectors=local is not None,
                 )
-                if search_result:
-                    docs = [f"MANUAL EXTRACT: {hit.payload['text']}" for hit in search_result]
+                if hits:
+                    ids, payloads = [str(hit.id) for hit in hits], [hit.payload for hit in hits]
+                    if local is not None:
+                        local.upsert(ids, [hit.vector for hit in hits], payloads)
+                    self.retriever.bm25.add(ids, payloads)
+                    return [{"id": point_id, **payload} for point_id, payload in zip(ids, payloads)]
+            except Exception as e:
+                print(f"Vector Search Error: {e}")
+        if local is not None:
+            return local.search(query_vector, limit)
+        return []
+
+    def _retrieve_docs(self, query: str) -> list:
+        """Blocking (embedding + hybrid dense/BM25 search, optional rerank)."""
+        docs = []
+        start = time.perf_counter()
+        try:
+            query_vector = self.embed_query(query)
+            dense = [] if query_vector is None else self._vector_search(query_vector, self.retriever.candidates)
+            hits = self.retriever.retrieve(query, dense, RETRIEVAL_LIMIT, start)
+            docs = [f"MANUAL EXTRACT: {hit['text']}" for hit in hits]
         except Exception as e:
             print(f"Vector Search Error: {e}")
-            
-        # FALLBACK FOR DEMO: If no docs found (empty DB), simulate retrieval
+
+        # No embedding model (yet): keyword-matched backup extracts
         if not docs:
-            # Simple keyword matching for demo effect
-            if "temp" in query.lower():
-                docs.append("MANUAL EXTRACT (Backup): Normal operating range for Transformer T1 oil is 40-90C. Above 95C requires fan inspection.")
-            elif "load" in query.lower():
-                docs.append("MANUAL EXTRACT (Backup): Rated load for T1 is 100MW. Prolonged operation >110% causes loss of life.")
-            elif "fail" in query.lower() or "critical" in query.lower():
-                docs.append("MANUAL EXTRACT (Backup): EMERGENCY PROTOCOL: In case of critical overload, Isolate Feeder 3 first.")
-                
-        if docs:
-            context.append("\n".join(docs))
-        
-        full_context = "\n".join(context)
-        
-        # --- 3. LLM Generation ---
-
-        response = llm_client.generate_response(
-            system_context=f"You are an AI Operator Assistant for a Power Grid. Combine the LIVE SCADA DATA and MANUAL EXTRACTS to answer.",
-            user_query=query  # Passing context via prompt construction in llm_client or here? 
-                              # llm_client.generate_response constructs the prompt with context, 
-                              # so we pass context as system_context.
-        )
-        
-        # Fix: llm_client uses {system_context} in the prompt template.
-        # We should pass the *Full Context* as the system context or part of it.
-        # Let's override the system context passed to include the retrieved data.
-        
-        final_prompt_context = f"Relevant Data:\n{full_context}"
-        
-        response = llm_client.generate_response(
-            system_context=final_prompt_context,
-            user_query=query
-        )
-        
+            query = query.lower()
+            for keywords, text in BACKUP_EXTRACTS:
+                if any(keyword in query for keyword in keywords):
+                    docs.append(f"MANUAL EXTRACT (Backup): {text}")
+                    break
+        return docs
+
+    def _live_context(self, query: str):
+        """
+        Twin snapshot stage: grid status (lock-free snapshot) + asset health + state fingerprint
+        + snapshot version (the grid context text is the same for every question on it).
+        """
+        status = grid_twin.get_system_status()
+        t1_health = asset_manager.assets["T1_Transformer"].health_score
+        fingerprint = state_fingerprint(status, t1_health, self.load_band)
+        return self._grid_context(status), self._asset_context(query), fingerprint, status.get("version")
+
+    def _build_prompt(self, query: str, grid_context: str, asset_context, docs: list, version) -> dict:
+        """Prompt, plus the generation prefix (snapshot-keyed live block) whose KV cache the LLM reuses."""
+        prompt = self.prompt_builder.build(query, grid_context, asset_context, docs)
+        prompt["prefix"] = (("twin", version), prompt["system_prefix"]) if version is not None else None
+        return prompt
+
+    def _cached_answer(self, query: str, fingerprint: tuple):
+        """Cache lookup (the query embedding it computes is reused by retrieval on a miss). None on a miss."""
+        if not ANSWER_CACHE_ENABLED:
+            return None
+        return self.answer_cache.get(fingerprint, normalize_query(query), self.embed_query(query))
+
+    def _lookup(self, query: str, timings: dict):
+        """
+        Twin snapshot + answer cache stages, ahead of retrieval so a hit skips it.
+        Returns the live context tuple and the cached answer (None on a miss).
+        """
+        live, timings["twin_snapshot"] = self._timed("twin_snapshot", self._live_context, query)
+        cached, timings["answer_cache"] = self._timed("answer_cache", self._cached_answer, query, live[2])
+        return live, cached
+
+    def _store_answer(self, query: str, fingerprint: tuple, answer: str):
+        """Caches model answers; errors and failover text (FallbackText) would outlive the outage."""
+        if ANSWER_CACHE_ENABLED and not isinstance(answer, FallbackText):
+            self.answer_cache.put(fingerprint, normalize_query(query), answer, self.embed_query(query))
+
+    def _timed(self, stage: str, fn, *args):
+        """Runs one pipeline stage; returns (result, elapsed ms) and feeds rag.<stage> latency stats."""
+        with Timer(get_stats(f"rag.{stage}")) as timer:
+            result = fn(*args)
+        return result, timer.elapsed_ms
+
+    def _response(self, response: str, prompt: dict, timings: dict, start: float, cached: bool = False) -> dict:
+        timings["total"] = (time.perf_counter() - start) * 1000.0
         return {
             "response": response,
-            "context_used": full_context
+            "cached": cached,
+            "context_used": prompt["context"],
+            "prompt_tokens": prompt["prompt_tokens"],
+            "dropped_docs": prompt["dropped_docs"],
+            "timings_ms": {stage: round(ms, 3) for stage, ms in timings.items()},
         }
 
-rag_engine = RAGEngine()
+    def process_query(self, query: str):
+        """
+        Main RAG pipeline (blocking; the API uses aprocess_query).
+        1. Fetch Live Context (Twin), then the answer cache (a hit returns right away).
+        2. Fetch Semantic Context (Qdrant).
+        3. Build the prompt once, within the model's token window.
+        4. Generative Answer (a single call).
+        """
+        start = time.perf_counter()
+        timings = {}
+        (grid_context, asset_context, fingerprint, version), cached = self._lookup(query, timings)
+        docs = []
+        if cached is None:
+            docs, timings["retrieval"] = self._timed("retrieval", self._retrieve_docs, query)
+        prompt, timings["prompt"] = self._timed("prompt", self._build_prompt, query, grid_context, asset_context, docs, version)
+        if cached is not None:
+            return self._response(cached, prompt, timings, start, cached=True)
+        response, timings["generation"] = self._timed(
+            "generation", lambda: llm_client.generate_response(prompt["system_context"], query, prefix=prompt["prefix"]))
+        self._store_answer(query, fingerprint, response)
+        return self._response(response, prompt, timings, start)
+
+    async def _aprepare(self, query: str, timings: dict):
+        """
+        Twin snapshot and answer cache, then (on a miss) vector search, then the prompt, all on
+        worker threads. A hit skips retrieval and rerank: its prompt carries the live context only.
+        Returns (prompt, state fingerprint, cached answer or None).
+        """
+        # First use may still be building the twin, and the lookup embeds the query: both off the loop
+        (grid_context, asset_context, fingerprint, version), cached = await asyncio.to_thread(self._lookup, query, timings)
+        docs = []
+        if cached is None:
+            docs, timings["retrieval"] = await asyncio.to_thread(self._timed, "retrieval", self._retrieve_docs, query)
+        # Token counting uses llm_client: its first use builds the client (and may load the model)
+        prompt, timings["prompt"] = await asyncio.to_thread(
+            self._timed, "prompt", self._build_prompt, query, grid_context, asset_context, docs, version)
+        return prompt, fingerprint, cached
+
+    async def aprocess_query(self, query: str):
+        """
+        Non-blocking RAG pipeline for the API: nothing here runs on the event loop for long,
+        so chat traffic never stalls live telemetry.
+        1. Twin snapshot and answer cache, then vector search on a miss (worker threads).
+        2. Prompt, then one generation call (pooled async HTTP to Modal, or the local model on its worker).
+        """
+        start = time.perf_counter()
+        timings = {}
+        prompt, fingerprint, cached = await self._aprepare(query, timings)
+        if cached is not None:
+            return self._response(cached, prompt, timings, start, cached=True)
+        with Timer(get_stats("rag.generation")) as timer:
+            response = await llm_client.agenerate_response(prompt["system_context"], query, prefix=prompt["prefix"])
+        timings["generation"] = timer.elapsed_ms
+        await asyncio.to_thread(self._store_answer, query, fingerprint, response) # embeds the query
+        return self._response(response, prompt, timings, start)
+
+    async def astream_query(self, query: str):
+        """
+        Streaming variant of aprocess_query. Yields (event, data) pairs:
+        ("context", ...) once the prompt is built, ("token", {"text"}) per generated chunk,
+        then ("done", ...) with the full answer and timings (incl. time to first token).
+        """
+        start = time.perf_counter()
+        timings = {}
+        prompt, fingerprint, cached = await self._aprepare(query, timings)
+        yield "context", {
+            "context_used": prompt["context"],
+            "prompt_tokens": prompt["prompt_tokens"],
+            "dropped_docs": prompt["dropped_docs"],
+        }
+
+        if cached is not None:
+            timings["first_token"] = (time.perf_counter() - start) * 1000.0
+            yield "token", {"text": cached}
+            done = self._response(cached, prompt, timings, start, cached=True)
+            del done["context_used"]
+            yield "done", done
+            return
+
+        chunks = []
+        generation_start = time.perf_counter()
+        async for text in llm_client.astream_response(prompt["system_context"], query, prefix=prompt["prefix"]):
+            if not chunks:
+                timings["first_token"] = (time.perf_counter() - start) * 1000.0
+                get_stats("rag.first_token").record(timings["first_token"])
+            chunks.append(text)
+            yield "token", {"text": text}
+        timings["generation"] = (time.perf_counter() - generation_start) * 1000.0
+        get_stats("rag.generation").record(timings["generation"])
+        answer = "".join(chunks)
+        if any(isinstance(chunk, FallbackText) for chunk in chunks):
+            answer = FallbackText(answer)
+        await asyncio.to_thread(self._store_answer, query, fingerprint, answer)
+
+        done = self._response("".join(chunks), prompt, timings, start)
+        del done["context_used"] # already sent with the "context" event
+        yield "done", done
+
+rag_engine = LazySingleton(RAGEngine, "rag_engine")
+# Zeroed until the engine is built, so the counters keep the same keys from the first scrape
+register_counters("rag.embedding_cache", lambda: rag_engine.embedding_cache.stats() if rag_engine.initialized else
+                  {"size": 0, "hits": 0, "misses": 0, "hit_rate": 0.0})
+register_counters("rag.answer_cache", lambda: rag_engine.answer_cache.stats() if rag_engine.initialized else
+                  {"size": 0, "hits": 0, "misses": 0, "invalidations": 0, "hit_rate": 0.0})
+register_counters("rag.hybrid", lambda: rag_engine.retriever.stats() if rag_engine.initialized else {})
+register_counters("rag.vector_index", lambda: {
+    "mode": VECTOR_INDEX,
+    "local_points": len(rag_engine.local_index) if rag_engine.initialized and rag_engine.local_index is not None else 0,
+    "synced": rag_engine.local_index_synced if rag_engine.initialized else False,
+})
 
@@ -0,0 +1,167 @@
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+def tokenize(text: str) -> list:
+    """
+    Lowercase word tokens. Equipment tags stay whole ("cb-110", "t1") and their parts are
+    added too, so "CB-110", "CB 110" and "110" all match.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring (k1, b), for exact-term recall."""
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict) # token -> {row: term frequency}
+        self._lengths = []
+        self._ids = []
+        self._payloads = []
+        self._rows = {}
+        self._norm = None # per-document BM25 length normalization, rebuilt after adds
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, ids: list, payloads: list):
+        """Indexes payload["text"] per id; ids already indexed are skipped."""
+        with self._lock:
+            for point_id, payload in zip(ids, payloads):
+                if point_id in self._rows:
+                    continue
+                row = len(self._ids)
+                tokens = tokenize(payload["text"])
+                for token in tokens:
+                    self._postings[token][row] = self._postings[token].get(row, 0) + 1
+                self._rows[point_id] = row
+                self._ids.append(point_id)
+                self._payloads.append(payload)
+                self._lengths.append(len(tokens))
+            self._norm = None
+
+    def payload(self, point_id: str):
+        row = self._rows.get(point_id)
+        return None if row is None else self._payloads[row]
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """[(id, score), ...] best first; documents sharing no term with the query are left out."""
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return []
+            if self._norm is None:
+                lengths = np.asarray(self._lengths, dtype=np.float64)
+                self._norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+            norm = self._norm
+            scores = np.zeros(n)
+            for token in set(tokenize(query)):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                rows = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+                tf = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm[rows])
+            ids = self._ids
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(limit, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+def rrf_fuse(rankings: list, k: int = 60) -> list:
+    """Reciprocal rank fusion of several ranked id lists: [(id, score), ...] best first."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, point_id in enumerate(ranking):
+            scores[point_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+class CrossEncoderReranker:
+    """
+    Optional cross-encoder reranking on CPU ('sentence-transformers' CrossEncoder).
+    Tracks its own cost per (query, passage) pair so callers can stay within a time budget.
+    """
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.model.predict([("warm-up", "warm-up")]) # first call pays one-off setup costs
+        self.ms_per_pair = None
+
+    def pairs_within(self, budget_ms: float) -> int:
+        if self.ms_per_pair is None:
+            return 4 if budget_ms > 0 else 0 # unknown cost: probe with a small batch
+        return int(budget_ms // self.ms_per_pair)
+
+    def rerank(self, query: str, passages: list) -> list:
+        """Passage indices, best first."""
+        start = time.perf_counter()
+        scores = self.model.predict([(query, passage) for passage in passages])
+        per_pair = (time.perf_counter() - start) * 1000.0 / len(passages)
+        self.ms_per_pair = per_pair if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * per_pair
+        return [int(i) for i in np.argsort(-np.asarray(scores))]
+
+class HybridRetriever:
+    """
+    Dense (vector) + sparse (BM25) candidates fused with RRF; the head of the fused list is
+    optionally reranked by a cross-encoder, as far as `budget_ms` (whole retrieval) allows.
+    """
+    def __init__(self, bm25: BM25Index = None, reranker=None, candidates: int = 20,
+                 rrf_k: int = 60, budget_ms: float = 80.0):
+        self.bm25 = bm25 if bm25 is not None else BM25Index()
+        self.reranker = reranker
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.budget_ms = budget_ms
+        self.reranked = 0
+        self.rerank_skipped = 0
+
+    def retrieve(self, query: str, dense_hits: list, limit: int, start: float = None) -> list:
+        """
+        `dense_hits`: [{"id", "text", ...}, ...] best first (up to `candidates`).
+        `start`: perf_counter() when retrieval began (embedding + vector search count
+        against the budget). Returns payload dicts, best first.
+        """
+        start = time.perf_counter() if start is None else start
+        payloads = {hit["id"]: hit for hit in dense_hits}
+        sparse = self.bm25.search(query, self.candidates)
+        for point_id, _ in sparse:
+            payloads.setdefault(point_id, self.bm25.payload(point_id))
+        fused = [point_id for point_id, _ in rrf_fuse(
+            [[hit["id"] for hit in dense_hits], [point_id for point_id, _ in sparse]], self.rrf_k)]
+
+        if self.reranker is not None and len(fused) > 1:
+            remaining = self.budget_ms - (time.perf_counter() - start) * 1000.0
+            n = min(len(fused), self.candidates, self.reranker.pairs_within(remaining))
+            if n > 1:
+                head = fused[:n]
+                order = self.reranker.rerank(query, [payloads[point_id]["text"] for point_id in head])
+                fused = [head[i] for i in order] + fused[n:]
+                self.reranked += 1
+            else:
+                self.rerank_skipped += 1
+        return [payloads[point_id] for point_id in fused[:limit]]
+
+    def stats(self) -> dict:
+        return {
+            "bm25_docs": len(self.bm25),
+            "reranker": self.reranker is not None,
+            "reranked": self.reranked,
+            "rerank_skipped": self.rerank_skipped,
+            "ms_per_pair": round(self.reranker.ms_per_pair, 3) if self.reranker and self.reranker.ms_per_pair else None,
+        }
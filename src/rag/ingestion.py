@@ -1,69 +1,287 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+import argparse
+import hashlib
 import os
+import time
 import uuid
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 
 # Configuration
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 COLLECTION_NAME = "manuals"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DIM = 384
 
-def ingest_dummy_data():
-    print(f"Connecting to Qdrant at {QDRANT_URL}...")
-    try:
-        client = QdrantClient(url=QDRANT_URL)
-        
-        # 1. Check/Create Collection
-        if not client.collection_exists(COLLECTION_NAME):
-            print(f"Creating collection '{COLLECTION_NAME}'...")
-            client.create_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(size=384, distance=Distance.COSINE),
+# Content-hash ids: the same chunk of the same manual always maps to the same point id,
+# so re-running ingestion overwrites instead of duplicating. Points of a re-ingested document
+# that the new version no longer produces (edited or removed text) are deleted. Documents are
+# told apart by "path" (normalized absolute file path; the source name for built-in documents),
+# so same-named files in different directories never touch each other's points.
+ID_NAMESPACE = uuid.UUID("6f1c7a52-3f0e-4d1b-9a57-2a0d8c4e9b13")
+
+TEXT_EXTENSIONS = {".txt", ".md", ".rst"}
+DOCUMENT_EXTENSIONS = TEXT_EXTENSIONS | {".pdf"}
+
+# Dummy Data (Maintenance Manuals), used when no files are given
+DEMO_DOCUMENTS = [
+    {
+        "text": "Transformer T1 Maintenance Procedure: Check oil levels daily. If oil temperature exceeds 85C, inspect cooling fans immediately.",
+        "source": "Manual-T1-001"
+    },
+    {
+        "text": "Substation Safety: Wear Class 2 Voltage Gloves when operating MV Busbar switches. Ensure grounding stick is visible.",
+        "source": "Safety-Standard-2024"
+    },
+    {
+        "text": "Emergency Shutdown: In case of fire, active the Halon system and trip the HV Circuit Breaker (CB-110).",
+        "source": "Emergency-Protocol-A"
+    },
+    {
+        "text": "Feeder Faults: If Feeder 1 trips, check for cable splice failures at standard intervals (every 500m).",
+        "source": "Feeder-Repair-Guide"
+    }
+]
+
+def chunk_id(path: str, text: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(ID_NAMESPACE, f"{path}\0{digest}"))
+
+# --- 1. Streaming document reading + chunking ---
+
+def iter_files(paths):
+    """Document files under the given paths (directories are walked), in a stable order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in DOCUMENT_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def iter_file_text(path: str):
+    """Text of one file, one segment at a time (a page for PDFs), so big manuals stream."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            print(f"Ingestion: skipping {path} ('pypdf' not installed)")
+            return
+        for page in PdfReader(path).pages:
+            yield page.extract_text() or ""
+    elif ext in TEXT_EXTENSIONS:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield f.read()
+
+def chunk_text(text: str, chunk_chars: int = 1000, overlap: int = 200):
+    """Overlapping windows of ~chunk_chars, cut at whitespace where possible."""
+    text = " ".join(text.split())
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + chunk_chars // 2, end)
+            end = cut if cut > 0 else end
+        yield text[start:end]
+        if end >= len(text):
+            return
+        start = max(end - overlap, start + 1)
+
+def iter_chunks(paths, chunk_chars: int = 1000, overlap: int = 200):
+    """Yields (file index, point dict) for every chunk of every file, lazily."""
+    for file_index, path in enumerate(iter_files(paths)):
+        source = os.path.basename(path)
+        path = os.path.normpath(os.path.abspath(path))
+        for segment in iter_file_text(path):
+            for text in chunk_text(segment, chunk_chars, overlap):
+                yield file_index, {"id": chunk_id(path, text), "text": text, "source": source, "path": path}
+
+def iter_demo_chunks():
+    for i, doc in enumerate(DEMO_DOCUMENTS):
+        yield i, {"id": chunk_id(doc["source"], doc["text"]), **doc, "path": doc["source"]}
+
+# --- 2. Embedding ---
+
+_worker_model = None
+
+def _init_embed_worker(model_name: str):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def _embed_in_worker(texts: list):
+    return _worker_model.encode(texts, batch_size=len(texts))
+
+def load_embedder(model_name: str = EMBEDDING_MODEL):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name)
+    return lambda texts: model.encode(texts, batch_size=len(texts))
+
+# --- 3. Vector store ---
+
+class QdrantSink:
+    """Target collection: which ids already exist, batched upserts."""
+    def __init__(self, client, collection: str = COLLECTION_NAME, dim: int = EMBEDDING_DIM):
+        self.client = client
+        self.collection = collection
+        self.dim = dim
+
+    def ensure_collection(self):
+        from qdrant_client.models import Distance, VectorParams
+        if not self.client.collection_exists(self.collection):
+            print(f"Creating collection '{self.collection}'...")
+            self.client.create_collection(
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE),
             )
-        
-        # 2. Dummy Data (Maintenance Manuals)
-        documents = [
-            {
-                "text": "Transformer T1 Maintenance Procedure: Check oil levels daily. If oil temperature exceeds 85C, inspect cooling fans immediately.",
-                "source": "Manual-T1-001"
-            },
-            {
-                "text": "Substation Safety: Wear Class 2 Voltage Gloves when operating MV Busbar switches. Ensure grounding stick is visible.",
-                "source": "Safety-Standard-2024"
-            },
-            {
-                "text": "Emergency Shutdown: In case of fire, active the Halon system and trip the HV Circuit Breaker (CB-110).",
-                "source": "Emergency-Protocol-A"
-            },
-            {
-                "text": "Feeder Faults: If Feeder 1 trips, check for cable splice failures at standard intervals (every 500m).",
-                "source": "Feeder-Repair-Guide"
-            }
-        ]
-        
-        # 3. Embed
-        print("Loading Embedding Model...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        embeddings = model.encode([d["text"] for d in documents])
-        
-        # 4. Upload
-        points = []
-        for i, doc in enumerate(documents):
-            points.append(PointStruct(
-                id=str(uuid.uuid4()),
-                vector=embeddings[i].tolist(),
-                payload=doc
-            ))
-            
-        client.upsert(
-            collection_name=COLLECTION_NAME,
+
+    def existing(self, ids: list) -> set:
+        found = self.client.retrieve(self.collection, ids=ids, with_payload=False, with_vectors=False)
+        return {str(point.id) for point in found}
+
+    def upsert(self, ids: list, vectors, payloads: list):
+        from qdrant_client.models import Batch
+        self.client.upsert(
+            collection_name=self.collection,
             wait=True,
-            points=points
+            points=Batch(ids=ids, vectors=[list(map(float, v)) for v in vectors], payloads=payloads),
         )
-        print(f"Successfully ingested {len(points)} documents into Qdrant.")
-        
+
+    def path_ids(self, paths) -> dict:
+        """{path: ids of its points} for the given document paths."""
+        from qdrant_client.models import FieldCondition, Filter, MatchAny
+        found, offset = defaultdict(set), None
+        query = Filter(must=[FieldCondition(key="path", match=MatchAny(any=list(paths)))])
+        while True:
+            points, offset = self.client.scroll(self.collection, scroll_filter=query, limit=1024, offset=offset,
+                                                with_payload=["path"], with_vectors=False)
+            for point in points:
+                found[point.payload["path"]].add(str(point.id))
+            if offset is None:
+                return found
+
+    def delete(self, ids: list):
+        from qdrant_client.models import PointIdsList
+        self.client.delete(self.collection, points_selector=PointIdsList(points=ids), wait=True)
+
+# --- 4. Pipeline ---
+
+def ingest(chunks, sink, embed=None, batch_size: int = 64, embed_workers: int = 0,
+           upload_workers: int = 4, model_name: str = EMBEDDING_MODEL) -> dict:
+    """
+    Streams (file index, chunk) pairs through: skip ids already in the sink -> embed in
+    fixed-size batches (in-process, or over `embed_workers` processes) -> upsert batches
+    on `upload_workers` threads. At most a few batches are in flight, so memory stays flat.
+    Finally deletes the sink's other points of every document path seen (stale chunks).
+    """
+    start = time.perf_counter()
+    embed_pool = None
+    if embed_workers > 0:
+        embed_pool = ProcessPoolExecutor(embed_workers, initializer=_init_embed_worker, initargs=(model_name,))
+    elif embed is None:
+        embed = load_embedder(model_name)
+    upload_pool = ThreadPoolExecutor(max(1, upload_workers), thread_name_prefix="qdrant-upsert")
+
+    embedding, uploading = deque(), deque()
+    max_embedding = max(1, embed_workers) * 2
+    max_uploading = max(1, upload_workers) * 2
+    stats = {"files": 0, "chunks": 0, "skipped": 0, "embedded": 0, "deleted": 0}
+    produced = defaultdict(set) # path -> ids of this run (ids only, not texts)
+
+    def drain_embedding(limit: int):
+        while len(embedding) > limit:
+            batch, vectors = embedding.popleft()
+            while len(uploading) >= max_uploading:
+                uploading.popleft().result()
+            uploading.append(upload_pool.submit(
+                sink.upsert, [c["id"] for c in batch], vectors.result(),
+                [{"text": c["text"], "source": c["source"], "path": c["path"]} for c in batch]))
+            stats["embedded"] += len(batch)
+
+    try:
+        chunks = iter(chunks)
+        while True:
+            raw = list(islice(chunks, batch_size))
+            if not raw:
+                break
+            stats["files"] = max(stats["files"], raw[-1][0] + 1)
+            stats["chunks"] += len(raw)
+            batch = list({c["id"]: c for _, c in raw}.values()) # duplicates within a batch
+            for c in batch:
+                produced[c["path"]].add(c["id"])
+            known = sink.existing([c["id"] for c in batch])
+            new = [c for c in batch if c["id"] not in known]
+            stats["skipped"] += len(raw) - len(new)
+            if not new:
+                continue
+            texts = [c["text"] for c in new]
+            if embed_pool is not None:
+                future = embed_pool.submit(_embed_in_worker, texts)
+            else:
+                future = Future()
+                future.set_result(embed(texts))
+            embedding.append((new, future))
+            drain_embedding(max_embedding - 1)
+        drain_embedding(0)
+        for upload in uploading:
+            upload.result()
+        if produced:
+            stale = [point_id for path, ids in sink.path_ids(produced).items()
+                     for point_id in ids - produced[path]]
+            if stale:
+                sink.delete(stale)
+            stats["deleted"] = len(stale)
+    finally:
+        upload_pool.shutdown(wait=True)
+        if embed_pool is not None:
+            embed_pool.shutdown()
+
+    seconds = time.perf_counter() - start
+    stats.update({
+        "seconds": round(seconds, 3),
+        "docs_per_sec": round(stats["files"] / seconds, 2) if seconds else 0.0,
+        "chunks_per_sec": round(stats["chunks"] / seconds, 2) if seconds else 0.0,
+    })
+    return stats
+
+def ingest_dummy_data():
+    ingest_paths([])
+
+def ingest_paths(paths, batch_size: int = 64, embed_workers: int = 0, upload_workers: int = 4,
+                 local_index: str = None):
+    """Into Qdrant, or with `local_index` into the in-process index persisted at that path."""
+    try:
+        if local_index:
+            from src.rag.vector_index import LocalVectorIndex
+            sink = LocalVectorIndex.open(local_index, EMBEDDING_DIM)
+            upload_workers = 1 # in-memory, nothing to overlap
+        else:
+            print(f"Connecting to Qdrant at {QDRANT_URL}...")
+            from qdrant_client import QdrantClient
+            sink = QdrantSink(QdrantClient(url=QDRANT_URL))
+            sink.ensure_collection()
+        chunks = iter_chunks(paths) if paths else iter_demo_chunks()
+        print("Loading Embedding Model...")
+        stats = ingest(chunks, sink, batch_size=batch_size, embed_workers=embed_workers, upload_workers=upload_workers)
+        if local_index:
+            sink.save()
+        print(f"Ingested {stats['files']} documents ({stats['chunks']} chunks: {stats['embedded']} new, "
+              f"{stats['skipped']} unchanged, {stats['deleted']} stale deleted) in {stats['seconds']}s - {stats['docs_per_sec']} docs/sec, "
+              f"{stats['chunks_per_sec']} chunks/sec.")
+        return stats
     except Exception as e:
         print(f"Ingestion failed: {e}")
 
 if __name__ == "__main__":
-    ingest_dummy_data()
+    parser = argparse.ArgumentParser(description="Ingest maintenance manuals (txt/md/pdf) into Qdrant.")
+    parser.add_argument("paths", nargs="*", help="files or directories (default: built-in demo documents)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--embed-workers", type=int, default=0, help="embedding processes (0 = in-process)")
+    parser.add_argument("--upload-workers", type=int, default=4)
+    parser.add_argument("--local", metavar="PATH", help="write to a local vector index at PATH instead of Qdrant "
+                        "(run as 'python -m src.rag.ingestion')")
+    args = parser.parse_args()
+    ingest_paths(args.paths, args.batch_size, args.embed_workers, args.upload_workers, args.local)
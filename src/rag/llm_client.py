@@ -1,22 +1,84 @@
+import asyncio
+import copy
 import os
+import queue
+import re
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from src.lazy import LazySingleton
+from src.metrics import LatencyStats, register_counters
+from src.rag.batching import MicroBatcher
+from src.rag.prefix_cache import PrefixKVCache
+from src.rag.resilience import CircuitBreaker, CircuitOpenError, KeepWarm, hedged
 
-# Lazy Imports for optional dependencies
-try:
-    from transformers import AutoModelForCausalLM, AutoTokenizer
-    import torch
-    _AI_AVAILABLE = True
-except ImportError:
-    _AI_AVAILABLE = False
+# Optional dependencies: only checked here, imported when the local model is loaded
+_AI_AVAILABLE = find_spec("transformers") is not None and find_spec("torch") is not None
+if not _AI_AVAILABLE:
     print("LLM: 'transformers' or 'torch' not found. AI features will be Mocked.")
 
 MODEL_ID = "LiquidAI/LFM2-1.2B-RAG"
+CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "32768")) # LFM2 context length (tokens)
+MAX_NEW_TOKENS = 150
+
+MODAL_TIMEOUT = float(os.getenv("MODAL_TIMEOUT", "30")) # read timeout (s)
+MODAL_CONNECT_TIMEOUT = float(os.getenv("MODAL_CONNECT_TIMEOUT", "5"))
+MODAL_MAX_CONNECTIONS = int(os.getenv("MODAL_MAX_CONNECTIONS", "16"))
+
+# Modal resilience: retries (connection errors, 5xx), a hedged second request once a call is
+# slower than the MODAL_HEDGE_PERCENTILE latency (0 = off), a circuit breaker that fails
+# over to local/mock generation, and a keep-warm ping (MODAL_WARM_URL) inside the
+# container scaledown window (90 s in modal_llm.py)
+MODAL_RETRIES = int(os.getenv("MODAL_RETRIES", "1"))
+MODAL_HEDGE_PERCENTILE = float(os.getenv("MODAL_HEDGE_PERCENTILE", "95"))
+MODAL_HEDGE_MIN_SAMPLES = int(os.getenv("MODAL_HEDGE_MIN_SAMPLES", "20"))
+MODAL_BREAKER_FAILURES = int(os.getenv("MODAL_BREAKER_FAILURES", "5"))
+MODAL_BREAKER_RESET = float(os.getenv("MODAL_BREAKER_RESET", "30"))
+MODAL_KEEP_WARM_INTERVAL = float(os.getenv("MODAL_KEEP_WARM_INTERVAL", "60"))
+
+class FallbackText(str):
+    """Text that is not a model answer (generation error, Modal failover, interrupted stream)."""
+
+class ModalHTTPError(RuntimeError):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Modal Error {status_code}: {text}")
+        self.status_code = status_code
+
+# Local micro-batching: concurrent questions within the window share one generate() call
+LLM_BATCH_MAX = int(os.getenv("LLM_BATCH_MAX", "8"))
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "10"))
+
+# CPU inference: LLM_CPU_MODE=int8 loads float32 weights and applies dynamic int8
+# quantization to the Linear layers (~4x smaller matmul weights, faster on CPU);
+# LLM_THREADS pins torch's intra-op thread count (0 = torch default)
+LLM_CPU_MODE = os.getenv("LLM_CPU_MODE", "off").lower()
+LLM_THREADS = int(os.getenv("LLM_THREADS", "0"))
+
+# Reuse the KV cache of the prompt prefix shared by questions: the chat header plus, when the
+# caller passes prefix=(key, system_prefix), the live data block of the current twin snapshot.
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "true").lower() == "true"
+LLM_PREFIX_CACHE_SIZE = int(os.getenv("LLM_PREFIX_CACHE_SIZE", "4"))
+# Opt-in: forward the prefix to Modal as "prefix", where Model.generate caches it the same
+# way. Prefixed requests skip BatchModel's GPU batching, so this is off by default.
+MODAL_PREFIX_CACHE = os.getenv("MODAL_PREFIX_CACHE", "false").lower() == "true"
+SYSTEM_HEADER = "Relevant Data:\n" # PromptBuilder's system_context starts with this
 
 class LLMClient:
     def __init__(self):
         self.model = None
         self.tokenizer = None
         self.mock_mode = False
+        self._http = None       # pooled keep-alive AsyncClient for Modal (created on first use)
+        self._session = None    # pooled keep-alive requests.Session for the sync path
+        self._executor = None   # local generation worker (one model, one generate at a time)
+        self.batcher = MicroBatcher(self._generate_local_batch, max_batch=LLM_BATCH_MAX,
+                                    window_ms=LLM_BATCH_WINDOW_MS, name="llm.local_batch")
+        self.prefix_cache = PrefixKVCache(self._encode_prefix, maxsize=LLM_PREFIX_CACHE_SIZE)
+        self.breaker = CircuitBreaker(MODAL_BREAKER_FAILURES, MODAL_BREAKER_RESET)
+        self.keep_warm = KeepWarm(self._ping_modal, MODAL_KEEP_WARM_INTERVAL)
+        self.modal_stats = LatencyStats(window=256) # successful Modal calls, for the hedge delay
+        self.modal_counts = {"calls": 0, "retries": 0, "hedges": 0, "failures": 0, "failovers": 0}
         
         # Check availability
         if not _AI_AVAILABLE:
@@ -33,57 +95,390 @@ class LLMClient:
     def _load_model(self):
         print(f"LLM: Loading {MODEL_ID}...")
         try:
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+            import torch
+            if LLM_THREADS > 0:
+                torch.set_num_threads(LLM_THREADS)
             self.tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                MODEL_ID, 
-                device_map="auto", 
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-            )
-            print("LLM: Model Loaded Successfully.")
+            if LLM_CPU_MODE == "int8":
+                model = AutoModelForCausalLM.from_pretrained(MODEL_ID, torch_dtype=torch.float32)
+                self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            else:
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    MODEL_ID, 
+                    device_map="auto", 
+                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
+                )
+            self.model.eval()
+            print(f"LLM: Model Loaded Successfully (cpu mode: {LLM_CPU_MODE}, threads: {torch.get_num_threads()}).")
         except Exception as e:
             print(f"LLM: Failed to load model ({e}). Falling back to Mock.")
             self.mock_mode = True
 
-    def generate_response(self, system_context: str, user_query: str) -> str:
+    def count_tokens(self, text: str) -> int:
+        """Exact with the local tokenizer, otherwise ~4 characters per token."""
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text))
+        return (len(text) + 3) // 4
+
+    def generate_response(self, system_context: str, user_query: str, prefix: tuple = None) -> str:
         """
         Generates a response using the LLM (Modal, Local, or Mock).
+        prefix: optional (cache key, leading part of system_context shared across questions),
+        e.g. (("twin", status version), live data block); its KV cache is reused.
         """
         # 1. Check for Modal (Prioritized)
         modal_url = os.getenv("MODAL_URL")
         if modal_url and modal_url.startswith("http"):
-            return self._call_modal(modal_url, system_context, user_query)
+            return self._call_modal(modal_url, system_context, user_query, prefix)
+        return self._generate_fallback(system_context, user_query, prefix)
 
+    def _generate_fallback(self, system_context: str, user_query: str, prefix: tuple = None) -> str:
         # 2. Mock Mode
         if self.mock_mode:
             return self._mock_response(user_query, system_context)
             
         # 3. Local Model (CPU/GPU)
-        prompt = f"<|im_start|>system\n{system_context}<|im_end|>\n<|im_start|>user\n{user_query}<|im_end|>\n<|im_start|>assistant\n"
-        
+        return self._generate_local(system_context, user_query, prefix)
+
+    async def agenerate_response(self, system_context: str, user_query: str, prefix: tuple = None) -> str:
+        """
+        Async generate_response: the Modal call goes through a pooled keep-alive HTTP client
+        and local generation runs on a dedicated worker thread, never on the event loop.
+        """
+        modal_url = os.getenv("MODAL_URL")
+        if modal_url and modal_url.startswith("http"):
+            return await self._acall_modal(modal_url, system_context, user_query, prefix)
+        return await self._agenerate_fallback(system_context, user_query, prefix)
+
+    async def _agenerate_fallback(self, system_context: str, user_query: str, prefix: tuple = None) -> str:
+        """Mock, or the local model on its worker (micro-batched)."""
+        if self.mock_mode:
+            return self._mock_response(user_query, system_context)
+
+        if LLM_BATCH_MAX > 1:
+            self.batcher.executor = self._generate_executor()
+            return await self.batcher.submit((system_context, user_query, prefix))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._generate_executor(), self._generate_local, system_context, user_query, prefix)
+
+    async def astream_response(self, system_context: str, user_query: str, prefix: tuple = None):
+        """
+        Async generator of text chunks as they are generated.
+        Modal: MODAL_STREAM_URL (the api_generate_stream endpoint); with only MODAL_URL the
+        whole answer arrives as one chunk. Local: a TextIteratorStreamer fed by generate()
+        on the generation worker. Mock: the canned answer, word by word.
+        """
+        stream_url = os.getenv("MODAL_STREAM_URL")
+        modal_url = os.getenv("MODAL_URL")
+        if stream_url and stream_url.startswith("http"):
+            async for chunk in self._astream_modal(stream_url, system_context, user_query, prefix):
+                yield chunk
+            return
+        if modal_url and modal_url.startswith("http"):
+            yield await self._acall_modal(modal_url, system_context, user_query, prefix)
+            return
+        async for chunk in self._astream_fallback(system_context, user_query, prefix):
+            yield chunk
+
+    async def _astream_fallback(self, system_context: str, user_query: str, prefix: tuple = None):
+        if self.mock_mode:
+            for word in re.findall(r"\S+\s*|\s+", self._mock_response(user_query, system_context)):
+                yield word
+            return
+
         try:
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+            # On the generation worker too: a prefix-cache miss runs a forward pass
+            loop = asyncio.get_running_loop()
+            streamer = await loop.run_in_executor(self._generate_executor(), self._start_local_stream,
+                                                  system_context, user_query, prefix)
+        except Exception as e:
+            yield FallbackText(f"Error generating response: {e}")
+            return
+        while True:
+            try:
+                chunk = await asyncio.to_thread(next, streamer, None)
+            except queue.Empty: # generate() stalled for MODAL_TIMEOUT seconds
+                yield FallbackText(f"Error generating response: no tokens for {MODAL_TIMEOUT:.0f}s")
+                return
+            if chunk is None:
+                return
+            if chunk:
+                yield chunk
+
+    def _generate_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-generate")
+        return self._executor
+
+    @staticmethod
+    def _local_prompt(system_context: str, user_query: str) -> str:
+        return f"<|im_start|>system\n{system_context}<|im_end|>\n<|im_start|>user\n{user_query}<|im_end|>\n<|im_start|>assistant\n"
+
+    @staticmethod
+    def _stable_prefix(system_context: str, prefix: tuple = None) -> tuple:
+        """
+        (cache key, leading text of the local prompt): the chat header plus the caller's
+        snapshot prefix when given, else plus the fixed context heading.
+        """
+        header = "<|im_start|>system\n"
+        if prefix is not None:
+            key, system_prefix = prefix
+            if system_context.startswith(system_prefix):
+                return key, header + system_prefix
+        text = header + SYSTEM_HEADER if system_context.startswith(SYSTEM_HEADER) else header
+        return text, text
+
+    def _encode_prefix(self, prefix: str):
+        """Blocking: one forward pass over the prefix -> (token ids, past key values)."""
+        import torch
+        ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(self.model.device)
+        with torch.no_grad():
+            past = self.model(input_ids=ids, use_cache=True).past_key_values
+        return ids, past
+
+    def _local_inputs(self, system_context: str, user_query: str, prefix: tuple = None) -> dict:
+        """
+        generate() inputs for one prompt. With the prefix cache, the prompt is tokenized as
+        cached prefix + remainder and generation resumes from a copy of the prefix's KV cache
+        (generate() extends the cache in place), so prefill only covers the remainder.
+        """
+        prompt = self._local_prompt(system_context, user_query)
+        if not LLM_PREFIX_CACHE:
+            return dict(self.tokenizer(prompt, return_tensors="pt").to(self.model.device))
+        import torch
+        key, prefix_text = self._stable_prefix(system_context, prefix)
+        prefix_ids, past = self.prefix_cache.get(prefix_text, key)
+        rest = self.tokenizer(prompt[len(prefix_text):], return_tensors="pt", add_special_tokens=False).input_ids
+        input_ids = torch.cat([prefix_ids, rest.to(self.model.device)], dim=1)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": copy.deepcopy(past),
+        }
+
+    def _start_local_stream(self, system_context: str, user_query: str, prefix: tuple = None):
+        """
+        Runs on the generation worker (a prefix-cache miss is a forward pass) and queues
+        generate() behind itself; returns the (blocking) token iterator.
+        The per-token timeout only starts once the job runs, not while it waits its turn.
+        """
+        from transformers import TextIteratorStreamer
+        inputs = self._local_inputs(system_context, user_query, prefix)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        def run():
+            streamer.timeout = MODAL_TIMEOUT
+            self.model.generate(
+                **inputs,
+                streamer=streamer,
+                max_new_tokens=MAX_NEW_TOKENS,
+                temperature=0.7,
+                do_sample=True
+            )
+        self._generate_executor().submit(run)
+        return streamer
+
+    def _generate_local(self, system_context: str, user_query: str, prefix: tuple = None) -> str:
+        """Blocking (model.generate)."""
+        try:
+            inputs = self._local_inputs(system_context, user_query, prefix)
             outputs = self.model.generate(
                 **inputs, 
-                max_new_tokens=150,
+                max_new_tokens=MAX_NEW_TOKENS,
                 temperature=0.7,
                 do_sample=True
             )
             response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
             return response.split("assistant")[-1].strip()
         except Exception as e:
-            return f"Error generating response: {e}"
+            return FallbackText(f"Error generating response: {e}")
 
-    def _call_modal(self, url, context, query):
-        """Calls the serverless Modal endpoint."""
-        # Note: requests must be installed. It usually is, but let's be safe.
-        prompt = f"System: {context}\nUser: {query}\nAssistant:"
+    def _generate_local_batch(self, requests: list) -> list:
+        """Blocking: one left-padded generate() call for [(system_context, user_query, prefix), ...]."""
+        if len(requests) == 1: # nothing to pad: take the prefix-cached single path
+            return [self._generate_local(*requests[0])]
+        prompts = [self._local_prompt(context, query) for context, query, *_ in requests]
         try:
-            res = requests.post(url, json={"prompt": prompt}, timeout=30)
-            if res.status_code == 200:
-                return res.json().get("response", "Error: No response field")
-            return f"Modal Error {res.status_code}: {res.text}"
+            self.tokenizer.padding_side = "left" # decoder-only: pad before the prompt
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=MAX_NEW_TOKENS,
+                temperature=0.7,
+                do_sample=True,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+            new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+            return [text.strip() for text in self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
         except Exception as e:
-            return f"Modal Connection Failed: {e}"
+            return [FallbackText(f"Error generating response: {e}")] * len(requests)
+
+    @staticmethod
+    def _modal_payload(context, query, prefix=None) -> dict:
+        """Request body; "prefix" is the leading part of the prompt Model.generate may cache."""
+        payload = {"prompt": f"System: {context}\nUser: {query}\nAssistant:"}
+        if MODAL_PREFIX_CACHE and prefix is not None and context.startswith(prefix[1]):
+            payload["prefix"] = f"System: {prefix[1]}"
+        return payload
+
+    def _sync_http(self):
+        if self._session is None:
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            self._session.mount("https://", HTTPAdapter(pool_maxsize=MODAL_MAX_CONNECTIONS))
+            self._session.mount("http://", HTTPAdapter(pool_maxsize=MODAL_MAX_CONNECTIONS))
+        return self._session
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        """Connection problems, timeouts and 5xx are worth retrying; other 4xx are not."""
+        return not isinstance(error, ModalHTTPError) or error.status_code >= 500
+
+    def _failover(self, error) -> None:
+        self.modal_counts["failovers"] += 1
+        print(f"LLM: Modal unavailable ({error}), answering with the {'mock' if self.mock_mode else 'local'} model.")
+
+    @staticmethod
+    def _as_fallback(text: str) -> FallbackText:
+        """Failover answers are flagged so callers don't cache them past Modal's recovery."""
+        return text if isinstance(text, FallbackText) else FallbackText(text)
+
+    def _call_modal(self, url, context, query, prefix=None):
+        """
+        Calls the serverless Modal endpoint (pooled keep-alive session, retries).
+        Fails over to local/mock generation when the call fails or the circuit is open.
+        """
+        if not self.breaker.allow():
+            self._failover(CircuitOpenError("circuit open"))
+            return self._as_fallback(self._generate_fallback(context, query, prefix))
+        self.modal_counts["calls"] += 1
+        payload = self._modal_payload(context, query, prefix)
+        for attempt in range(MODAL_RETRIES + 1):
+            try:
+                start = time.perf_counter()
+                res = self._sync_http().post(url, json=payload, timeout=(MODAL_CONNECT_TIMEOUT, MODAL_TIMEOUT))
+                if res.status_code != 200:
+                    raise ModalHTTPError(res.status_code, res.text)
+                self.modal_stats.record((time.perf_counter() - start) * 1000.0)
+                self.breaker.record_success()
+                return res.json().get("response", "Error: No response field")
+            except Exception as e:
+                error = e
+                if not self._retryable(e) or attempt == MODAL_RETRIES:
+                    break
+                self.modal_counts["retries"] += 1
+                time.sleep(0.1 * 2 ** attempt)
+        self.modal_counts["failures"] += 1
+        self.breaker.record_failure()
+        self._failover(error)
+        return self._as_fallback(self._generate_fallback(context, query, prefix))
+
+    def _async_http(self):
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(MODAL_TIMEOUT, connect=MODAL_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=MODAL_MAX_CONNECTIONS,
+                                    max_keepalive_connections=MODAL_MAX_CONNECTIONS),
+            )
+        return self._http
+
+    async def _apost_modal(self, url, payload: dict) -> str:
+        start = time.perf_counter()
+        res = await self._async_http().post(url, json=payload)
+        if res.status_code != 200:
+            raise ModalHTTPError(res.status_code, res.text)
+        self.modal_stats.record((time.perf_counter() - start) * 1000.0)
+        return res.json().get("response", "Error: No response field")
+
+    def _hedge_delay(self):
+        """Seconds after which a second request is sent: the observed latency percentile."""
+        if MODAL_HEDGE_PERCENTILE <= 0 or self.modal_stats.count < MODAL_HEDGE_MIN_SAMPLES:
+            return None
+        return self.modal_stats.percentile(MODAL_HEDGE_PERCENTILE) / 1000.0
+
+    async def _acall_modal(self, url, context, query, prefix=None):
+        """
+        Async _call_modal, reusing pooled connections (no TCP/TLS handshake per question),
+        hedged once a call runs past the usual latency, retried, behind the circuit breaker.
+        """
+        if not self.breaker.allow():
+            self._failover(CircuitOpenError("circuit open"))
+            return self._as_fallback(await self._agenerate_fallback(context, query, prefix))
+        self.modal_counts["calls"] += 1
+        payload = self._modal_payload(context, query, prefix)
+        for attempt in range(MODAL_RETRIES + 1):
+            try:
+                response, hedge_sent = await hedged(lambda: self._apost_modal(url, payload), self._hedge_delay())
+                self.modal_counts["hedges"] += hedge_sent
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                error = e
+                if not self._retryable(e) or attempt == MODAL_RETRIES:
+                    break
+                self.modal_counts["retries"] += 1
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        self.modal_counts["failures"] += 1
+        self.breaker.record_failure()
+        self._failover(error)
+        return self._as_fallback(await self._agenerate_fallback(context, query, prefix))
+
+    async def _astream_modal(self, url, context, query, prefix=None):
+        """Streams from Modal; before the first chunk, a failure fails over like _acall_modal."""
+        error = CircuitOpenError("circuit open")
+        if self.breaker.allow():
+            self.modal_counts["calls"] += 1
+            started = False
+            try:
+                async with self._async_http().stream("POST", url, json=self._modal_payload(context, query, prefix)) as res:
+                    if res.status_code != 200:
+                        raise ModalHTTPError(res.status_code, (await res.aread()).decode(errors="replace"))
+                    async for chunk in res.aiter_text():
+                        if chunk:
+                            started = True
+                            yield chunk
+                self.breaker.record_success()
+                return
+            except Exception as e:
+                error = e
+                self.modal_counts["failures"] += 1
+                self.breaker.record_failure()
+                if started: # part of the answer is already out: don't restart it
+                    yield FallbackText(f" [Modal stream interrupted: {e}]")
+                    return
+        self._failover(error)
+        async for chunk in self._astream_fallback(context, query, prefix):
+            yield self._as_fallback(chunk)
+
+    async def _ping_modal(self):
+        """Keep-warm ping: a GET on MODAL_WARM_URL (the api_warm endpoint)."""
+        url = os.getenv("MODAL_WARM_URL")
+        if not url:
+            return
+        res = await self._async_http().get(url)
+        if res.status_code != 200:
+            raise ModalHTTPError(res.status_code, res.text)
+
+    def modal_health(self) -> dict:
+        return {**self.modal_counts, **self.breaker.stats(), "latency": self.modal_stats.summary(),
+                "keep_warm": self.keep_warm.stats()}
+
+    async def aclose(self):
+        self.keep_warm.stop()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self.batcher.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
     def _mock_response(self, query, context):
 
@@ -95,4 +490,7 @@ class LLMClient:
             return f"System Normal. \n{context}\n\nAll assets are within safe operating limits."
         return "I am the Digital Twin Assistant. Ask me 'What is the status?' or 'Is there an issue?' to check the grid."
 
-llm_client = LLMClient()
+llm_client = LazySingleton(LLMClient, "llm_client")
+register_counters("llm.batching", lambda: llm_client.batcher.stats() if llm_client.initialized else {})
+register_counters("llm.prefix_cache", lambda: llm_client.prefix_cache.stats() if llm_client.initialized else {})
+register_counters("llm.modal", lambda: llm_client.modal_health() if llm_client.initialized else {})
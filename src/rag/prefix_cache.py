@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+
+class PrefixKVCache:
+    """
+    LRU of encoded prompt prefixes: key -> whatever `build(prefix)` returns (for the local
+    model, the prefix token ids and their past key values). Generation resumes from the
+    cached entry instead of re-running prefill over the prefix for every question.
+    """
+    def __init__(self, build, maxsize: int = 4):
+        self.build = build
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, prefix: str, key=None):
+        """Entry for `prefix` (built on a miss). `key` defaults to the prefix text itself."""
+        key = prefix if key is None else key
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = self.build(prefix) # outside the lock: a forward pass over the prefix
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,46 @@
+from src.rag.llm_client import CONTEXT_WINDOW, MAX_NEW_TOKENS
+
+# Chat-template / role markers around the system and user turns (upper bound, in tokens)
+TEMPLATE_TOKENS = 32
+
+class PromptBuilder:
+    """
+    Builds the generation context once per question, within the model's token window.
+    Live twin data is always kept; manual extracts are added in retrieval order until the
+    budget (window - answer tokens - question - template) is used up.
+    """
+    def __init__(self, count_tokens, context_window: int = CONTEXT_WINDOW, max_new_tokens: int = MAX_NEW_TOKENS):
+        self.count_tokens = count_tokens
+        self.context_window = context_window
+        self.max_new_tokens = max_new_tokens
+
+    def build(self, query: str, grid_context: str, asset_context: str = None, docs=()) -> dict:
+        budget = self.context_window - self.max_new_tokens - TEMPLATE_TOKENS - self.count_tokens(query)
+        sections = [grid_context] + ([asset_context] if asset_context else [])
+        used = sum(self.count_tokens(s) for s in sections)
+
+        kept, dropped = [], 0
+        for doc in docs:
+            tokens = self.count_tokens(doc)
+            if used + tokens > budget:
+                dropped += 1
+                continue
+            kept.append(doc)
+            used += tokens
+        if kept:
+            sections.append("\n".join(kept))
+
+        context = "\n".join(sections)
+        system_context = f"Relevant Data:\n{context}"
+        # Leading part that only depends on the twin snapshot (shared by every question on it)
+        system_prefix = f"Relevant Data:\n{grid_context}"
+        context_tokens = self.count_tokens(system_context)
+        return {
+            "context": context,
+            "system_context": system_context,
+            "system_prefix": system_prefix,
+            "context_tokens": context_tokens,
+            "prompt_tokens": context_tokens + self.count_tokens(query) + TEMPLATE_TOKENS,
+            "budget_tokens": budget,
+            "dropped_docs": dropped,
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures. While open, calls are
+    refused (callers fail over) until `reset_timeout` seconds have passed; then one trial
+    call is let through (half-open) and its outcome closes or re-opens the circuit (a trial
+    that never reports back is replaced after another `reset_timeout`).
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.trial_started_at = 0.0
+        self.times_opened = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = self.clock()
+            if state == "half_open" and (not self.trial_running or now - self.trial_started_at >= self.reset_timeout):
+                self.trial_running = True
+                self.trial_started_at = now
+                return True
+            self.refused += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.times_opened += 1
+                self.opened_at = self.clock()
+                self.trial_running = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "refused": self.refused,
+        }
+
+async def hedged(call, delay: float = None):
+    """
+    Awaits `call()`; if it has not finished after `delay` seconds, starts a second
+    `call()` and returns whichever succeeds first (the other is cancelled).
+    Returns (result, hedged). Raises the last error if every attempt fails.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    hedge_started = False
+    error = None
+    try:
+        while tasks:
+            timeout = None if hedge_started or delay is None else delay
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                tasks.append(asyncio.ensure_future(call()))
+                hedge_started = True
+                continue
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    return task.result(), hedge_started
+                error = task.exception()
+            if not hedge_started: # fast failure, not slowness: no point in a hedge
+                break
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+class KeepWarm:
+    """Calls `ping()` (async) every `interval` seconds so a scale-to-zero backend stays warm."""
+    def __init__(self, ping, interval: float = 60.0):
+        self.ping = ping
+        self.interval = interval
+        self.running = False
+        self.pings = 0
+        self.failures = 0
+
+    async def run(self):
+        self.running = True
+        while self.running:
+            try:
+                await self.ping()
+                self.pings += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"LLM: keep-warm ping failed ({e})")
+            await asyncio.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+
+    def stats(self) -> dict:
+        return {"interval_s": self.interval, "pings": self.pings, "failures": self.failures}
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import numpy as np
+
+class LocalVectorIndex:
+    """
+    In-process vector index: a float32 matrix of unit-normalized embeddings, searched with
+    one matrix-vector product (cosine similarity) and an argpartition top-k.
+
+    Persisted as `<path>.npy` (vectors, opened memory-mapped) + `<path>.json` (ids and
+    payloads). Has the same `existing`/`upsert`/`path_ids`/`delete` interface as
+    ingestion.QdrantSink, so the bulk ingestion pipeline can write to it directly.
+    """
+    def __init__(self, dim: int = 384, path: str = None):
+        self.dim = dim
+        self.path = path
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._ids = []
+        self._payloads = []
+        self._rows = {} # id -> row
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    @classmethod
+    def open(cls, path: str, dim: int = 384):
+        """Loads the index at `path` (vectors memory-mapped, not read into RAM), or an empty one."""
+        index = cls(dim, path)
+        if os.path.exists(path + ".npy") and os.path.exists(path + ".json"):
+            vectors = np.load(path + ".npy", mmap_mode="r")
+            with open(path + ".json") as f:
+                meta = json.load(f)
+            if vectors.shape[1] != dim or len(meta["ids"]) != vectors.shape[0]:
+                print(f"Vector Index: ignoring '{path}' (dim {vectors.shape[1]}, expected {dim}).")
+                return index
+            index._vectors = vectors
+            index._ids = meta["ids"]
+            index._payloads = meta["payloads"]
+            index._rows = {point_id: row for row, point_id in enumerate(index._ids)}
+        return index
+
+    def existing(self, ids: list) -> set:
+        return {point_id for point_id in ids if point_id in self._rows}
+
+    def upsert(self, ids: list, vectors, payloads: list):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        with self._lock:
+            n = len(self._ids)
+            new = [point_id not in self._rows for point_id in ids]
+            grown = n + sum(new)
+            if grown > self._vectors.shape[0] or not self._vectors.flags.writeable:
+                # Grow geometrically (and leave the read-only memory map behind)
+                capacity = max(grown, 2 * n, 64)
+                matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+                matrix[:n] = self._vectors[:n]
+                self._vectors = matrix
+            for point_id, vector, payload, is_new in zip(ids, vectors, payloads, new):
+                if is_new:
+                    self._rows[point_id] = len(self._ids)
+                    self._ids.append(point_id)
+                    self._payloads.append(payload)
+                else:
+                    self._payloads[self._rows[point_id]] = payload
+                self._vectors[self._rows[point_id]] = vector
+
+    def path_ids(self, paths) -> dict:
+        """{path: ids of its points} for the given document paths."""
+        found = {}
+        with self._lock:
+            for point_id, payload in zip(self._ids, self._payloads):
+                if payload.get("path") in paths:
+                    found.setdefault(payload["path"], set()).add(point_id)
+        return found
+
+    def delete(self, ids: list) -> int:
+        """Removes the given points (unknown ids are ignored); compacts the matrix. Returns points removed."""
+        with self._lock:
+            drop = {self._rows[point_id] for point_id in ids if point_id in self._rows}
+            if not drop:
+                return 0
+            keep = [row for row in range(len(self._ids)) if row not in drop]
+            self._vectors = np.array(self._vectors[keep], dtype=np.float32) # writable copy
+            self._ids = [self._ids[row] for row in keep]
+            self._payloads = [self._payloads[row] for row in keep]
+            self._rows = {point_id: row for row, point_id in enumerate(self._ids)}
+            return len(drop)
+
+    def items(self):
+        """(ids, payloads) snapshot, e.g. to build a keyword index over the same points."""
+        with self._lock:
+            return list(self._ids), list(self._payloads)
+
+    def search(self, vector, limit: int = 2) -> list:
+        """Top-`limit` points by cosine similarity: [{"id", "score", **payload}, ...], best first."""
+        with self._lock:
+            n = len(self._ids)
+            matrix, ids, payloads = self._vectors, self._ids, self._payloads
+        if n == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        scores = matrix[:n] @ (query / norm)
+        k = min(limit, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": ids[i], "score": float(scores[i]), **payloads[i]} for i in top]
+
+    def save(self, path: str = None):
+        """Writes both files next to each other, atomically, then re-opens the vectors memory-mapped."""
+        path = path or self.path
+        with self._lock:
+            n = len(self._ids)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path + ".npy.tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(self._vectors[:n]))
+            with open(path + ".json.tmp", "w") as f:
+                json.dump({"ids": self._ids, "payloads": self._payloads}, f)
+            os.replace(path + ".npy.tmp", path + ".npy")
+            os.replace(path + ".json.tmp", path + ".json")
+            self._vectors = np.load(path + ".npy", mmap_mode="r")
+            self.path = path
+
+    def sync_from(self, client, collection: str, page_size: int = 256) -> int:
+        """
+        Mirrors a Qdrant collection (ids, vectors, payloads) into this index, dropping points
+        no longer in it (e.g. stale chunks of a re-ingested manual). Returns points copied.
+        """
+        seen, offset = set(), None
+        while True:
+            points, offset = client.scroll(collection, limit=page_size, offset=offset,
+                                           with_payload=True, with_vectors=True)
+            if points:
+                ids = [str(p.id) for p in points]
+                self.upsert(ids, [p.vector for p in points], [p.payload for p in points])
+                seen.update(ids)
+            if offset is None:
+                break
+        self.delete([point_id for point_id in self.items()[0] if point_id not in seen])
+        return len(seen)
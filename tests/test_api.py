@@ -36,3 +36,69 @@ def test_trigger_simulation():
     # but the twin updates synchronously on access usually? No, it ticks in background now.)
     # Let's just check the response for now.
 
+
+def test_metrics_endpoint():
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["mode"] in ("thread", "inline")
+    assert isinstance(data["latency"], dict)
+
+def test_fleet_endpoints():
+    response = client.get("/api/grid/stations")
+    assert response.status_code == 200
+    ids = [s["station_id"] for s in response.json()["stations"]]
+    assert "ALPHA" in ids
+
+    response = client.get("/api/grid/stations/ALPHA/status")
+    assert response.status_code == 200
+    assert "transformer_loading_percent" in response.json()
+
+    assert client.get("/api/grid/stations/NOPE/status").status_code == 404
+
+    response = client.get("/api/grid/fleet/status")
+    assert response.status_code == 200
+    assert response.json()["station_count"] >= 1
+
+def test_metrics_include_embedding_cache_counters():
+    counters = client.get("/api/metrics").json()["counters"]
+    assert set(counters["rag.embedding_cache"]) == {"size", "hits", "misses", "hit_rate"}
+
+def test_importing_app_defers_heavy_modules():
+    import subprocess
+    import sys
+    code = ("import sys, src.main; "
+            "print([m for m in ('pypsa', 'torch', 'transformers', 'qdrant_client', 'sentence_transformers') "
+            "if m in sys.modules])")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+def test_lazy_singleton_builds_once_on_first_use():
+    from src.lazy import LazySingleton
+
+    built = []
+    singleton = LazySingleton(lambda: built.append(1) or type("Thing", (), {"value": 1})(), "thing")
+    assert not singleton.initialized and built == []
+    singleton.value = 2
+    assert singleton.value == 2 and singleton.get() is singleton.get()
+    assert built == [1]
+
+def _sse_events(body: str):
+    import json
+    events = []
+    for block in filter(None, body.split("\n\n")):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_chat_stream_endpoint_sends_tokens_then_done():
+    response = client.post("/api/chat/stream", json={"query": "What is the status?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    assert events[0][0] == "context" and "LIVE SCADA DATA" in events[0][1]["context_used"]
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert len(tokens) > 1
+    assert events[-1][0] == "done"
+    assert events[-1][1]["response"] == "".join(tokens)
+    assert events[-1][1]["timings_ms"]["first_token"] <= events[-1][1]["timings_ms"]["total"]
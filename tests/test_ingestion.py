@@ -0,0 +1,406 @@
+import asyncio
+import json
+import time
+from fastapi.testclient import TestClient
+from src.main import app
+from src.ingestion.broadcast import BroadcastHub, broadcast_hub
+from src.ingestion.stream_processor import StreamMock
+
+def test_broadcast_serializes_once_for_all_subscribers():
+    async def scenario():
+        hub = BroadcastHub()
+        q1, q2 = hub.subscribe(), hub.subscribe()
+        frame = hub.publish({"timestamp": 1, "grid": {"total_load_mw": 12.5}})
+        # Same string object goes to every subscriber
+        assert (await q1.get()) is frame
+        assert (await q2.get()) is frame
+        assert json.loads(frame)["grid"]["total_load_mw"] == 12.5
+
+    asyncio.run(scenario())
+
+def test_broadcast_drops_stale_frames_for_slow_consumer():
+    async def scenario():
+        hub = BroadcastHub(max_queue=2)
+        slow = hub.subscribe()
+        for i in range(5):
+            hub.publish({"timestamp": i})
+        # Only the newest frames survive, publishing never blocked
+        assert slow.qsize() == 2
+        assert json.loads(slow.get_nowait())["timestamp"] == 3
+        assert json.loads(slow.get_nowait())["timestamp"] == 4
+        assert hub.frames_dropped == 3
+
+    asyncio.run(scenario())
+
+def test_websocket_receives_latest_frame():
+    broadcast_hub.publish({"timestamp": "t0", "grid": {"alerts": []}, "assets": {}})
+    client = TestClient(app)
+    with client.websocket_connect("/api/ws/live") as ws:
+        data = ws.receive_json()
+        assert data["timestamp"] == "t0"
+        assert "assets" in data
+
+def test_stream_thread_mode_publishes_frames():
+    async def scenario():
+        hub = BroadcastHub()
+        stream = StreamMock(hub=hub, mode="thread", interval=0.01)
+        queue = hub.subscribe()
+        task = asyncio.create_task(stream.start_stream())
+        frame = json.loads(await asyncio.wait_for(queue.get(), timeout=10))
+        stream.stop()
+        await task
+        return frame
+
+    frame = asyncio.run(scenario())
+    assert "transformer_loading_percent" in frame["grid"]
+    assert "health_score" in frame["assets"]["T1_Transformer"]
+
+def test_history_downsampling_matches_raw_aggregates():
+    import numpy as np
+    from src.ingestion.history import TelemetryHistory
+
+    history = TelemetryHistory(signals=["oil_temp"], capacity=500, factors=(1, 10, 100))
+    values = np.arange(2000, dtype=float)
+    for t, v in enumerate(values):
+        history.record(float(t), {"oil_temp": v})
+
+    # Last 100 s -> raw level, 10 buckets of 10 samples
+    result = history.query(window=99, buckets=10)
+    oil = result["signals"]["oil_temp"]
+    assert len(result["buckets"]) == 10
+    assert oil["min"][0] == 1900.0 and oil["max"][-1] == 1999.0
+    assert oil["mean"][0] == np.mean(values[1900:1910])
+
+    # Window longer than the raw retention -> served from an aggregate level
+    result = history.query(window=1999, buckets=20)
+    oil = result["signals"]["oil_temp"]
+    assert oil["min"][0] == 0.0
+    assert oil["max"][-1] == 1999.0
+    assert abs(np.mean(oil["mean"]) - values.mean()) < 1.0
+
+def test_history_skips_missing_and_non_finite_samples():
+    import numpy as np
+    from src.ingestion.history import TelemetryHistory
+
+    history = TelemetryHistory(signals=["a", "b"], capacity=50, factors=(1, 10))
+    a = np.arange(200, dtype=float)
+    a[::3] = np.nan # gaps in one signal must not touch the other, or the rest of its bucket
+    a[7] = np.inf
+    for t in range(200):
+        history.record(float(t), {"a": a[t], "b": 1.0})
+    finite = np.where(np.isfinite(a), a, np.nan)
+
+    for window, buckets in ((49, 5), (199, 4)): # raw level, then the 10x aggregate level
+        result = history.query(window=window, buckets=buckets)
+        rows = np.split(finite[200 - window - 1:], buckets)
+        assert result["signals"]["a"]["min"] == [np.nanmin(r) for r in rows]
+        assert result["signals"]["a"]["max"] == [np.nanmax(r) for r in rows]
+        assert np.allclose(result["signals"]["a"]["mean"], [np.nanmean(r) for r in rows], atol=1e-3) # rounded
+        assert result["signals"]["b"]["mean"] == [1.0] * buckets
+
+def test_history_missing_signal_and_endpoint():
+    from src.ingestion.history import TelemetryHistory, telemetry_history
+
+    history = TelemetryHistory(signals=["a", "b"])
+    history.record(0.0, {"a": 1.0})
+    assert history.query(window=10)["signals"]["b"]["mean"] == [None]
+
+    telemetry_history.record(time.time(), {"oil_temp": 55.0})
+    client = TestClient(app)
+    response = client.get("/api/grid/history?window=60&buckets=10&signals=oil_temp")
+    assert response.status_code == 200
+    assert response.json()["signals"]["oil_temp"]["max"][-1] >= 55.0
+    assert client.get("/api/grid/history?signals=nope").status_code == 400
+
+def _station_frame(seq, loads, t1_signals, extra):
+    import numpy as np
+    from src.ingestion.scada import encode_frame
+    return encode_frame(seq, 1000.0 + seq, np.r_[loads, t1_signals, np.zeros(extra)])
+
+def test_frame_decoder_batches():
+    import numpy as np
+    import pytest
+    from src.ingestion.scada import FrameDecoder, encode_frame
+
+    decoder = FrameDecoder(n_points=5, batch_size=4)
+    frames = [encode_frame(i, 10.0 * i, np.arange(5) + i) for i in range(3)]
+    assert decoder.decode(frames) == 3
+    np.testing.assert_array_equal(decoder.values[2], np.arange(5) + 2)
+    assert list(decoder.seq[:3]) == [0, 1, 2]
+    assert decoder.timestamps[1] == 10.0
+    with pytest.raises(ValueError):
+        decoder.decode([frames[0][:-4]])
+
+def test_scada_pipeline_feeds_twin_and_assets():
+    from src.digital_twin.grid_model import NetworkTwin
+    from src.digital_twin.asset_models import AssetManager
+    from src.ingestion.scada import InProcessBus, PointMap, ScadaIngestion
+
+    twin = NetworkTwin(solver="linear")
+    assets = AssetManager()
+    point_map = PointMap.for_twin(twin, ["T1_Transformer", "T2_Transformer"], extra_points=100)
+    assert point_map.n_points == 3 + 8 + 100
+
+    async def scenario():
+        bus = InProcessBus()
+        ingestion = ScadaIngestion(bus.subscribe("station/alpha", maxsize=8), point_map, twin=twin, assets=assets)
+        task = asyncio.create_task(ingestion.run())
+        for seq in range(50):
+            # Small subscriber queue: publish() waits for the pipeline (backpressure)
+            await bus.publish("station/alpha", _station_frame(
+                seq, [10.0, 10.0, 20.0], [50, 99.0, 1.0, 10.0, 50, 60.0, 1.0, 10.0], 100))
+        await bus.close("station/alpha")
+        await task
+        return ingestion
+
+    ingestion = asyncio.run(scenario())
+    assert ingestion.frames_processed == 50
+    assert ingestion.latest["seq"] == 49
+    # 40 MW through the 40 MVA transformer
+    assert twin.get_system_status()["transformer_loading_percent"] == 100.0
+    assert assets.assets["T1_Transformer"].health_score == 40.0
+    assert ingestion.health.report("T2_Transformer")["health_score"] == 100.0
+
+def test_scada_pipeline_drops_malformed_frames_and_keeps_consuming():
+    from src.ingestion.scada import InProcessBus, PointMap, ScadaIngestion
+
+    point_map = PointMap(["L1"], ["T1_Transformer"])
+    good = [_station_frame(seq, [5.0], [50, 60.0, 1.0, 10.0], 0) for seq in range(4)]
+
+    async def scenario():
+        bus = InProcessBus()
+        ingestion = ScadaIngestion(bus.subscribe("station/alpha"), point_map)
+        for frame in [good[0], good[1][:-4], b"XXXX" + good[2][4:], good[3]]: # truncated, bad magic
+            await bus.publish("station/alpha", frame)
+        await bus.close("station/alpha")
+        await ingestion.run()
+        return ingestion
+
+    ingestion = asyncio.run(scenario())
+    assert ingestion.frames_dropped == 2 and ingestion.frames_processed == 2
+    assert ingestion.latest["seq"] == 3
+
+def test_scada_pipeline_detects_anomalies_on_every_row():
+    import numpy as np
+    from src.ingestion.scada import InProcessBus, PointMap, ScadaIngestion
+
+    rng = np.random.default_rng(3)
+    point_map = PointMap(["L1"], ["T1_Transformer"])
+    frames = [_station_frame(seq, [5.0 + rng.normal(0, 0.1)], [50, 60.0 + rng.normal(0, 0.5), 1.0, 10.0], 0)
+              for seq in range(200)]
+    frames[150] = _station_frame(150, [5.0], [50, 95.0, 1.0, 10.0], 0) # one row, mid-batch
+
+    async def scenario():
+        bus = InProcessBus()
+        ingestion = ScadaIngestion(bus.subscribe("station/alpha", maxsize=len(frames) + 1), point_map,
+                                   batch_size=64)
+        for frame in frames: # all queued before the pipeline runs: full batches
+            await bus.publish("station/alpha", frame)
+        await bus.close("station/alpha")
+        await ingestion.run()
+        return ingestion
+
+    ingestion = asyncio.run(scenario())
+    assert ingestion.batches_processed < 10 and ingestion.latest["seq"] == 199
+    events = ingestion.drain_anomalies()
+    assert [(e["channel"], e["kind"], e["t"]) for e in events] == [("T1_Transformer.oil_temp", "spike", 1150.0)]
+    assert ingestion.drain_anomalies() == [] and ingestion.detector.samples == 200
+
+    # The stream publishes the pipeline's events; points appended to the layout are picked up
+    stream = StreamMock(mode="inline")
+    stream.attach(ingestion)
+    ingestion.anomalies.extend(events)
+    assert events[0] in stream._step()["anomalies"]
+    ingestion.channels = ingestion.channels + ["T2_Transformer.oil_temp"]
+    ingestion.detector.update_batch([[5.0, 50, 60.0, 1.0, 10.0, 70.0]], 2000.0, ingestion.channels)
+    assert ingestion.detector.count[ingestion.detector.index["T2_Transformer.oil_temp"]] == 1
+    assert ingestion.detector.cusum_mask[ingestion.detector.index["T2_Transformer.oil_temp"]]
+
+def test_scada_file_and_tcp_sources(tmp_path):
+    from src.ingestion.scada import FileReplaySource, TcpSource
+
+    frames = [_station_frame(i, [1.0, 2.0, 3.0], [0.0] * 4, 10) for i in range(20)]
+    capture = tmp_path / "capture.scd"
+    capture.write_bytes(b"".join(frames))
+
+    async def collect(source):
+        return [frame async for frame in source.frames()]
+
+    async def tcp_roundtrip():
+        async def serve(reader, writer):
+            writer.write(b"".join(frames))
+            await writer.drain()
+            writer.close()
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await collect(TcpSource("127.0.0.1", port))
+
+    assert asyncio.run(collect(FileReplaySource(str(capture), chunk_frames=3))) == frames
+    assert asyncio.run(tcp_roundtrip()) == frames
+
+def _recording(n=600, t0=1_700_000_000.0):
+    import numpy as np
+    import pandas as pd
+    t = t0 + np.arange(n, dtype=float)
+    frame = pd.DataFrame({
+        "timestamp": t,
+        "Load_Residential": 10.0, "Load_Commercial": 10.0, "Load_Industrial": 10.0,
+        "T1_Transformer.load_percent": 50.0,
+        "T1_Transformer.oil_temp": 60.0,
+        "T1_Transformer.h2_ppm": 10.0, # vibration column deliberately missing
+    })
+    frame.loc[100:149, "T1_Transformer.oil_temp"] = 99.0 # one incident
+    frame.loc[300:309, "T1_Transformer.oil_temp"] = 99.0 # and a second one
+    frame.loc[500:, "Load_Industrial"] = 20.0
+    frame.loc[550:560, "Load_Industrial"] = np.nan # gap: holds the last reading
+    return frame
+
+def test_replay_csv_drives_twin_assets_and_history(tmp_path):
+    from src.digital_twin.grid_model import NetworkTwin
+    from src.digital_twin.asset_models import AssetManager
+    from src.ingestion.replay import TelemetryReplay, open_recording
+    from src.ingestion.scada import PointMap
+
+    recording = _recording()
+    path = tmp_path / "incident.csv"
+    recording.to_csv(path, index=False)
+
+    twin = NetworkTwin(solver="linear")
+    assets = AssetManager()
+    point_map = PointMap.for_twin(twin, ["T1_Transformer"])
+    replay = TelemetryReplay(open_recording(str(path), point_map, chunk_rows=128), point_map, twin=twin, assets=assets)
+    summary = asyncio.run(replay.run())
+
+    assert summary["frames"] == 600
+    assert summary["recorded_seconds"] == 599
+    # Each incident counted once, even the one crossing a chunk boundary (rows 100-149)
+    assert summary["health_event_count"] == 2
+    assert summary["health_events"] == [(recording.timestamp[100], "T1_Transformer", 40.0),
+                                        (recording.timestamp[300], "T1_Transformer", 40.0)]
+    # 40 MW through the 40 MVA transformer for the last 100 rows (gap rows included)
+    assert summary["overload_frames"] == 100
+    # Every row goes through the detector: each incident's first row is flagged
+    spikes = {(e["t"], e["channel"]) for e in summary["anomalies"] if e["kind"] == "spike"}
+    assert {(recording.timestamp[100], "T1_Transformer.oil_temp"),
+            (recording.timestamp[300], "T1_Transformer.oil_temp")} <= spikes
+    assert summary["anomaly_count"] == len(summary["anomalies"]) and replay.detector.samples == 600
+    assert twin.get_system_status()["total_load_mw"] == 40.0
+    assert assets.assets["T1_Transformer"].health_score == 100.0
+
+    history = replay.history.query(window=600, buckets=6, end=recording.timestamp.iloc[-1])
+    assert history["signals"]["oil_temp"]["max"][1] == 99.0
+    assert history["signals"]["vibration"]["mean"][0] == 0.5 # missing column -> default
+
+def test_replay_formats_agree_and_speed_paces(tmp_path):
+    from src.digital_twin.grid_model import NetworkTwin
+    from src.ingestion.replay import TelemetryReplay, open_recording
+    from src.ingestion.scada import PointMap, encode_frame
+
+    twin = NetworkTwin(solver="linear")
+    point_map = PointMap.for_twin(twin, ["T1_Transformer"])
+    recording = _recording(n=200).reindex(columns=["timestamp"] + point_map.column_names()).fillna(0.5)
+    recording.to_parquet(tmp_path / "rec.parquet")
+    (tmp_path / "rec.scd").write_bytes(b"".join(
+        encode_frame(i, row[0], row[1:]) for i, row in enumerate(recording.to_numpy())))
+
+    def replay(name, speed=0.0):
+        chunks = open_recording(str(tmp_path / name), point_map, chunk_rows=64)
+        return TelemetryReplay(chunks, point_map, twin=NetworkTwin(solver="linear"), speed=speed, interval=0.05)
+
+    summaries = [asyncio.run(replay(name).run()) for name in ("rec.parquet", "rec.scd")]
+    assert summaries[0]["health_events"] == summaries[1]["health_events"]
+    assert len(summaries[0]["health_events"]) == 1
+    assert summaries[0]["frames"] == summaries[1]["frames"] == 200
+
+    # 200 recorded seconds at 1000x: ~0.2 s of wall time, published as several frames
+    hub = BroadcastHub()
+    queue = hub.subscribe()
+    stream = StreamMock(hub=hub, mode="inline")
+    stream.replay = replay("rec.scd", speed=1000.0)
+    start = time.perf_counter()
+    asyncio.run(stream.start_stream())
+    assert 0.15 < time.perf_counter() - start < 2.0
+    assert hub.frames_published >= 3
+    assert json.loads(hub.last_frame)["replay"]["frames"] == 200
+    received = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert received[-1] == hub.last_frame # the subscriber got the final frame
+
+def test_online_detector_flags_spikes_and_slow_drifts():
+    import numpy as np
+    from src.ingestion.anomaly import OnlineAnomalyDetector
+
+    rng = np.random.default_rng(7)
+    channels = [f"T{i}.{signal}" for i in range(200) for signal in ("oil_temp", "h2_ppm")]
+    detector = OnlineAnomalyDetector(channels, cusum_channels=channels)
+    base = np.tile([65.0, 10.0], 200)
+    events = []
+    for t in range(600):
+        events += detector.update(base + rng.normal(0, 1, len(channels)), t)
+    assert len(events) <= 10 # false alarms in 240k quiet samples
+
+    # T5 oil temperature spikes once; T9 H2 creeps up 0.05 ppm/sample (never a spike)
+    sample = base + rng.normal(0, 1, len(channels))
+    sample[detector.index["T5.oil_temp"]] = 90.0
+    sample[detector.index["T7.h2_ppm"]] = np.nan # missing reading: skipped
+    spikes = detector.update(sample, 600)
+    assert [(e["channel"], e["kind"]) for e in spikes] == [("T5.oil_temp", "spike")]
+    drifts = []
+    for t in range(1, 200):
+        sample = base + rng.normal(0, 1, len(channels))
+        sample[detector.index["T9.h2_ppm"]] += 0.05 * t
+        drifts += [e for e in detector.update(sample, 600 + t) if e["channel"] == "T9.h2_ppm"]
+    assert drifts and drifts[0]["kind"] == "drift_up" and drifts[0]["t"] < 600 + 80
+    assert all(e["kind"] != "spike" for e in drifts)
+    assert detector.stats()["channels"] == 400 and detector.count[detector.index["T7.h2_ppm"]] == 799
+
+    detector.add_channels(["T200.h2_ppm", "T5.oil_temp"], cusum_channels=["T200.h2_ppm"]) # one new
+    assert len(detector) == 401 and detector.cusum_mask[-1] and detector.count[-1] == 0
+    sample = np.append(base + rng.normal(0, 1, len(channels)), 10.0)
+    assert detector.update(sample, 800) == [] and detector.count[detector.index["T200.h2_ppm"]] == 1
+
+def test_online_detector_batches_match_row_updates():
+    import numpy as np
+    from src.ingestion.anomaly import OnlineAnomalyDetector
+
+    rng = np.random.default_rng(11)
+    channels = [f"T{i}.{signal}" for i in range(10) for signal in ("oil_temp", "h2_ppm")]
+    rows = 50.0 + rng.normal(0, 1, (900, len(channels)))
+    rows[rng.random(rows.shape) < 0.05] = np.nan # gaps
+    rows[:100, 4] = np.nan # a channel that starts reporting late
+    rows[400:, 1] += np.linspace(0, 20, 500) # drift up
+    rows[500:, 3] -= np.linspace(0, 20, 400) # drift down
+    rows[[200, 201, 650], [6, 6, 8]] += 25.0 # spikes, one lasting two rows
+
+    single = OnlineAnomalyDetector(channels, cusum_channels=channels)
+    batched = OnlineAnomalyDetector(channels, cusum_channels=channels)
+    expected = [e for t, row in enumerate(rows) for e in single.update(row, float(t))]
+    events = []
+    for lo in range(0, len(rows), 128): # state carries across batches
+        events += batched.update_batch(rows[lo:lo + 128], np.arange(lo, min(len(rows), lo + 128)))
+    assert {e["kind"] for e in expected} == {"spike", "drift_up", "drift_down"}
+    assert events == expected
+    for name in ("count", "mean", "var", "baseline", "cusum_pos", "cusum_neg", "spiking", "drifting"):
+        assert np.array_equal(getattr(single, name), getattr(batched, name)), name
+
+    # Named columns: any order or subset, unknown names are added (CUSUM by signal name)
+    detector = OnlineAnomalyDetector(["A.load"], cusum_signals=["h2_ppm"])
+    detector.update_batch([[1.0, 2.0], [1.0, 2.0]], 0.0, ["B.h2_ppm", "A.load"])
+    assert detector.channels == ["A.load", "B.h2_ppm"] and list(detector.cusum_mask) == [False, True]
+    assert list(detector.mean) == [2.0, 1.0] and detector.samples == 2
+
+def test_stream_step_reports_anomalies_on_overload():
+    from src.digital_twin.grid_model import grid_twin
+
+    grid_twin.anomaly_timer = 0 # a scenario still locked in by another test would be learnt as normal
+    stream = StreamMock(mode="inline")
+    quiet = sum(len(stream._step()["anomalies"]) for _ in range(60))
+    grid_twin.inject_anomaly("overload")
+    events = stream._step()["anomalies"]
+    assert quiet == 0
+    assert {"grid.transformer_loading_percent", "T1_Transformer.oil_temp"} <= {e["channel"] for e in events}
+
+    stream._detect(grid_twin.get_system_status(), {"T9_Transformer": {"oil_temp": 60.0}}) # reports late
+    assert "T9_Transformer.oil_temp" in stream.detector.index
+    for _ in range(20): # let the locked anomaly expire for the other tests
+        stream._step()
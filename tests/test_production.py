@@ -3,7 +3,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 from src.main import app
-from src.rag.llm_client import LLMClient
+from src.rag.llm_client import FallbackText, LLMClient
 import importlib
 
 client = TestClient(app)
@@ -19,7 +19,7 @@ def test_render_health_check_path():
     assert "timestamp" in response.json()
 
 # 2. MODAL INTEGRATION CHECKS
-@patch("src.rag.llm_client.requests.post")
+@patch("src.rag.llm_client.requests.Session.post")
 def test_llm_client_modal_routing(mock_post):
     """
     Verifies that if MODAL_URL is set, the client sends requests there
@@ -68,3 +68,233 @@ def test_modal_file_integrity():
     assert hasattr(modal_module, "Model")
     # Check if api_generate function exists
     assert hasattr(modal_module, "api_generate")
+
+def test_async_modal_calls_share_a_pooled_client_and_overlap():
+    """
+    Concurrent chat questions must not queue behind each other (or the event loop):
+    five 0.2 s Modal calls finish in well under 5 x 0.2 s over one pooled client.
+    """
+    import asyncio
+    import time
+    import httpx
+
+    async def slow_modal(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"response": "pooled answer"})
+
+    async def scenario():
+        llm = LLMClient()
+        llm._http = httpx.AsyncClient(transport=httpx.MockTransport(slow_modal))
+        pooled = llm._async_http()
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(llm.agenerate_response("System", f"Q{i}") for i in range(5)))
+        elapsed = time.perf_counter() - start
+        assert llm._async_http() is pooled
+        await llm.aclose()
+        return answers, elapsed
+
+    with patch.dict(os.environ, {"MODAL_URL": "https://fake-modal-url.run"}):
+        answers, elapsed = asyncio.run(scenario())
+    assert answers == ["pooled answer"] * 5
+    assert elapsed < 0.6
+
+def test_async_rag_pipeline_matches_sync_context():
+    import asyncio
+    from src.rag.engine import RAGEngine
+
+    engine = RAGEngine()
+    query = "What is the max temp for the transformer?"
+    with patch.object(RAGEngine, "_cached_answer", return_value=None): # a hit would skip retrieval
+        result = asyncio.run(engine.aprocess_query(query))
+        assert result["context_used"] == engine.process_query(query)["context_used"]
+    assert "Normal operating range" in result["context_used"]
+
+def test_async_pipeline_builds_the_llm_client_off_the_event_loop():
+    import asyncio
+    import threading
+    from src.lazy import LazySingleton
+    from src.rag.engine import RAGEngine
+
+    threads = []
+    def build():
+        threads.append(threading.current_thread())
+        return LLMClient()
+
+    with patch("src.rag.engine.llm_client", LazySingleton(build, "llm_client")):
+        result = asyncio.run(RAGEngine().aprocess_query("What is the status?"))
+    assert result["response"] and threads and threads[0] is not threading.main_thread()
+
+def test_modal_streaming_endpoint_is_relayed_chunk_by_chunk():
+    import asyncio
+    import httpx
+
+    async def body():
+        for chunk in (b"Isolate ", b"Feeder ", b"3."):
+            yield chunk
+
+    async def streaming_modal(request):
+        assert str(request.url) == "https://fake-modal-url.run/stream"
+        return httpx.Response(200, content=body())
+
+    async def scenario():
+        llm = LLMClient()
+        llm._http = httpx.AsyncClient(transport=httpx.MockTransport(streaming_modal))
+        chunks = [chunk async for chunk in llm.astream_response("System", "What now?")]
+        await llm.aclose()
+        return chunks
+
+    with patch.dict(os.environ, {"MODAL_URL": "https://fake-modal-url.run",
+                                 "MODAL_STREAM_URL": "https://fake-modal-url.run/stream"}):
+        chunks = asyncio.run(scenario())
+    assert "".join(chunks) == "Isolate Feeder 3."
+
+def test_stalled_local_stream_ends_with_an_error_chunk():
+    import asyncio
+    import queue
+
+    class StalledStreamer:
+        def __init__(self):
+            self.sent = False
+        def __iter__(self):
+            return self
+        def __next__(self):
+            if not self.sent:
+                self.sent = True
+                return "Isolate "
+            raise queue.Empty # TextIteratorStreamer after its timeout
+
+    async def scenario():
+        llm = LLMClient()
+        llm.mock_mode = False
+        with patch.object(LLMClient, "_start_local_stream", return_value=StalledStreamer()):
+            chunks = [chunk async for chunk in llm.astream_response("System", "What now?")]
+        await llm.aclose()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert chunks[0] == "Isolate " and chunks[1].startswith("Error generating response")
+    assert isinstance(chunks[1], FallbackText)
+
+def test_local_stream_prepares_inputs_on_the_generation_worker():
+    import asyncio
+    import threading
+
+    threads = []
+    def start_local_stream(self, *args):
+        threads.append(threading.current_thread().name) # prefix encode happens in here
+        return iter(["ok"])
+
+    async def scenario():
+        llm = LLMClient()
+        llm.mock_mode = False
+        with patch.object(LLMClient, "_start_local_stream", start_local_stream):
+            chunks = [chunk async for chunk in llm.astream_response("System", "What now?")]
+        await llm.aclose()
+        return chunks
+
+    assert asyncio.run(scenario()) == ["ok"]
+    assert threads[0].startswith("llm-generate")
+
+class _StubModal:
+    """Modal stand-in on a real local socket: per-request delays/statuses, counts hits per path."""
+    def __init__(self, behaviour):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.behaviour = behaviour # (path, hit number) -> (delay seconds, status)
+        self.hits = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                import json
+                import time
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                delay, status = stub.behaviour(self.path, stub.hits[self.path])
+                time.sleep(delay)
+                payload = json.dumps({"response": f"stub answer to {json.loads(body)['prompt'][-20:]}"}
+                                     if body else {"status": "ok"}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError): # hedged loser, already cancelled
+                    pass
+            do_GET = do_POST = _reply
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def test_modal_hedges_a_stalled_request_and_retries_a_5xx():
+    import asyncio
+    import time
+    import src.rag.llm_client as llm_module
+
+    # 4th /generate call stalls (cold container); the first /flaky call returns 503
+    stub = _StubModal(lambda path, n: (2.0 if path == "/generate" and n == 4 else 0.01,
+                                       503 if path == "/flaky" and n == 1 else 200))
+    async def scenario(llm):
+        for i in range(3):
+            await llm.agenerate_response("System", f"warm {i}")
+        start = time.perf_counter()
+        answer = await llm.agenerate_response("System", "Is T1 overheating?")
+        hedged_elapsed = time.perf_counter() - start
+        with patch.dict(os.environ, {"MODAL_URL": stub.url + "/flaky"}):
+            retried = await llm.agenerate_response("System", "retry me")
+        await llm.aclose()
+        return answer, hedged_elapsed, retried
+
+    try:
+        with patch.object(llm_module, "MODAL_HEDGE_MIN_SAMPLES", 3), \
+             patch.dict(os.environ, {"MODAL_URL": stub.url + "/generate"}):
+            llm = LLMClient()
+            answer, hedged_elapsed, retried = asyncio.run(scenario(llm))
+    finally:
+        stub.close()
+    assert answer.startswith("stub answer") and hedged_elapsed < 1.0
+    assert retried.startswith("stub answer")
+    health = llm.modal_health()
+    assert health["hedges"] == 1 and health["retries"] == 1 and health["failovers"] == 0
+    assert stub.hits["/generate"] == 5 and stub.hits["/flaky"] == 2
+
+def test_modal_circuit_breaker_fails_over_to_mock_and_keep_warm_pings():
+    import asyncio
+    import src.rag.llm_client as llm_module
+
+    stub = _StubModal(lambda path, n: (0.0, 200 if path == "/warm" else 503))
+    async def scenario(llm):
+        answers = [await llm.agenerate_response("System", "hello") for _ in range(3)]
+        llm.keep_warm.interval = 0.05
+        warm = asyncio.create_task(llm.keep_warm.run())
+        await asyncio.sleep(0.2)
+        llm.keep_warm.stop()
+        await warm
+        await llm.aclose()
+        return answers
+
+    env = {"MODAL_URL": stub.url + "/down", "MODAL_WARM_URL": stub.url + "/warm"}
+    try:
+        with patch.object(llm_module, "MODAL_BREAKER_FAILURES", 2), \
+             patch.object(llm_module, "MODAL_RETRIES", 0), patch.dict(os.environ, env):
+            llm = LLMClient()
+            answers = asyncio.run(scenario(llm))
+            sync_answer = llm.generate_response("System", "hello") # circuit still open
+    finally:
+        stub.close()
+    mock = llm._mock_response("hello", "System")
+    assert answers == [mock] * 3 and sync_answer == mock
+    assert all(isinstance(answer, FallbackText) for answer in answers + [sync_answer]) # never cached
+    assert stub.hits["/down"] == 2 # third async and the sync call never reached Modal
+    health = llm.modal_health()
+    assert health["state"] == "open" and health["failovers"] == 4 and health["refused"] == 2
+    assert stub.hits["/warm"] >= 2 and health["keep_warm"]["failures"] == 0
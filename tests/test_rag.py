@@ -34,3 +34,384 @@ def test_llm_mock_response():
     response = client.generate_response("System Context", "Status of T1")
     assert isinstance(response, str)
     assert len(response) > 0
+
+def test_embedding_cache_lru_and_ttl():
+    import time
+    from src.rag.embeddings import EmbeddingCache, normalize_query
+
+    assert normalize_query("  What is the   STATUS? ") == normalize_query("what is the status")
+    cache = EmbeddingCache(maxsize=2, ttl=0.05)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    assert cache.get("a") == [1.0] # "a" is now most recent
+    cache.put("c", [3.0])          # evicts "b"
+    assert cache.get("b") is None
+    time.sleep(0.06)
+    assert cache.get("a") is None  # expired
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 2, "hit_rate": 0.3333}
+
+def test_embed_query_encodes_repeated_questions_once():
+    import numpy as np
+
+    class CountingEmbedder:
+        calls = 0
+        def encode(self, text):
+            self.calls += 1
+            return np.array([float(len(text))])
+
+    engine = RAGEngine()
+    engine.embedder = CountingEmbedder()
+    for query in ["What is the status?", "what is the status", "Is T1 overheating?", "WHAT IS THE STATUS"]:
+        engine.embed_query(query)
+    assert engine.embedder.calls == 2
+    assert engine.embedding_cache.stats()["hit_rate"] == 0.5
+    assert engine.encode_stats.count >= 2
+
+def test_process_query_generates_once_with_stage_timings():
+    from unittest.mock import patch
+
+    engine = RAGEngine()
+    with patch.object(LLMClient, "generate_response", return_value="answer") as generate:
+        result = engine.process_query("Is T1 overheating?")
+    generate.assert_called_once()
+    system_context, query = generate.call_args.args
+    assert system_context.startswith("Relevant Data:") and "ASSET HEALTH (T1)" in system_context
+    assert result["response"] == "answer"
+    assert set(result["timings_ms"]) == {"twin_snapshot", "answer_cache", "retrieval", "prompt", "generation", "total"}
+    assert result["prompt_tokens"] > 0
+
+def test_prompt_builder_keeps_live_data_and_drops_docs_over_budget():
+    from src.rag.prompt import PromptBuilder, TEMPLATE_TOKENS
+
+    words = lambda text: len(text.split())
+    builder = PromptBuilder(count_tokens=words, context_window=TEMPLATE_TOKENS + 10 + 20, max_new_tokens=10)
+    prompt = builder.build("what now", "LIVE SCADA DATA: five words here", docs=["doc one " * 5, "doc two " * 5, "short doc"])
+    assert prompt["budget_tokens"] == 18
+    assert prompt["context"].startswith("LIVE SCADA DATA")
+    assert "doc one" in prompt["context"] and "doc two" not in prompt["context"]
+    assert "short doc" in prompt["context"]
+    assert prompt["dropped_docs"] == 1
+
+def test_micro_batcher_groups_concurrent_requests():
+    import asyncio
+    import pytest
+    from src.rag.batching import MicroBatcher
+
+    sizes = []
+    def generate_batch(prompts):
+        sizes.append(len(prompts))
+        if "boom" in prompts:
+            raise RuntimeError("model failure")
+        return [p.upper() for p in prompts]
+
+    batcher = MicroBatcher(generate_batch, max_batch=4, window_ms=20)
+
+    async def scenario():
+        answers = await asyncio.gather(*(batcher.submit(f"q{i}") for i in range(10)))
+        with pytest.raises(RuntimeError):
+            await batcher.submit("boom")
+        batcher.close()
+        return answers
+
+    assert asyncio.run(scenario()) == [f"Q{i}" for i in range(10)]
+    assert sizes == [4, 4, 2, 1]
+    assert batcher.stats() == {"batches": 3, "items": 10, "mean_batch_size": 3.333}
+
+def test_semantic_answer_cache_similarity_state_and_invalidation():
+    from src.rag.answer_cache import SemanticAnswerCache, state_fingerprint
+
+    steady = state_fingerprint({"alerts": [], "transformer_loading_percent": 61.3}, 100.0)
+    assert steady == state_fingerprint({"alerts": [], "transformer_loading_percent": 64.9}, 99.0)
+    busier = state_fingerprint({"alerts": [], "transformer_loading_percent": 75.0}, 100.0)
+    alarm = state_fingerprint({"alerts": ["CRITICAL: Transformer T1 Overload Risk"], "transformer_loading_percent": 61.0}, 100.0)
+
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put(steady, "what is the status", "All normal.", vector=[1.0, 0.0, 0.0])
+    assert cache.get(steady, "what is the status") == "All normal."              # same text
+    assert cache.get(steady, "how is the grid", vector=[0.95, 0.1, 0.0]) == "All normal."  # similar
+    assert cache.get(steady, "is t1 overheating", vector=[0.0, 1.0, 0.0]) is None          # different question
+    assert cache.get(busier, "what is the status") is None                        # different state
+    # A new alert set drops everything cached under the old one
+    assert cache.get(alarm, "what is the status") is None
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+
+def test_repeated_question_in_steady_state_skips_generation():
+    from unittest.mock import patch
+
+    engine = RAGEngine()
+    state = {"fingerprint": ((), 4, 6)}
+    live = lambda self, query: ("LIVE SCADA DATA: ...", None, state["fingerprint"], 1)
+    with patch.object(RAGEngine, "_live_context", live), \
+         patch.object(LLMClient, "generate_response", side_effect=["first", "second"]) as generate:
+        assert engine.process_query("What is the status?")["cached"] is False
+        repeat = engine.process_query("what is the status")
+        assert repeat["cached"] is True and repeat["response"] == "first"
+        assert "generation" not in repeat["timings_ms"]
+        state["fingerprint"] = (("WARNING: Transformer T1 High Load",), 4, 8)
+        assert engine.process_query("What is the status?")["response"] == "second"
+    assert generate.call_count == 2
+
+def test_async_cache_hit_skips_retrieval_and_embeds_off_the_event_loop():
+    import asyncio
+    import threading
+    from unittest.mock import AsyncMock, patch
+
+    engine = RAGEngine()
+    live = lambda self, query: ("LIVE SCADA DATA: ...", None, ((), 4, 6), 1)
+    embed_threads = []
+
+    def embed(self, query):
+        embed_threads.append(threading.current_thread())
+        return None
+
+    async def ask_twice():
+        first = await engine.aprocess_query("What is the status?")
+        return first, await engine.aprocess_query("what is the status")
+
+    with patch.object(RAGEngine, "_live_context", live), patch.object(RAGEngine, "embed_query", embed), \
+         patch.object(RAGEngine, "_retrieve_docs", autospec=True, return_value=[]) as retrieve, \
+         patch.object(LLMClient, "agenerate_response", AsyncMock(return_value="first")):
+        first, repeat = asyncio.run(ask_twice())
+    assert first["cached"] is False and repeat["cached"] is True and repeat["response"] == "first"
+    assert retrieve.call_count == 1 and "retrieval" not in repeat["timings_ms"]
+    assert "answer_cache" in repeat["timings_ms"] and "LIVE SCADA DATA" in repeat["context_used"]
+    # Lookup, store and lookup again: always on a worker thread
+    assert len(embed_threads) == 3 and threading.main_thread() not in embed_threads
+
+class _MemorySink:
+    def __init__(self):
+        self.points = {}
+        self.upserts = 0
+    def existing(self, ids):
+        return {i for i in ids if i in self.points}
+    def upsert(self, ids, vectors, payloads):
+        self.upserts += 1
+        self.points.update({i: (v, p) for i, v, p in zip(ids, vectors, payloads)})
+    def path_ids(self, paths):
+        found = {}
+        for i, (_, p) in self.points.items():
+            if p["path"] in paths:
+                found.setdefault(p["path"], set()).add(i)
+        return found
+    def delete(self, ids):
+        for i in ids:
+            del self.points[i]
+
+def test_bulk_ingestion_is_batched_and_idempotent(tmp_path):
+    import numpy as np
+    from src.rag.ingestion import ingest, iter_chunks
+
+    for i in range(5):
+        (tmp_path / f"manual_{i}.txt").write_text(f"Manual {i}. " + "Check the oil level and the cooling fans. " * 60)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "notes.md").write_text("Breaker CB-110 must be racked out before maintenance.")
+    (tmp_path / "image.png").write_bytes(b"\x89PNG") # not a document: ignored
+
+    encoded = []
+    def embed(texts):
+        encoded.append(len(texts))
+        return np.ones((len(texts), 4))
+
+    sink = _MemorySink()
+    stats = ingest(iter_chunks([str(tmp_path)], chunk_chars=500, overlap=100), sink, embed=embed, batch_size=8)
+    assert stats["files"] == 6 and stats["embedded"] == stats["chunks"] == len(sink.points)
+    assert max(encoded) == 8 and sink.upserts == len(encoded)
+    assert all(len(p["text"]) <= 500 for _, p in sink.points.values())
+
+    # Re-running with one manual changed only embeds that manual's chunks
+    old_chunks = sum(p["source"] == "manual_0.txt" for _, p in sink.points.values())
+    (tmp_path / "manual_0.txt").write_text("Manual 0, revised: replace the gasket.")
+    encoded.clear()
+    again = ingest(iter_chunks([str(tmp_path)], chunk_chars=500, overlap=100), sink, embed=embed, batch_size=8)
+    assert again["embedded"] == 1 and sum(encoded) == 1
+    assert again["skipped"] == again["chunks"] - 1
+    # ... and removes the old version's chunks
+    assert again["deleted"] == old_chunks > 1
+    revised = [p["text"] for _, p in sink.points.values() if p["source"] == "manual_0.txt"]
+    assert revised == ["Manual 0, revised: replace the gasket."]
+
+    # A same-named manual in another directory is a different document
+    (tmp_path / "vendor_b").mkdir()
+    (tmp_path / "vendor_b" / "manual_0.txt").write_text("Vendor B manual 0: torque the bushings.")
+    ingest(iter_chunks([str(tmp_path / "vendor_b")]), sink, embed=embed)
+    (tmp_path / "manual_0.txt").write_text("Manual 0, revised again.")
+    ingest(iter_chunks([str(tmp_path / "manual_0.txt")]), sink, embed=embed)
+    texts = sorted(p["text"] for _, p in sink.points.values() if p["source"] == "manual_0.txt")
+    assert texts == ["Manual 0, revised again.", "Vendor B manual 0: torque the bushings."]
+
+def test_local_vector_index_top_k_and_memmap_persistence(tmp_path):
+    import numpy as np
+    from src.rag.vector_index import LocalVectorIndex
+
+    index = LocalVectorIndex(dim=3)
+    index.upsert(["x", "y", "z"], [[1, 0, 0], [0, 2, 0], [1, 1, 0]], [{"text": t} for t in "xyz"])
+    hits = index.search([1, 0.1, 0], limit=2)
+    assert [h["id"] for h in hits] == ["x", "z"] and hits[0]["score"] > hits[1]["score"]
+    index.upsert(["y"], [[0, 0, 5]], [{"text": "y2"}]) # overwrite in place
+    assert len(index) == 3 and index.search([0, 0, 1], limit=1)[0]["text"] == "y2"
+
+    index.save(str(tmp_path / "idx"))
+    reopened = LocalVectorIndex.open(str(tmp_path / "idx"), dim=3)
+    assert isinstance(reopened._vectors, np.memmap)
+    assert reopened.existing(["x", "q"]) == {"x"}
+    assert reopened.search([1, 0.1, 0], limit=1)[0]["id"] == "x"
+    reopened.upsert(["w"], [[0, 1, 1]], [{"text": "w"}]) # grows out of the read-only map
+    assert len(reopened) == 4
+    assert reopened.delete(["x", "nope"]) == 1 and len(reopened) == 3
+    assert "x" not in {hit["id"] for hit in reopened.search([1, 0.1, 0], limit=3)}
+
+def test_retrieval_uses_local_index_when_qdrant_fails():
+    import numpy as np
+    from src.rag.vector_index import LocalVectorIndex
+
+    class KeywordEmbedder:
+        def encode(self, text):
+            return np.array([float("temp" in text), float("load" in text), 1.0])
+
+    class DownQdrant:
+        def search(self, **kwargs):
+            raise ConnectionError("connection refused")
+
+    engine = RAGEngine()
+    engine.embedder = KeywordEmbedder()
+    engine.client = DownQdrant()
+    engine.local_index = LocalVectorIndex(dim=3)
+    engine.local_index.upsert(["a", "b"], [[1, 0, 0.2], [0, 1, 0.2]],
+                              [{"text": "Oil temperature limit is 90C."}, {"text": "Rated load is 100MW."}])
+    docs = engine._retrieve_docs("max oil temp?")
+    assert docs[0] == "MANUAL EXTRACT: Oil temperature limit is 90C."
+    assert not any("(Backup)" in doc for doc in docs)
+
+def test_synced_local_index_picks_up_points_ingested_later(tmp_path):
+    import time
+    from types import SimpleNamespace
+    from unittest.mock import patch
+    import src.rag.engine as engine_module
+    from src.rag.vector_index import LocalVectorIndex
+
+    class GrowingQdrant:
+        points = [SimpleNamespace(id="a", vector=[1, 0, 0], payload={"text": "Oil limit 90C."})]
+        def scroll(self, collection, limit, offset, with_payload, with_vectors):
+            return list(self.points), None
+        def search(self, **kwargs):
+            raise AssertionError("a synced mirror serves queries locally")
+
+    engine = RAGEngine()
+    engine.client = GrowingQdrant()
+    engine.local_index = LocalVectorIndex(dim=3, path=str(tmp_path / "index"))
+    engine.local_index.sync_from(engine.client, "manuals")
+    engine.local_index_synced, engine._synced_at = True, time.monotonic()
+    GrowingQdrant.points.append(SimpleNamespace(id="b", vector=[0, 1, 0], payload={"text": "Isolate Feeder 3."}))
+    with patch.object(engine_module, "LOCAL_INDEX_RESYNC", 0.01):
+        assert [hit["id"] for hit in engine._vector_search([0, 1, 0], 1)] == ["a"] # not due yet
+        engine._synced_at -= 1.0
+        engine._vector_search([0, 1, 0], 1)
+        engine._resync_thread.join()
+    assert [hit["id"] for hit in engine._vector_search([0, 1, 0], 1)] == ["b"]
+    assert engine.retriever.bm25.payload("b") == {"text": "Isolate Feeder 3."}
+
+    GrowingQdrant.points.pop(0) # deleted upstream (e.g. a stale chunk of a re-ingested manual)
+    engine._resync()
+    assert engine.local_index.items()[0] == ["b"] and engine.retriever.bm25.payload("a") is None
+
+def test_bm25_matches_equipment_tags():
+    from src.rag.hybrid import BM25Index, rrf_fuse, tokenize
+
+    assert {"cb-110", "cb", "110"} <= set(tokenize("Trip CB-110 now"))
+    index = BM25Index()
+    index.add(["a", "b", "c"], [{"text": "Trip the HV circuit breaker CB-110 in case of fire."},
+                                {"text": "Breaker CB-111 feeds Feeder 3."},
+                                {"text": "Transformer oil temperature limits."}])
+    assert index.search("cb-110", limit=3)[0][0] == "a"
+    assert index.search("CB 110", limit=3)[0][0] == "a"
+    assert [i for i, _ in index.search("feeder 3")] == ["b"]
+    assert index.search("unrelated words") == []
+    assert [i for i, _ in rrf_fuse([["x", "y"], ["y", "z"]])] == ["y", "x", "z"]
+
+def test_hybrid_retrieval_fuses_sparse_hits_and_respects_rerank_budget():
+    from src.rag.hybrid import BM25Index, HybridRetriever
+
+    docs = {"tag": {"id": "tag", "text": "Isolate CB-110 before maintenance."},
+            "near": {"id": "near", "text": "Circuit breaker maintenance overview."}}
+    bm25 = BM25Index()
+    bm25.add(list(docs), list(docs.values()))
+
+    class ReverseReranker:
+        calls = 0
+        def __init__(self, ms_per_pair):
+            self.ms_per_pair = ms_per_pair
+        def pairs_within(self, budget_ms):
+            return int(budget_ms // self.ms_per_pair)
+        def rerank(self, query, passages):
+            self.calls += 1
+            return list(reversed(range(len(passages))))
+
+    # Dense only saw the near miss; BM25 brings the exact tag in
+    retriever = HybridRetriever(bm25, candidates=5)
+    hits = retriever.retrieve("what does CB-110 do", [docs["near"]], limit=2)
+    assert {hit["id"] for hit in hits} == {"tag", "near"}
+
+    cheap, slow = ReverseReranker(1.0), ReverseReranker(1000.0)
+    before = HybridRetriever(bm25, candidates=5).retrieve("CB-110 maintenance", [docs["near"]], limit=2)
+    after = HybridRetriever(bm25, reranker=cheap, budget_ms=50).retrieve("CB-110 maintenance", [docs["near"]], limit=2)
+    assert cheap.calls == 1 and [h["id"] for h in after] == [h["id"] for h in reversed(before)]
+    skipped = HybridRetriever(bm25, reranker=slow, budget_ms=50)
+    assert skipped.retrieve("CB-110 maintenance", [docs["near"]], limit=2) == before
+    assert slow.calls == 0 and skipped.stats()["rerank_skipped"] == 1
+
+def test_prefix_kv_cache_builds_each_prefix_once():
+    from src.rag.prefix_cache import PrefixKVCache
+
+    builds = []
+    cache = PrefixKVCache(lambda prefix: builds.append(prefix) or f"kv({prefix})", maxsize=2)
+    assert cache.get("<|im_start|>system\n") == "kv(<|im_start|>system\n)"
+    cache.get("<|im_start|>system\n")
+    cache.get("other")
+    cache.get("third") # evicts the least recently used
+    cache.get("other")
+    assert builds == ["<|im_start|>system\n", "other", "third"]
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 3, "hit_rate": 0.4}
+
+    prompt = LLMClient._local_prompt("Relevant Data:\nLIVE SCADA DATA: ...", "Is T1 ok?")
+    key, prefix = LLMClient._stable_prefix("Relevant Data:\nLIVE SCADA DATA: ...")
+    assert key == prefix and prompt.startswith(prefix)
+
+def test_error_and_failover_answers_are_not_cached():
+    from unittest.mock import patch
+    from src.rag.llm_client import FallbackText
+
+    engine = RAGEngine()
+    with patch.object(RAGEngine, "embed_query", return_value=None), \
+         patch.object(LLMClient, "generate_response", return_value=FallbackText("Error generating response: oom")):
+        assert engine.process_query("Is T1 overheating?")["cached"] is False
+        assert engine.process_query("Is T1 overheating?")["cached"] is False
+    with patch.object(RAGEngine, "embed_query", return_value=None), \
+         patch.object(LLMClient, "generate_response", return_value="T1 is fine."):
+        engine.process_query("Is T1 overheating?")
+        assert engine.process_query("Is T1 overheating?")["response"] == "T1 is fine."
+    assert engine.answer_cache.stats()["size"] == 1
+
+def test_generation_prefix_is_keyed_on_twin_snapshot_version():
+    from unittest.mock import patch
+    from src.digital_twin.grid_model import grid_twin
+
+    engine = RAGEngine()
+    with patch.object(RAGEngine, "_cached_answer", return_value=None), \
+         patch.object(LLMClient, "generate_response", return_value="answer") as generate:
+        engine.process_query("Is T1 overheating?")
+        engine.process_query("What should I check?")
+        grid_twin.tick()
+        engine.process_query("Is T1 overheating?")
+    prefixes = [call.kwargs["prefix"] for call in generate.call_args_list]
+    assert prefixes[0] == prefixes[1] and prefixes[2][0] != prefixes[0][0]
+    (_, version), system_prefix = prefixes[2]
+    assert version == grid_twin.status_version and system_prefix.startswith("Relevant Data:\nLIVE SCADA DATA")
+    for call, (_, system_prefix) in zip(generate.call_args_list, prefixes):
+        assert call.args[0].startswith(system_prefix) # the question-specific part comes after
+
+    key, text = LLMClient._stable_prefix(generate.call_args.args[0], prefixes[2])
+    assert key == ("twin", version) and text == "<|im_start|>system\n" + system_prefix
+    assert "prefix" not in LLMClient._modal_payload(generate.call_args.args[0], "Is T1 overheating?", prefixes[2])
+    with patch("src.rag.llm_client.MODAL_PREFIX_CACHE", True): # opt-in
+        payload = LLMClient._modal_payload(generate.call_args.args[0], "Is T1 overheating?", prefixes[2])
+    assert payload["prompt"].startswith(payload["prefix"])
@@ -29,3 +29,282 @@ def test_transformer_health_model():
     # Critical condition
     health_crit = t1.update({"load_percent": 120, "oil_temp": 110, "h2_ppm": 200})
     assert health_crit["health_score"] < 50.0
+
+def test_status_snapshot_is_immutable_and_versioned():
+    twin = NetworkTwin()
+    version = twin.status_version
+    status = twin.get_system_status()
+    # Callers get their own copy, the published snapshot is read-only
+    status["alerts"].append("tampered")
+    assert "tampered" not in twin.get_system_status()["alerts"]
+
+    twin.tick()
+    assert twin.status_version > version
+    assert twin.get_system_status()["timestamp"] == status["timestamp"] + 1
+
+def _meshed_network():
+    from src.digital_twin.station_scenario import create_substation_alpha
+    n = create_substation_alpha()
+    # Tie line + local generation so flows actually depend on impedances
+    n.add("Line", "Tie_1_2", bus0="Feeder_1_End", bus1="Feeder_2_End", x=0.2, r=0.05, s_nom=10.0)
+    n.add("Generator", "PV_Feeder_2", bus="Feeder_2_End", p_nom=5.0, p_set=3.0, control="PQ")
+    return n
+
+def _flows(n):
+    return n.lines_t.p0.loc["now", n.lines.index].to_numpy(), n.transformers_t.p0.loc["now"].to_numpy()
+
+def test_linear_solver_matches_lpf():
+    import numpy as np
+    from src.digital_twin.linear_flow import LinearFlowSolver
+
+    reference, fast = _meshed_network(), _meshed_network()
+    solver = LinearFlowSolver(fast)
+    for p in ([5.0, 4.0, 8.0], [1.0, 9.5, 20.0]):
+        reference.loads["p_set"] = p
+        fast.loads["p_set"] = p
+        reference.lpf()
+        solver.apply()
+        for expected, actual in zip(_flows(reference), _flows(fast)):
+            np.testing.assert_allclose(actual, expected, atol=1e-6)
+        np.testing.assert_allclose(
+            fast.generators_t.p.loc["now", "External_Grid"],
+            reference.generators_t.p.loc["now", "External_Grid"], atol=1e-6
+        )
+
+def test_linear_solver_topology_change():
+    import numpy as np
+    from src.digital_twin.linear_flow import LinearFlowSolver
+
+    reference, fast = _meshed_network(), _meshed_network()
+    solver = LinearFlowSolver(fast)
+    solver.apply()
+    version = solver.topology_version
+
+    # Breaker opens on Feeder 1: Feeder_1_End is now fed only through the tie line
+    for n in (reference, fast):
+        n.lines.at["Feeder_1_Res", "active"] = False
+    solver.invalidate()
+    reference.lpf()
+    solver.apply()
+    assert solver.topology_version == version + 1
+    np.testing.assert_allclose(fast.lines_t.p0.loc["now", "Feeder_1_Res"], 0.0)
+    np.testing.assert_allclose(
+        fast.lines_t.p0.loc["now", "Tie_1_2"], reference.lines_t.p0.loc["now", "Tie_1_2"], atol=1e-6
+    )
+
+def test_network_twin_linear_backend():
+    twin = NetworkTwin(solver="linear")
+    assert twin.flow_solver is not None
+    status = twin.get_system_status()
+    # 17 MW through a 40 MVA transformer
+    assert status["transformer_loading_percent"] == 42.5
+    twin.set_branch_status("Feeder_3_Ind", False)
+    assert twin.get_system_status()["transformer_loading_percent"] < 42.5
+
+def test_simulate_profile_matches_lpf_per_snapshot():
+    import numpy as np
+    import pandas as pd
+
+    twin = NetworkTwin()
+    rng = np.random.default_rng(0)
+    profile = pd.DataFrame(
+        rng.uniform(1.0, 12.0, size=(24, 3)),
+        columns=["Load_Residential", "Load_Commercial", "Load_Industrial"]
+    )
+    result = twin.simulate_profile(profile)
+    assert result["transformer_loading_percent"].shape == (24, 1)
+    assert result["line_flows_mw"].shape == (24, 3)
+
+    # Spot-check a snapshot against a plain lpf() solve
+    reference = NetworkTwin()
+    reference.network.loads["p_set"] = profile.iloc[7].to_numpy()
+    reference.network.lpf()
+    expected = reference.network.transformers_t.p0.loc["now", "T1_Transformer"] / 40.0 * 100.0
+    np.testing.assert_allclose(result["transformer_loading_percent"][7, 0], abs(expected), atol=1e-6)
+
+    # Live state untouched
+    assert twin.network.loads.at["Load_Industrial", "p_set"] == 8.0
+
+def test_load_model_categories_and_profile():
+    import numpy as np
+    from src.digital_twin.load_profiles import LoadModel, PROFILE_LIBRARY
+
+    names = ["Load_Residential", "Load_Commercial", "Load_Industrial", "Load_Other"]
+    model = LoadModel(names, seed=0)
+    np.testing.assert_allclose(model.base_mw, [5.0, 4.0, 8.0, 5.0])
+
+    day = PROFILE_LIBRARY["default"]
+    for step in (0, 5, 13):
+        p = model.sample(step)
+        # Noise stays within +/-20% of base * profile
+        assert np.all(p >= model.base_mw * day[step % len(day)] * 0.8 - 1e-9)
+        assert np.all(p <= model.base_mw * day[step % len(day)] * 1.2 + 1e-9)
+
+    assert model.sample_profile(0, 48).shape == (48, 4)
+
+def test_load_model_custom_profiles():
+    import numpy as np
+    from src.digital_twin.load_profiles import LoadModel
+
+    model = LoadModel(
+        ["Load_Industrial", "Load_Residential"],
+        categories=[("Residential", 2.0, "night"), ("Industrial", 10.0, "flat")],
+        profiles={"default": [1.0], "flat": [1.0], "night": [1.0, 0.5]},
+    )
+    np.testing.assert_allclose(model.profile_factors(1), [1.0, 0.5])
+
+def test_tick_is_reproducible_with_seed():
+    a, b = NetworkTwin(seed=42), NetworkTwin(seed=42)
+    a.tick()
+    b.tick()
+    assert list(a.network.loads.p_set) == list(b.network.loads.p_set)
+
+def test_fleet_manager_in_process():
+    from src.digital_twin.fleet import FleetManager
+
+    primary = NetworkTwin()
+    fleet = FleetManager({"BETA": "substation_alpha", "GAMMA": "substation_alpha"}, workers=0, attached={"ALPHA": primary})
+    statuses = fleet.tick()
+    assert set(statuses) == {"BETA", "GAMMA"}
+    assert fleet.station_status("BETA")["timestamp"] == 1
+    # Attached twins are reported but not ticked by the fleet
+    assert fleet.station_status("ALPHA")["timestamp"] == 0
+
+    fleet.inject_anomaly("GAMMA", "overload")
+    aggregate = fleet.aggregate_status()
+    assert aggregate["station_count"] == 3
+    assert any(alert.startswith("GAMMA: CRITICAL") for alert in aggregate["alerts"])
+    assert aggregate["max_transformer_loading_percent"] == aggregate["transformer_loading_percent"]["GAMMA"]
+    fleet.stop()
+
+def test_fleet_manager_worker_processes():
+    from src.digital_twin.fleet import FleetManager
+
+    fleet = FleetManager({"S1": "substation_alpha", "S2": "substation_alpha", "S3": "substation_alpha"}, workers=2)
+    try:
+        fleet.start()
+        statuses = fleet.tick()
+        assert set(statuses) == {"S1", "S2", "S3"}
+        assert all(status["timestamp"] == 1 for status in statuses.values())
+        fleet.inject_anomaly("S3", "overload")
+        assert fleet.station_status("S3")["transformer_loading_percent"] > 90.0
+    finally:
+        fleet.stop()
+
+def test_fleet_tick_reads_every_reply_before_raising():
+    import multiprocessing as mp
+    import pytest
+    from src.digital_twin.fleet import FleetManager
+
+    fleet = FleetManager({"S1": "substation_alpha", "S2": "substation_alpha"}, workers=2)
+    pipes = [mp.Pipe(), mp.Pipe()]
+    fleet._shards = [(None, parent, [sid]) for (parent, _), sid in zip(pipes, ["S1", "S2"])]
+    fleet._started = True
+    (_, s1), (_, s2) = pipes
+    s1.send(("error", "S1 diverged"))
+    s2.send(("ok", {"S2": {"timestamp": 1}}))
+    with pytest.raises(RuntimeError, match="S1 diverged"):
+        fleet.tick()
+    # The healthy shard's reply was consumed and stored: the next round stays in sync
+    assert not any(parent.poll() for parent, _ in pipes)
+    assert fleet.station_status("S2") == {"timestamp": 1}
+    s1.send(("ok", {"S1": {"timestamp": 2}}))
+    s2.send(("ok", {"S2": {"timestamp": 2}}))
+    assert fleet.tick() == {"S1": {"timestamp": 2}, "S2": {"timestamp": 2}}
+
+    s2.close() # worker gone
+    s1.send(("ok", {"S1": {"timestamp": 3}}))
+    with pytest.raises(ConnectionError, match="S2"):
+        fleet.tick()
+    assert fleet.station_status("S1") == {"timestamp": 3}
+
+def test_fleet_run_survives_failed_ticks_and_stops_on_lost_worker():
+    import asyncio
+    import pytest
+    from src.digital_twin.fleet import FleetManager
+
+    fleet = FleetManager({"S1": "substation_alpha"}, workers=0)
+    outcomes = [RuntimeError("S1 diverged"), None, ConnectionError("worker exited")]
+    ticks, stopped = [], []
+
+    def tick():
+        ticks.append(1)
+        outcome = outcomes.pop(0)
+        if outcome is not None:
+            raise outcome
+
+    fleet.tick, fleet.stop = tick, lambda: stopped.append(1)
+    with pytest.raises(ConnectionError):
+        asyncio.run(fleet.run(interval=0))
+    assert len(ticks) == 3 and stopped == [1]
+
+def test_fleet_worker_startup_failure_names_the_station():
+    import pytest
+    from src.digital_twin.fleet import FleetManager
+
+    fleet = FleetManager({"S1": "substation_alpha", "BAD": "missing_network.nc"}, workers=2)
+    with pytest.raises(RuntimeError, match="BAD"):
+        fleet.start()
+    assert fleet._shards == [] # the healthy worker was stopped too
+
+def test_fleet_health_engine_matches_per_object_path():
+    import numpy as np
+    from src.digital_twin.health_engine import TransformerFleetHealth
+
+    rng = np.random.default_rng(3)
+    n = 500
+    readings = {
+        "load_percent": rng.uniform(0, 130, n),
+        "oil_temp": rng.choice([40.0, 85.0, 90.0, 95.0, 110.0], n),   # includes exact thresholds
+        "vibration": rng.uniform(0, 8, n),
+        "h2_ppm": rng.choice([10.0, 50.0, 75.0, 100.0, 200.0], n),
+    }
+    ids = [f"T{i}" for i in range(n)]
+    engine = TransformerFleetHealth(ids)
+    scores = engine.update(readings)
+    statuses = engine.status()
+
+    for i, asset_id in enumerate(ids):
+        expected = TransformerHealth(asset_id).update({k: v[i] for k, v in readings.items()})
+        assert scores[i] == expected["health_score"]
+        assert statuses[i] == expected["status"]
+    assert engine.report("T7") == TransformerHealth("T7").update({k: v[7] for k, v in readings.items()})
+
+    # Partial update only touches the given rows
+    rows = engine.rows(["T1", "T2"])
+    engine.update({"oil_temp": np.array([120.0, 120.0]), "h2_ppm": np.array([5.0, 5.0])}, rows=rows)
+    assert list(engine.health_score[rows]) == [40.0, 40.0]
+    assert engine.health_score[engine.index["T3"]] == scores[3]
+
+def test_asset_models_are_slotted():
+    from datetime import datetime
+    t1 = TransformerHealth("T1")
+    assert not hasattr(t1, "__dict__")
+    assert isinstance(t1.last_update, datetime)
+    # Thresholds are per type, not per instance
+    assert TransformerHealth("T2").max_oil_temp is t1.max_oil_temp
+
+def test_fleet_health_per_type_thresholds():
+    import numpy as np
+    import pytest
+    from src.digital_twin import health_engine
+    from src.digital_twin.health_engine import TransformerFleetHealth, score_transformers
+
+    oil, h2 = np.array([40.0, 86.0, 96.0, 40.0, 40.0]), np.array([10.0, 10.0, 10.0, 51.0, 101.0])
+    np.testing.assert_array_equal(score_transformers(oil, h2), [100.0, 80.0, 40.0, 80.0, 40.0])
+
+    # A second type with a lower oil limit: each row is scored against its own type's row
+    strict = health_engine.THRESHOLDS[0].copy()
+    strict["warn_oil_temp"], strict["critical_score"] = 80.0, 90.0
+    table = np.append(health_engine.THRESHOLDS, strict)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(health_engine, "THRESHOLDS", table)
+        mp.setattr(health_engine, "ASSET_TYPES", {"transformer": 0, "strict": 1})
+        fleet = TransformerFleetHealth(["T1", "T2"], asset_types=["transformer", "strict"])
+        assert fleet.type_code.dtype == np.uint8
+        scores = fleet.update({"oil_temp": np.array([82.0, 82.0])})
+        np.testing.assert_array_equal(scores, [100.0, 80.0])
+        assert list(fleet.status()) == ["Good", "Critical"] and fleet.critical_assets() == ["T2"]
+        assert fleet.report("T2")["status"] == "Critical"
+    with pytest.raises(ValueError):
+        TransformerFleetHealth(["T1"], asset_types=[])